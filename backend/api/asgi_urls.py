@@ -0,0 +1,21 @@
+from django.urls import path
+
+from portfolio import async_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+# Async read views take precedence over the sync views at the same paths and
+# names; everything else falls through to the regular URLconf.
+urlpatterns = [
+    path('api/projects/', async_views.project_list, name='project_list'),
+    path('api/projects/<slug:slug>/', async_views.project_detail, name='project_detail'),
+    path('api/projects/id/<int:pk>/', async_views.project_detail_by_id, name='project_detail_by_id'),
+
+    path('api/articles/', async_views.article_list, name='article_list'),
+    path('api/articles/id/<int:pk>/', async_views.article_detail_by_id, name='article_detail_by_id'),
+    path("api/articles/<slug:slug>/", async_views.article_detail, name="article-detail"),
+
+    path("api/comments/<str:content_type>/<int:object_id>/", async_views.comment_list_create, name="comment-list-create"),
+
+    path('api/certificates/', async_views.certificate_list, name='certificate-list'),
+] + sync_urlpatterns
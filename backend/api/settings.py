@@ -50,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "portfolio.middleware.AsgiRoutingMiddleware",
+    "portfolio.middleware.ServerTimingMiddleware",
+    "portfolio.middleware.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     'django.middleware.security.SecurityMiddleware',
@@ -61,7 +64,32 @@ MIDDLEWARE = [
     "allauth.account.middleware.AccountMiddleware",
 ]
 
+# Request instrumentation (portfolio.middleware.ServerTimingMiddleware): send a
+# Server-Timing header, and log requests slower than the threshold (None
+# disables the log) to the "portfolio.slow_requests" logger.
+SERVER_TIMING_HEADER = True
+SLOW_REQUEST_THRESHOLD_MS = 500
+
+# Response compression (portfolio.middleware.CompressionMiddleware): brotli
+# when the brotli package is installed, else gzip, for JSON and text bodies
+# of at least COMPRESSION_MIN_SIZE bytes. Streamed bodies are always compressed.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 4
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Request metrics summed across worker processes (portfolio/metrics.py). Each
+# process writes a snapshot file to METRICS_DIR at most every
+# METRICS_FLUSH_INTERVAL seconds; scrapes fold the files of exited processes
+# into one. Clear the directory on deploy. /metrics is served to staff, and
+# to scrapers sending METRICS_TOKEN (when set) as a bearer token.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(BASE_DIR, 'metrics'))
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 ROOT_URLCONF = 'api.urls'
+# Used instead of ROOT_URLCONF when served over ASGI (api/asgi.py): async
+# versions of the public read endpoints, then the regular URLconf
+ASGI_URLCONF = 'api.asgi_urls'
 
 TEMPLATES = [
     {
@@ -92,6 +120,63 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile, enabled with DJANGO_DB_PROFILE=production:
+# - WAL, so readers don't block behind the writer (and vice versa);
+# - synchronous=NORMAL, which is safe under WAL and skips an fsync per commit;
+# - mmap and a larger page cache, set on every new connection;
+# - IMMEDIATE transactions, so concurrent writers wait on the busy timeout
+#   instead of failing with "database is locked" when upgrading a read lock;
+# - persistent connections, so the pragmas run once per connection, not per request.
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA cache_size=-20000',
+        'PRAGMA temp_store=MEMORY',
+    ]),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,
+}
+
+if os.environ.get('DJANGO_DB_PROFILE') == 'production':
+    DATABASES['default'].update(
+        OPTIONS=SQLITE_PRODUCTION_OPTIONS,
+        CONN_MAX_AGE=600,
+        CONN_HEALTH_CHECKS=True,
+    )
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Shared by every worker process, `runworker` and management commands: the
+# response cache's group versions (moved by invalidate()) double as list
+# watermarks for ETags, so all of them must see the same ones. Redis when
+# REDIS_URL is set, else files under DJANGO_CACHE_DIR on this host.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('DJANGO_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Seconds a cached public API response is kept (0 disables the response cache).
+# Entries are invalidated by model signals, so this only bounds memory use.
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# Tests run against a throwaway cache instead of the one above (portfolio.testing)
+TEST_RUNNER = 'portfolio.testing.TestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -131,8 +216,29 @@ STATIC_URL = 'static/'
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Uploads are stored once per distinct content, named by their digest and
+# reference counted (portfolio.storage)
+STORAGES = {
+    "default": {"BACKEND": "portfolio.storage.BlobStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# Media serving (portfolio.media.serve_media). With MEDIA_SENDFILE set to
+# "x-accel-redirect" the file is sent by nginx from an `internal` location at
+# MEDIA_ACCEL_REDIRECT_PREFIX that aliases MEDIA_ROOT; with "x-sendfile" by
+# Apache (mod_xsendfile) or lighttpd. Unset, Python serves it.
+MEDIA_SENDFILE = os.environ.get('DJANGO_MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+# Lifetime of media without a content hash in its name, which may be replaced
+MEDIA_CACHE_MAX_AGE = 3600
+
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
 
+# Background jobs (image variants, file cleanup, rebuilds) are stored in the
+# database and run by `manage.py runworker`. Eager mode runs each job in
+# process right after the enqueueing transaction commits (tests, local dev).
+JOB_QUEUE_EAGER = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -141,7 +247,17 @@ AUTH_USER_MODEL = 'portfolio.CustomUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'portfolio.authentication.CachedJWTAuthentication',
+    ),
+    # orjson when installed, with DRF's stdlib JSON as the fallback (portfolio.fastjson)
+    'DEFAULT_RENDERER_CLASSES': (
+        'portfolio.fastjson.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'portfolio.fastjson.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
    'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny', 
@@ -154,6 +270,12 @@ SIMPLE_JWT = {
     'TOKEN_OBTAIN_SERIALIZER': 'portfolio.serializers.CustomTokenObtainPairSerializer',
 }
 
+# Per-process cache of users resolved from access tokens (portfolio/authentication.py).
+# Saves and deletes in the same process evict at once; the timeout bounds how
+# long other processes may see a stale user.
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_CACHE_TIMEOUT = 60
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True
 
@@ -176,6 +298,13 @@ SOCIALACCOUNT_LOGIN_ON_GET = True  # Skip signup form
 SOCIALACCOUNT_STORE_TOKENS = True  # Store authentication tokens
 
 
+# Google userinfo lookups for profile pictures (portfolio/google.py)
+GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v3/userinfo"
+GOOGLE_USERINFO_TIMEOUT = (1.0, 2.0)  # connect, read (seconds)
+GOOGLE_USERINFO_CACHE_TIMEOUT = 10 * 60
+GOOGLE_USERINFO_POOL_SIZE = 10
+
+
 CORS_ALLOW_HEADERS = [
     "authorization",
     "content-type",
@@ -1,10 +1,10 @@
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework_simplejwt.views import TokenRefreshView
 from portfolio.views import * 
 from django.conf import settings
-from django.conf.urls.static import static
+from portfolio.media import serve_media
 
 urlpatterns = [
     # Admin panel
@@ -34,4 +34,7 @@ urlpatterns = [
 
     # Google Token Validation API (Checks if a provided Google OAuth token is valid)
     path('google/validate_token/', validate_google_token, name='validate_token'),
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+    # Uploaded media (handed to the front proxy in production, see MEDIA_SENDFILE)
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$", serve_media, name='media'),
+]
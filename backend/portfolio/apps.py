@@ -6,4 +6,6 @@ class PortfolioConfig(AppConfig):
     name = 'portfolio'
 
     def ready(self):
-        import portfolio.signals
\ No newline at end of file
+        import portfolio.signals
+        from portfolio import timing
+        timing.instrument_serializers()
\ No newline at end of file
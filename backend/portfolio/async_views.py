@@ -0,0 +1,188 @@
+"""
+Async versions of the public read endpoints, routed in place of the sync
+views when the app is served over ASGI (see AsgiRoutingMiddleware). They use
+the async ORM and cache APIs, so a request waiting on a slow client holds no
+thread; response bodies are identical to the sync views' JSON output.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import views
+from .cache import cache_response
+from .conditional import (
+    article_detail_by_id_validators, article_detail_validators, article_list_validators, conditional,
+    project_detail_by_id_validators, project_detail_validators, project_list_validators,
+)
+from .fastjson import ORJSONRenderer
+from .fieldsets import sparse_fields, sparse_queryset
+from .filters import filter_listing
+from .models import Article, Certificates, Project
+from .pagination import StandardResultsSetPagination, get_paginator
+from .querysets import article_list_queryset, article_queryset, comment_queryset, project_queryset
+from .serializers import (
+    ArticleListSerializer, ArticleSerializer, CertificatesSerializer, CommentSerializer, ProjectSerializer,
+)
+
+_renderer = ORJSONRenderer()
+
+
+def _json(data, status=200):
+    response = HttpResponse(_renderer.render(data), status=status, content_type="application/json")
+    # DRF varies on Accept for renderer negotiation; keep shared caches consistent
+    response["Vary"] = "Accept"
+    return response
+
+
+def _api_errors(view_func):
+    """Send 404s and DRF exceptions (e.g. a bad page or cursor) as the JSON bodies DRF would."""
+    @wraps(view_func)
+    async def wrapped(request, *args, **kwargs):
+        try:
+            return await view_func(request, *args, **kwargs)
+        except Http404 as exc:
+            return _json({"detail": str(exc)}, status=404)
+        except APIException as exc:
+            # Validation errors are sent as they are, like DRF's exception handler does
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            return _json(detail, status=exc.status_code)
+    return wrapped
+
+
+async def _is_staff(drf_request):
+    # Authenticates like the sync views do; that may query, so in a thread
+    return await sync_to_async(lambda: drf_request.user.is_staff)()
+
+
+async def _paginated(request, queryset, serializer_class, ordering_field):
+    fields = sparse_fields(request, serializer_class)
+    queryset = sparse_queryset(queryset, serializer_class, fields)
+    # The paginators read query params through DRF's Request wrapper
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    queryset = filter_listing(request, queryset, staff=await _is_staff(drf_request))
+    if request.GET.get("ordering") == "activity":
+        queryset = queryset.order_by("-comment_count", "-published_date", "-id")
+        paginator = StandardResultsSetPagination()
+    else:
+        paginator = get_paginator(drf_request, ordering_field)
+    page = await paginator.apaginate_queryset(queryset, drf_request)
+    data = serializer_class(page, many=True, fields=fields).data
+    return _json(paginator.get_paginated_response(data).data)
+
+
+# ----------------------------------------
+# Projects
+# ----------------------------------------
+
+@require_safe
+@cache_response("projects")
+@conditional(project_list_validators)
+@_api_errors
+async def project_list(request):
+    return await _paginated(request, project_queryset(), ProjectSerializer, "published_date")
+
+
+@require_safe
+@cache_response("projects")
+@conditional(project_detail_validators)
+@_api_errors
+async def project_detail(request, slug):
+    fields = sparse_fields(request, ProjectSerializer)
+    project = await aget_object_or_404(sparse_queryset(project_queryset(), ProjectSerializer, fields), slug=slug)
+    return _json(ProjectSerializer(project, fields=fields).data)
+
+
+@require_safe
+@cache_response("projects")
+@conditional(project_detail_by_id_validators)
+@_api_errors
+async def project_detail_by_id(request, pk):
+    fields = sparse_fields(request, ProjectSerializer)
+    project = await aget_object_or_404(sparse_queryset(project_queryset(), ProjectSerializer, fields), id=pk)
+    return _json(ProjectSerializer(project, fields=fields).data)
+
+
+# ----------------------------------------
+# Articles
+# ----------------------------------------
+
+@require_safe
+@cache_response("articles")
+@conditional(article_list_validators)
+@_api_errors
+async def article_list(request):
+    return await _paginated(request, article_list_queryset(), ArticleListSerializer, "published_date")
+
+
+@require_safe
+@cache_response("articles")
+@conditional(article_detail_validators)
+@_api_errors
+async def article_detail(request, slug):
+    fields = sparse_fields(request, ArticleSerializer)
+    article = await aget_object_or_404(sparse_queryset(article_queryset(), ArticleSerializer, fields), slug=slug)
+    return _json(ArticleSerializer(article, fields=fields).data)
+
+
+@require_safe
+@cache_response("articles")
+@conditional(article_detail_by_id_validators)
+@_api_errors
+async def article_detail_by_id(request, pk):
+    fields = sparse_fields(request, ArticleSerializer)
+    article = await aget_object_or_404(sparse_queryset(article_queryset(), ArticleSerializer, fields), id=pk)
+    return _json(ArticleSerializer(article, fields=fields).data)
+
+
+# ----------------------------------------
+# Certificates
+# ----------------------------------------
+
+@require_safe
+@cache_response("certificates")
+@_api_errors
+async def certificate_list(request):
+    fields = sparse_fields(request, CertificatesSerializer)
+    queryset = sparse_queryset(Certificates.objects.all(), CertificatesSerializer, fields)
+    certificates = [certificate async for certificate in queryset]
+    return _json(CertificatesSerializer(certificates, many=True, fields=fields).data)
+
+
+# ----------------------------------------
+# Comments
+# ----------------------------------------
+
+@csrf_exempt
+async def comment_list_create(request, content_type, object_id):
+    """Async GET for `views.comment_list_create`; posting a comment still runs the sync view."""
+    if request.method != "GET":
+        return await sync_to_async(views.comment_list_create)(request, content_type, object_id)
+    return await _comment_list(request, content_type, object_id)
+
+
+@_api_errors
+async def _comment_list(request, content_type, object_id):
+    content_type = content_type.lower()
+    if content_type not in {"project", "article"}:
+        return _json({"error": "Invalid content type"}, status=400)
+
+    model_class = Project if content_type == "project" else Article
+    await aget_object_or_404(model_class.objects.only("id"), id=object_id)
+
+    fields = sparse_fields(request, CommentSerializer)
+    comments = sparse_queryset(comment_queryset(), CommentSerializer, fields).filter(
+        content_type__app_label=model_class._meta.app_label,
+        content_type__model=model_class._meta.model_name,
+        object_id=object_id,
+    ).order_by("-created_at")
+    drf_request = Request(request)
+    paginator = get_paginator(drf_request, "created_at")
+    page = await paginator.apaginate_queryset(comments, drf_request)
+    return _json(paginator.get_paginated_response(CommentSerializer(page, many=True, fields=fields).data).data)
@@ -0,0 +1,263 @@
+"""
+Endpoint benchmarks: every named route in `portfolio/urls.py` and
+`api/urls.py` is driven through the test client against the current
+database (fill it with `manage.py seed_data`), recording latency percentiles
+and query counts. Each request runs in a transaction that is rolled back, so
+writes and deletes can be repeated and leave the data as it was.
+"""
+import json
+import random
+import statistics
+import time
+from collections import namedtuple
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, reset_queries, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .compression import Compressor, codings
+from .fastjson import ORJSONRenderer
+from .models import Article, Certificates, Comment, CustomUser, Project
+
+BENCH_PASSWORD = "bench-Passw0rd!"
+
+# `user` is None for anonymous requests; `session` logs the user in with a
+# session cookie instead of sending a bearer token.
+Scenario = namedtuple(
+    "Scenario", "route method kwargs data user status query content_type session headers",
+    defaults=(None, None, None, 200, "", None, False, None),
+)
+
+
+def routes():
+    """The names of every route in the two urlconfs, which must each have a scenario."""
+    from api import urls as api_urls
+
+    from . import urls
+
+    return {
+        pattern.name
+        for pattern in [*urls.urlpatterns, *api_urls.urlpatterns]
+        if isinstance(pattern, URLPattern) and pattern.name
+    }
+
+
+def _bench_user(username, **fields):
+    user, created = CustomUser.objects.get_or_create(username=username, defaults={"email": f"{username}@example.com", **fields})
+    if created:
+        user.set_password(BENCH_PASSWORD)
+        user.save()
+    return user
+
+
+def _bench_media():
+    """A 1 MiB file under MEDIA_ROOT, written once, for the media scenarios."""
+    name = "benchmarks/sample.bin"
+    # A plain file, so repeated runs don't each add a reference to a blob
+    storage = FileSystemStorage()
+    if not storage.exists(name):
+        storage.save(name, ContentFile(random.Random(0).randbytes(1024 * 1024)))
+    return name
+
+
+def scenarios():
+    """
+    Requests for every route, built around the most discussed published
+    article and project so reads see realistic comment volumes.
+    """
+    staff = _bench_user("bench-staff", is_staff=True)
+    member = _bench_user("bench-member")
+    article = Article.objects.filter(is_draft=False, author__isnull=False).order_by("-comment_count", "pk").first()
+    project = Project.objects.filter(is_draft=False).order_by("-comment_count", "pk").first()
+    certificate = Certificates.objects.order_by("pk").first()
+    if not (article and project and certificate):
+        raise LookupError("Benchmarks need published articles and projects and a certificate; run seed_data first.")
+    thread = Comment.objects.filter(
+        Q(article=article) | Q(project=project), parent_comment=None, reply_count__gt=0
+    ).order_by("-reply_count", "pk").first()
+    reply = thread.replies.order_by("pk").first() if thread else None
+    if reply is None:
+        raise LookupError("Benchmarks need a comment with replies; run seed_data first.")
+    word = article.title.split()[0]
+    media = {"path": _bench_media()}
+
+    article_kwargs = {"content_type": "article", "object_id": article.pk}
+    new_article = {"title": "Benchmark article", "content": "<p>Body</p>" * 50, "is_draft": False}
+    new_project = {"title": "Benchmark project", "description": "Desc", "is_draft": False}
+    new_certificate = {"title": "Benchmark", "description": "d", "issued_by": "Org", "issue_date": "2024-01-01"}
+    target = {"content_type": thread.content_type.model, "object_id": thread.object_id}
+
+    return [
+        Scenario("project_list", "GET"),
+        Scenario("project_list", "GET", query="?ordering=activity"),
+        Scenario("project_list", "GET", query="?exclude=description,technologies"),
+        Scenario("create_project", "GET", user=staff),
+        Scenario("create_project", "POST", data=new_project, user=staff, status=201),
+        Scenario("project_detail", "GET", {"slug": project.slug}),
+        Scenario("project_detail_by_id", "GET", {"pk": project.pk}),
+        Scenario("update_project", "PUT", {"pk": project.pk}, {"title": "Renamed"}, staff),
+        Scenario("delete_project", "DELETE", {"pk": project.pk}, user=staff, status=204),
+
+        Scenario("article_list", "GET"),
+        Scenario("article_list", "GET", query="?ordering=activity"),
+        Scenario("article_list", "GET", query="?fields=id,title,slug,excerpt"),
+        Scenario("article_list", "GET", query=f"?cursor=&category={article.category}"),
+        Scenario("article_list", "GET", query=f"?cursor=&author={article.author_id}"),
+        Scenario("article_list", "GET", query="?cursor=&is_draft=true", user=staff),
+        Scenario("create_article", "GET", user=member),
+        Scenario("create_article", "POST", data=new_article, user=member, status=201),
+        Scenario("update_article", "PUT", {"pk": article.pk}, {"title": "Renamed"}, article.author),
+        Scenario("article_detail_by_id", "GET", {"pk": article.pk}),
+        Scenario("article-detail", "GET", {"slug": article.slug}),
+        Scenario("delete_article", "DELETE", {"pk": article.pk}, user=staff, status=204),
+
+        Scenario("comment-list-create", "GET", article_kwargs),
+        Scenario("comment-list-create", "POST", article_kwargs, {"content": "Benchmark"}, member, 201),
+        Scenario("add_reply", "POST", {**target, "comment_id": thread.pk}, {"content": "Benchmark"}, member, 201),
+        Scenario("comment-thread", "GET", article_kwargs),
+        Scenario("get-replies", "GET", {"comment_id": thread.pk}),
+        Scenario("comment-delete", "DELETE", {"comment_id": thread.pk}, user=thread.author, status=204),
+        Scenario("delete-reply", "DELETE", {"comment_id": thread.pk, "reply_id": reply.pk}, user=reply.author, status=204),
+
+        Scenario("certificate-list", "GET"),
+        Scenario("certificate-create", "POST", data=new_certificate, user=staff, status=201),
+        Scenario("certificate-update", "PUT", {"pk": certificate.pk}, new_certificate, staff),
+        Scenario("certificate-delete", "DELETE", {"pk": certificate.pk}, user=staff, status=204),
+
+        Scenario(
+            "bulk-import", "POST", {"kind": "articles"}, "\n".join(json.dumps(new_article) for _ in range(20)),
+            staff, 201, content_type="application/x-ndjson",
+        ),
+        Scenario("search", "GET", query=f"?q={word}"),
+
+        Scenario("user_create", "POST", data={"username": "bench-new", "email": "new@example.com", "password": BENCH_PASSWORD}, status=201),
+        Scenario("user-profile", "GET", user=member),
+        Scenario("update_profile", "PUT", data={"username": "bench-member"}, user=member),
+        Scenario("token_obtain_pair", "POST", data={"username": "bench-member", "password": BENCH_PASSWORD}),
+        Scenario("token_refresh", "POST", data={"refresh": str(RefreshToken.for_user(member))}),
+        Scenario("callback", "GET", user=member, status=302, session=True),
+        Scenario("user_detail", "GET", user=member),
+        Scenario("validate_token", "POST", data={"access_token": "benchmark"}),
+        Scenario("metrics", "GET", user=staff, session=True),
+        Scenario("media", "GET", media),
+        Scenario("media", "GET", media, status=206, headers={"range": "bytes=0-65535"}),
+    ]
+
+
+def _send(client, scenario, url):
+    method = getattr(client, scenario.method.lower())
+    if scenario.method == "GET":
+        return method(url, headers=scenario.headers)
+    if scenario.content_type:
+        return method(url, scenario.data, content_type=scenario.content_type)
+    return method(url, scenario.data, format="json")
+
+
+def _client(scenario):
+    client = APIClient()
+    if scenario.user is not None and scenario.session:
+        client.force_login(scenario.user)
+    elif scenario.user is not None:
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(scenario.user).access_token}")
+    return client
+
+
+def run(scenarios, iterations=20, warmup=2):
+    """
+    Run each scenario `warmup + iterations` times and return
+    `{"<METHOD> <route><query> [<header>: <value>]": {"p50_ms", "p99_ms",
+    "mean_ms", "queries", "status", "expected_status"}}`, headers only being
+    there for scenarios that send some. Streamed bodies are read in full.
+    Query counts are from the last iteration.
+    """
+    results = {}
+    for scenario in scenarios:
+        url = reverse(scenario.route, kwargs=scenario.kwargs) + scenario.query
+        client = _client(scenario)
+        timings = []
+        for iteration in range(warmup + iterations):
+            # The debug query log is capped; a full log breaks CaptureQueriesContext
+            reset_queries()
+            with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = _send(client, scenario, url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                    response.close()
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+            if iteration >= warmup:
+                timings.append(elapsed)
+
+        timings.sort()
+        headers = "".join(f" [{header}: {value}]" for header, value in (scenario.headers or {}).items())
+        results[f"{scenario.method} {scenario.route}{scenario.query}{headers}"] = {
+            "p50_ms": round(statistics.median(timings) * 1000, 3),
+            "p99_ms": round(timings[max(int(len(timings) * 0.99) - 1, 0)] * 1000, 3),
+            "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+            "queries": len(queries.captured_queries),
+            "status": response.status_code,
+            "expected_status": scenario.status,
+        }
+    return results
+
+
+def _p50_ms(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def encoding(route="article_list", iterations=50):
+    """
+    What producing `route`'s body costs: `{"renderers": {name: {"p50_ms",
+    "bytes"}}, "codings": {coding: {"p50_ms", "bytes"}}}`, with encode times
+    for DRF's stdlib renderer and the orjson one, and compression times and
+    bytes on the wire (as sent through the middleware) per content coding.
+    """
+    client = APIClient()
+    url = reverse(route)
+    data = client.get(url).data
+
+    renderers = {}
+    for name, renderer in (("json", JSONRenderer()), ("orjson", ORJSONRenderer())):
+        renderers[name] = {"p50_ms": _p50_ms(lambda: renderer.render(data), iterations), "bytes": len(renderer.render(data))}
+
+    body = ORJSONRenderer().render(data)
+    results = {"identity": {"p50_ms": 0.0, "bytes": len(client.get(url).content)}}
+    for coding in codings():
+        def compress():
+            compressor = Compressor(coding)
+            return compressor.compress(body) + compressor.finish()
+        response = client.get(url, headers={"accept-encoding": coding})
+        results[coding] = {"p50_ms": _p50_ms(compress, iterations), "bytes": len(response.content)}
+    return {"renderers": renderers, "codings": results}
+
+
+def compare(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """
+    Rows of `(endpoint, baseline p50, current p50, baseline queries, current
+    queries, regressed)` for endpoints in both runs. An endpoint regressed if
+    it runs more queries or its p50 grew by more than `threshold` and by more
+    than `min_delta_ms`, which keeps jitter on fast endpoints out of the report.
+    """
+    rows = []
+    for endpoint, now in current.items():
+        before = baseline.get(endpoint)
+        if before is None:
+            continue
+        slower = now["p50_ms"] - before["p50_ms"]
+        regressed = now["queries"] > before["queries"] or (
+            slower > before["p50_ms"] * threshold and slower > min_delta_ms
+        )
+        rows.append((endpoint, before["p50_ms"], now["p50_ms"], before["queries"], now["queries"], regressed))
+    return rows
@@ -0,0 +1,201 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.template.response import SimpleTemplateResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+VERSION_KEY = "response-cache:version:{}"
+RESPONSE_KEY = "response-cache:{}:{}"
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def get_stats():
+    """Return this process's response cache hit/miss counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+def get_versions(*groups):
+    """
+    Return each group's version: the time (in ns) it last changed. A group
+    whose version was evicted restarts at "now", which can only look newer
+    than anything handed out before, never older.
+    """
+    keys = [VERSION_KEY.format(group) for group in groups]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(*groups):
+    """`get_versions()` for async views."""
+    keys = [VERSION_KEY.format(group) for group in groups]
+    versions = await cache.aget_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def last_changed(group):
+    """The group's version as an aware datetime, usable as a list watermark."""
+    version, = get_versions(group)
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def _advance(groups):
+    keys = [VERSION_KEY.format(group) for group in groups]
+    current = cache.get_many(keys)
+    now = time.time_ns()
+    # Never backwards, even if this host's clock is behind the last writer's
+    cache.set_many({key: max(now, current.get(key, 0) + 1) for key in keys}, timeout=None)
+
+
+def invalidate(*groups):
+    """
+    Drop every cached response in the given groups by moving their version
+    forward. Old entries are never read again and simply expire.
+
+    The versions live in the shared cache, so every worker sees the move.
+    Inside a transaction they move again on commit: another worker may have
+    cached the not yet committed (old) rows under the first move.
+    """
+    _advance(groups)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _advance(groups))
+
+
+def auth_state(request, user):
+    """Responses are shared between anonymous callers, and per credential otherwise."""
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    if authorization:
+        return hashlib.sha256(authorization.encode()).hexdigest()
+    if user is not None and user.is_authenticated:
+        return f"session:{user.pk}"
+    return "anon"
+
+
+def _request_key(request, user):
+    query = "&".join(sorted(request.GET.urlencode().split("&")))
+    # Accept takes part in DRF's renderer negotiation (JSON vs browsable API).
+    accept = request.META.get("HTTP_ACCEPT", "")
+    # Pagination links are absolute, so the host is part of the key too.
+    raw = f"{request.build_absolute_uri(request.path)}?{query}|{accept}|{auth_state(request, user)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _response_key(request, versions, user):
+    return RESPONSE_KEY.format(".".join(str(version) for version in versions), _request_key(request, user))
+
+
+def _cached_response(request, cached):
+    _record("hits")
+    content, status, headers = cached
+    # Answer conditional requests from the stored validators.
+    validators = dict(headers)
+    not_modified = get_conditional_response(
+        request,
+        etag=validators.get("ETag"),
+        last_modified=parse_http_date_safe(validators.get("Last-Modified", "")),
+    )
+    if not_modified is not None:
+        for header in ("Vary", "Cache-Control"):
+            if header in validators:
+                not_modified[header] = validators[header]
+        return not_modified
+    response = HttpResponse(content, status=status)
+    for header, value in headers:
+        response[header] = value
+    response["X-Cache"] = "HIT"
+    return response
+
+
+def _entry(rendered):
+    headers = [(h, v) for h, v in rendered.items() if h != "X-Cache"]
+    return rendered.content, rendered.status_code, headers
+
+
+def _cacheable(request):
+    timeout = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 0)
+    return timeout if request.method in ("GET", "HEAD") else 0
+
+
+def cache_response(*groups):
+    """
+    Cache successful GET responses of a function view. Entries belong to the
+    given invalidation groups and are dropped when `invalidate()` is called
+    for any of them (see signals.py). Place it above `@api_view`. Async views
+    are wrapped with an async wrapper that uses the cache's async API.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def awrapped(request, *args, **kwargs):
+                timeout = _cacheable(request)
+                if not timeout:
+                    return await view_func(request, *args, **kwargs)
+
+                key = _response_key(request, await aget_versions(*groups), await request.auser())
+                cached = await cache.aget(key)
+                if cached is not None:
+                    return _cached_response(request, cached)
+
+                _record("misses")
+                response = await view_func(request, *args, **kwargs)
+                response["X-Cache"] = "MISS"
+                if response.status_code == 200 and not response.streaming:
+                    await cache.aset(key, _entry(response), timeout)
+                return response
+            return awrapped
+
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            timeout = _cacheable(request)
+            if not timeout:
+                return view_func(request, *args, **kwargs)
+
+            key = _response_key(request, get_versions(*groups), getattr(request, "user", None))
+            cached = cache.get(key)
+            if cached is not None:
+                return _cached_response(request, cached)
+
+            _record("misses")
+            response = view_func(request, *args, **kwargs)
+            response["X-Cache"] = "MISS"
+
+            if response.status_code == 200 and not response.streaming:
+                def store(rendered):
+                    cache.set(key, _entry(rendered), timeout)
+
+                if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+                    response.add_post_render_callback(store)
+                else:
+                    store(response)
+            return response
+        return wrapped
+    return decorator
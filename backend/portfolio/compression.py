@@ -0,0 +1,130 @@
+"""
+Response compression for `CompressionMiddleware`: brotli (when the brotli
+package is installed) or gzip, whichever the client's Accept-Encoding rates
+higher, with brotli winning ties. Only JSON and text bodies of at least
+COMPRESSION_MIN_SIZE bytes are compressed: images and archives already are,
+and HTML is left alone because it carries CSRF tokens (BREACH). Streamed
+bodies are compressed chunk by chunk, each chunk flushed so the client
+receives it without waiting for the rest.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/x-ndjson", "application/javascript", "application/xml",
+    "image/svg+xml", "text/css", "text/csv", "text/javascript", "text/plain", "text/xml",
+}
+
+
+def codings():
+    """Supported content codings, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding):
+    """The coding to use for an Accept-Encoding header value, or None for identity."""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in codings():
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class Compressor:
+    """Incremental gzip or brotli compression."""
+
+    def __init__(self, coding):
+        if coding == "br":
+            self._brotli = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._zlib = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        """Compressed output for `data`; with `flush`, everything compressed so far."""
+        if self._zlib is not None:
+            output = self._zlib.compress(data)
+            return output + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else output
+        output = self._brotli.process(data)
+        return output + self._brotli.flush() if flush else output
+
+    def finish(self):
+        return self._zlib.flush() if self._zlib is not None else self._brotli.finish()
+
+
+def _compress_stream(chunks, compressor):
+    for chunk in chunks:
+        output = compressor.compress(chunk, flush=True)
+        if output:
+            yield output
+    yield compressor.finish()
+
+
+async def _acompress_stream(chunks, compressor):
+    async for chunk in chunks:
+        output = compressor.compress(chunk, flush=True)
+        if output:
+            yield output
+    yield compressor.finish()
+
+
+def _compressible(response):
+    content_type = response.get("Content-Type", "").partition(";")[0].strip().lower()
+    if content_type not in COMPRESSIBLE_TYPES and not content_type.endswith("+json"):
+        return False
+    # Byte ranges are offsets into the uncompressed body
+    if response.has_header("Content-Encoding") or response.has_header("Content-Range"):
+        return False
+    return response.streaming or len(response.content) >= settings.COMPRESSION_MIN_SIZE
+
+
+def compress_response(request, response):
+    """Compress `response` in place for `request` if it's worth it and the client accepts it."""
+    if not _compressible(response):
+        return response
+    patch_vary_headers(response, ("Accept-Encoding",))
+    coding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    if coding is None:
+        return response
+
+    compressor = Compressor(coding)
+    if response.streaming:
+        if response.is_async:
+            response.streaming_content = _acompress_stream(response.streaming_content, compressor)
+        else:
+            response.streaming_content = _compress_stream(response.streaming_content, compressor)
+        del response["Content-Length"]
+    else:
+        content = compressor.compress(response.content) + compressor.finish()
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+
+    # The compressed bytes differ, so a strong validator no longer holds
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        response["ETag"] = "W/" + etag
+    response["Content-Encoding"] = coding
+    return response
@@ -0,0 +1,123 @@
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache import auth_state, last_changed
+from .models import Article, Project
+
+
+def _make_etag(request, *parts):
+    """
+    Weak ETag over the watermark parts and whatever selects the representation,
+    including the caller's credentials: staff are shown drafts.
+    """
+    raw = "|".join(str(part) for part in parts)
+    raw += f"|{request.GET.urlencode()}|{request.META.get('HTTP_ACCEPT', '')}"
+    raw += f"|{auth_state(request, getattr(request, 'user', None))}"
+    return 'W/"%s"' % hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def _latest(*timestamps):
+    timestamps = [ts for ts in timestamps if ts is not None]
+    return max(timestamps) if timestamps else None
+
+
+def _list_validators(group):
+    def validators(request, *args, **kwargs):
+        # The response cache's group version moves on every save/delete of the
+        # listed objects, their comments and authors, so it doubles as a list
+        # watermark without counting or scanning the table.
+        watermark = last_changed(group)
+        return _make_etag(request, watermark.timestamp()), watermark
+    return validators
+
+
+def _detail_validators(model, field, url_kwarg, group):
+    def validators(request, **kwargs):
+        row = (
+            model.objects
+            .filter(**{field: kwargs[url_kwarg]})
+            .annotate(comment_modified=Max("comments__created_at"), comments_total=Count("comments"))
+            .values_list("id", "updated_at", "comment_modified", "comments_total")
+            .first()
+        )
+        if row is None:
+            return None, None
+        # The body embeds the author and commenters (names, avatars), which the
+        # row doesn't reflect, and a deleted comment leaves no timestamp behind;
+        # the group version moves on both
+        watermark = last_changed(group)
+        return _make_etag(request, *row, watermark.timestamp()), _latest(row[1], row[2], watermark)
+    return validators
+
+
+article_list_validators = _list_validators("articles")
+project_list_validators = _list_validators("projects")
+article_detail_validators = _detail_validators(Article, "slug", "slug", "articles")
+article_detail_by_id_validators = _detail_validators(Article, "id", "pk", "articles")
+project_detail_validators = _detail_validators(Project, "slug", "slug", "projects")
+project_detail_by_id_validators = _detail_validators(Project, "id", "pk", "projects")
+
+
+def _precondition(request, etag, last_modified):
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp), timestamp
+
+
+def _add_validators(response, etag, timestamp, state):
+    if response.status_code == 200:
+        if timestamp and not response.has_header("Last-Modified"):
+            response.headers["Last-Modified"] = http_date(timestamp)
+        if etag:
+            response.headers.setdefault("ETag", etag)
+    # What a caller sees depends on who they are, so shared caches must not
+    # answer one caller with another's copy
+    patch_vary_headers(response, ("Authorization",))
+    if state != "anon":
+        patch_cache_control(response, private=True)
+    return response
+
+
+def conditional(validators):
+    """
+    Like Django's `condition()`, but a single `validators(request, *args, **kwargs)`
+    call returns both the ETag and the last-modified datetime, so the watermark
+    query runs once. Matching If-None-Match / If-Modified-Since requests get a
+    304 before the view (and its serializer) runs. Works on async views too,
+    where the validators run in one `sync_to_async` call.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            avalidators = sync_to_async(validators)
+
+            @wraps(view_func)
+            async def awrapped(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view_func(request, *args, **kwargs)
+
+                etag, last_modified = await avalidators(request, *args, **kwargs)
+                state = auth_state(request, await request.auser())
+                response, timestamp = _precondition(request, etag, last_modified)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                return _add_validators(response, etag, timestamp, state)
+            return awrapped
+
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+
+            etag, last_modified = validators(request, *args, **kwargs)
+            state = auth_state(request, getattr(request, "user", None))
+            response, timestamp = _precondition(request, etag, last_modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            return _add_validators(response, etag, timestamp, state)
+        return wrapped
+    return decorator
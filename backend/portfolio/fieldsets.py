@@ -0,0 +1,103 @@
+"""
+Sparse fieldsets: `?fields=a,b` keeps only the named serializer fields and
+`?exclude=a,b` drops them. `sparse_fields()` reads the selection and
+`sparse_queryset()` pushes it down, so unselected columns are deferred and
+unselected relations are neither joined nor prefetched.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+# Serializer fields computed from other columns
+DERIVED_SOURCES = {
+    "category_display": ("category",),
+    "content_object": ("content_type", "object_id"),
+}
+
+# Always loaded: the primary key and the columns the list orderings and
+# keyset cursors read, so paginating never loads a deferred column per row
+ALWAYS_LOADED = ("id", "published_date", "created_at", "comment_count")
+
+_field_names = {}
+
+
+def _serializer_fields(serializer_class):
+    if serializer_class not in _field_names:
+        _field_names[serializer_class] = dict(serializer_class().fields)
+    return _field_names[serializer_class]
+
+
+def _parse(request, param):
+    value = request.GET.get(param)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def sparse_fields(request, serializer_class):
+    """
+    The serializer field names selected by the request's `?fields=` and
+    `?exclude=`, or None when it asked for everything. Unknown names are a
+    400 error.
+    """
+    fields, exclude = _parse(request, "fields"), _parse(request, "exclude")
+    if fields is None and exclude is None:
+        return None
+
+    available = _serializer_fields(serializer_class)
+    unknown = ((fields or set()) | (exclude or set())) - set(available)
+    if unknown:
+        raise ValidationError({"fields": [f"Unknown field(s): {', '.join(sorted(unknown))}."]})
+    selected = set(available) if fields is None else fields
+    return frozenset(selected - (exclude or set()))
+
+
+def _sources(model, serializer_class, names):
+    """
+    Model field names the given serializer fields read, or None when one of
+    them reads something that can't be traced to a model field.
+    """
+    serializer_fields = _serializer_fields(serializer_class)
+    sources = set()
+    for name in names:
+        field_sources = DERIVED_SOURCES.get(name) or (serializer_fields[name].source.split(".")[0],)
+        for source in field_sources:
+            try:
+                model._meta.get_field(source)
+            except FieldDoesNotExist:
+                # e.g. ProjectSerializer.author, which projects don't have and is never output
+                if source != "*" and not hasattr(model, source):
+                    continue
+                return None
+            sources.add(source)
+    return sources
+
+
+def _root(lookup):
+    return getattr(lookup, "prefetch_through", lookup).split("__")[0]
+
+
+def sparse_queryset(queryset, serializer_class, fields):
+    """
+    Restrict `queryset` to what serializing `fields` reads: other columns are
+    deferred, and joins and prefetches of unselected relations are dropped.
+    """
+    if fields is None:
+        return queryset
+    model = queryset.model
+    kept = _sources(model, serializer_class, fields)
+    if kept is None:
+        return queryset
+
+    # Relations are kept if a selected field reads them or is named after them
+    related = kept | set(fields)
+    if isinstance(queryset.query.select_related, dict):
+        joined = [name for name in queryset.query.select_related if name in related]
+        queryset = queryset.select_related(None)
+        if joined:
+            queryset = queryset.select_related(*joined)
+
+    prefetches = [lookup for lookup in queryset._prefetch_related_lookups if _root(lookup) in related]
+    queryset = queryset.prefetch_related(None).prefetch_related(*prefetches)
+
+    concrete = {field.name for field in model._meta.concrete_fields}
+    return queryset.only(*(concrete & (kept | set(ALWAYS_LOADED))))
@@ -0,0 +1,84 @@
+"""
+Server-side filters for `article_list` and `project_list`:
+
+    ?category=<key>                 one of the model's category keys
+    ?published_after=<date|datetime>  published_date >= value
+    ?published_before=<date|datetime> published_date < value
+    ?author=<user id>               articles only
+    ?is_draft=true|false            staff only
+
+Everyone else only ever sees published content; staff see drafts too unless
+they filter on `is_draft`. Each combination is served by one of the indexes
+on `Article` and `Project` (see their Meta) in published order.
+"""
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+BOOLEANS = {"true": True, "1": True, "false": False, "0": False}
+
+
+def _moment(param, value):
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = day and datetime.combine(day, time.min)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValidationError({param: ["Expected an ISO 8601 date or datetime."]})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _is_draft(params, staff):
+    value = params.get("is_draft")
+    if value is None:
+        return None if staff else False
+    if value.lower() not in BOOLEANS:
+        raise ValidationError({"is_draft": ["Expected true or false."]})
+    is_draft = BOOLEANS[value.lower()]
+    if is_draft and not staff:
+        raise PermissionDenied("Only staff can list drafts.")
+    return is_draft
+
+
+def filter_listing(request, queryset, staff):
+    """
+    Apply the request's listing filters to an `Article` or `Project`
+    queryset. `staff` says whether the caller may see drafts. Bad values are
+    a 400, and asking for drafts without being staff is a 403.
+    """
+    params = request.GET
+    model = queryset.model
+    filters = {}
+
+    is_draft = _is_draft(params, staff)
+    if is_draft is not None:
+        filters["is_draft"] = is_draft
+
+    category = params.get("category")
+    if category is not None:
+        choices = dict(model._meta.get_field("category").choices)
+        if category not in choices:
+            raise ValidationError({"category": [f"Expected one of: {', '.join(choices)}."]})
+        filters["category"] = category
+
+    if "published_after" in params:
+        filters["published_date__gte"] = _moment("published_after", params["published_after"])
+    if "published_before" in params:
+        filters["published_date__lt"] = _moment("published_before", params["published_before"])
+
+    author = params.get("author")
+    if author is not None:
+        if not any(field.name == "author" for field in model._meta.concrete_fields):
+            raise ValidationError({"author": ["Not a filter for this listing."]})
+        if not author.isdigit():
+            raise ValidationError({"author": ["Expected a user id."]})
+        filters["author_id"] = int(author)
+
+    return queryset.filter(**filters)
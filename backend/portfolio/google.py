@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+from allauth.socialaccount.models import SocialAccount, SocialToken
+
+from .authentication import user_cache
+from .cache import invalidate
+
+logger = logging.getLogger(__name__)
+
+USERINFO_KEY = "google-userinfo:{}"
+REJECTED_TOKEN_TIMEOUT = 60  # seconds a rejected token is remembered
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing upstream for a while. After `failure_threshold`
+    consecutive failures the breaker opens and `allow()` refuses calls for
+    `reset_timeout` seconds; then a single trial call is let through, which
+    closes the breaker on success or reopens it on failure. State is per process.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+breaker = CircuitBreaker()
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    A process-wide `requests.Session`, so lookups reuse pooled keep-alive
+    connections instead of a new TCP/TLS handshake per call. Recreated after
+    a fork, since pooled sockets must not be shared between processes.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            # Fail fast and let the breaker decide; no transparent retries
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.GOOGLE_USERINFO_POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def fetch_userinfo(token):
+    """
+    Call Google's userinfo endpoint. Returns the decoded JSON, or None when
+    Google rejects the token. Timeouts, connection errors and 5xx responses
+    raise `requests.RequestException`.
+    """
+    response = get_session().get(
+        settings.GOOGLE_USERINFO_URL,
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=settings.GOOGLE_USERINFO_TIMEOUT,
+    )
+    if response.status_code in (401, 403):
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+def _cache_key(account, token):
+    if account is not None:
+        return USERINFO_KEY.format(f"account:{account.pk}")
+    return USERINFO_KEY.format(hashlib.sha256(token.encode()).hexdigest())
+
+
+def _stored_token(account):
+    return (
+        SocialToken.objects.filter(account=account).order_by("-expires_at").values_list("token", flat=True).first()
+    )
+
+
+def get_picture(user, token=None):
+    """
+    Return the user's current Google profile picture URL, or None.
+
+    Userinfo is cached per social account (or per token hash when the user
+    has no stored account) for GOOGLE_USERINFO_CACHE_TIMEOUT. On a miss the
+    access token comes from `token` (the X-Google-Access-Token header) or the
+    token allauth stored at login. While Google fails or the breaker is open,
+    the last known picture (kept on the social account) is served instead.
+    """
+    account = SocialAccount.objects.filter(user=user, provider="google").first()
+    last_known = account.extra_data.get("picture") if account else None
+    if account is None and not token:
+        return None
+
+    key = _cache_key(account, token)
+    userinfo = cache.get(key)
+    if userinfo is not None:
+        return userinfo.get("picture") or last_known
+
+    token = token or _stored_token(account)
+    if not token or not breaker.allow():
+        return last_known
+
+    try:
+        userinfo = fetch_userinfo(token)
+    except (requests.RequestException, ValueError) as exc:
+        breaker.record_failure()
+        logger.warning("Google userinfo lookup failed (%s); serving the last known picture", exc)
+        return last_known
+    breaker.record_success()
+
+    # A rejected token is remembered briefly, so it isn't retried on every call
+    cache.set(key, userinfo or {}, settings.GOOGLE_USERINFO_CACHE_TIMEOUT if userinfo else REJECTED_TOKEN_TIMEOUT)
+    picture = (userinfo or {}).get("picture")
+    if account is not None and picture and picture != last_known:
+        account.extra_data["picture"] = picture
+        SocialAccount.objects.filter(pk=account.pk).update(extra_data=account.extra_data)
+        if user.refresh_avatar_url():
+            user_cache.discard(user.pk)
+        # Author cards embed the picture
+        invalidate("articles", "projects")
+    return picture or last_known
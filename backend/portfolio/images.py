@@ -0,0 +1,153 @@
+import base64
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from PIL import Image, ImageFilter, ImageOps
+
+from .cache import invalidate
+from .models import Article, Certificates, CustomUser, Project
+
+AVATAR_WIDTHS = (64, 128, 256)
+CARD_WIDTHS = (320, 640, 1280)
+PLACEHOLDER_WIDTH = 16
+
+# Model -> (image field, variant widths). Variants are recorded on the
+# model's `<field>_variants` JSON column.
+IMAGE_FIELDS = {
+    CustomUser: ("profile_picture", AVATAR_WIDTHS),
+    Article: ("article_image", CARD_WIDTHS),
+    Project: ("project_image", CARD_WIDTHS),
+    Certificates: ("certificate_image", CARD_WIDTHS),
+}
+
+# Response cache groups whose bodies embed each model's image variants;
+# avatars appear in every article and project
+CACHE_GROUPS = {
+    CustomUser: ("articles", "projects"),
+    Article: ("articles",),
+    Project: ("projects",),
+    Certificates: ("certificates",),
+}
+
+FORMATS = (
+    ("image/webp", "WEBP", "webp", {"quality": 80, "method": 4}),
+    ("image/jpeg", "JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+)
+
+def _encode(image, pil_format, options):
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def _placeholder(image):
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    tiny = image.convert("RGB").resize((PLACEHOLDER_WIDTH, height), Image.Resampling.BILINEAR)
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    data = _encode(tiny, "JPEG", {"quality": 40})
+    return "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+
+
+def render_variants(name, widths, storage=default_storage):
+    """
+    Write resized WebP/JPEG copies of the stored image `name` and return the
+    description kept in `<field>_variants`. Widths above the original are skipped.
+    """
+    with storage.open(name, "rb") as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    directory, filename = posixpath.split(name)
+    targets = [width for width in widths if width < image.width] or [image.width]
+
+    variants = {mime: {} for mime, *_ in FORMATS}
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for mime, pil_format, extension, options in FORMATS:
+            variant_name = posixpath.join(directory, "variants", f"{filename}.{width}w.{extension}")
+            variants[mime][str(width)] = storage.save(variant_name, ContentFile(_encode(resized, pil_format, options)))
+
+    return {
+        "source": name,
+        "width": image.width,
+        "height": image.height,
+        "variants": variants,
+        "placeholder": _placeholder(image),
+    }
+
+
+def _variant_names(description):
+    return [name for names in description.get("variants", {}).values() for name in names.values()]
+
+
+def delete_variants(description, storage=default_storage):
+    # Each description holds its own references, even to files it shares with another
+    for name in _variant_names(description):
+        storage.delete(name)
+
+
+def build_variants(model, pk, name):
+    """
+    Render variants for one stored image and record them on the row. Errors
+    propagate, so the job queue can retry the job.
+    """
+    field, widths = IMAGE_FIELDS[model]
+    description = render_variants(name, widths)
+
+    previous = model.objects.filter(pk=pk).values_list(f"{field}_variants", flat=True).first()
+    # Only record them if the row still points at this upload
+    updated = model.objects.filter(pk=pk, **{field: name}).update(**{f"{field}_variants": description})
+    if not updated:
+        delete_variants(description)
+        return description
+    # update() sends no signal, so cached responses are dropped here
+    invalidate(*CACHE_GROUPS[model])
+    # A rebuild of the same upload (--force, a re-run job) saved its own references too
+    if previous:
+        delete_variants(previous)
+    return description
+
+
+def schedule_variants(instance):
+    """
+    Queue variant generation for the instance's image on the job queue, if
+    the stored variants don't already describe it. Keyed per row, so several
+    uploads before a worker gets to it only render the latest one.
+    """
+    model = type(instance)
+    field, _ = IMAGE_FIELDS[model]
+    name = getattr(instance, field).name or ""
+    current = getattr(instance, f"{field}_variants") or {}
+    if current.get("source") == name or (not name and not current):
+        return
+
+    if not name:
+        model.objects.filter(pk=instance.pk).update(**{f"{field}_variants": {}})
+        invalidate(*CACHE_GROUPS[model])
+        delete_variants(current)
+        return
+
+    from . import jobs
+
+    jobs.enqueue(
+        "build_image_variants",
+        {"model": model._meta.label, "pk": instance.pk, "name": name},
+        key=f"image-variants:{model._meta.label_lower}:{instance.pk}",
+    )
+
+
+def release_files(instance):
+    """Drop a deleted instance's references to its image and variants."""
+    field, _ = IMAGE_FIELDS[type(instance)]
+    name = getattr(instance, field).name
+    if name:
+        from . import jobs
+
+        jobs.delete_file_later(name)
+    delete_variants(getattr(instance, f"{field}_variants") or {})
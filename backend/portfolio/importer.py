@@ -0,0 +1,134 @@
+import json
+
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+
+from . import search
+from .cache import invalidate
+from .models import Article, Certificates, Project, allocate_slugs
+from .serializers import ArticleSerializer, CertificatesSerializer, ProjectSerializer
+
+# Import kind -> (model, serializer validating each row, search index kind)
+IMPORTABLE = {
+    "articles": (Article, ArticleSerializer, "article"),
+    "projects": (Project, ProjectSerializer, "project"),
+    "certificates": (Certificates, CertificatesSerializer, None),
+}
+
+SLUG_RETRIES = 3
+
+
+def _parse(lines):
+    """Yield `(line number, object or None, error)` for the non-blank lines of a JSONL stream."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(data, dict):
+            yield number, None, "Each line must be a JSON object."
+            continue
+        yield number, data, None
+
+
+def _allocate(model, instances, reserved):
+    fresh = [instance for instance in instances if not instance.slug]
+    for instance, slug in zip(fresh, allocate_slugs(model, [instance.title for instance in fresh], reserved)):
+        instance.slug = slug
+    return fresh
+
+
+def _insert(model, batch, reserved):
+    """
+    Bulk insert a batch whose slugs were allocated up front. A slug taken by a
+    concurrent writer in the meantime makes the insert fail with IntegrityError;
+    the batch's generated slugs are then allocated again.
+    """
+    for attempt in range(SLUG_RETRIES):
+        try:
+            with transaction.atomic():
+                return model.objects.bulk_create(batch)
+        except IntegrityError:
+            if attempt == SLUG_RETRIES - 1:
+                raise
+            generated = [instance for instance in batch if instance.slug not in reserved]
+            for instance in generated:
+                instance.slug = ""
+            _allocate(model, generated, reserved)
+
+
+def _fast_text_validation(serializer):
+    """
+    DRF checks every character of every CharField for surrogates in Python,
+    which dominates validating long bodies. Encoding to UTF-8 rejects the
+    same strings at C speed.
+    """
+    for field in serializer.fields.values():
+        validators = [v for v in field.validators if not isinstance(v, ProhibitSurrogateCharactersValidator)]
+        if len(validators) != len(field.validators):
+            field.validators = validators + [_reject_surrogates]
+
+
+def _reject_surrogates(value):
+    try:
+        str(value).encode("utf-8")
+    except UnicodeEncodeError:
+        raise ValidationError("Surrogate characters are not allowed.")
+
+
+def import_content(kind, lines, author=None, batch_size=500):
+    """
+    Validate JSONL rows with the model's API serializer and insert the valid
+    ones with batched `bulk_create` in one transaction. Returns
+    `{"created": n, "errors": [{"line": n, "errors": {...}}, ...]}`; invalid
+    rows are reported and skipped.
+    """
+    model, serializer_class, search_kind = IMPORTABLE[kind]
+    # One serializer validates every row, so its fields are only built once
+    serializer = serializer_class()
+    _fast_text_validation(serializer)
+
+    errors = []
+    instances = []
+    explicit_slugs = set()
+    for number, data, error in _parse(lines):
+        if error:
+            errors.append({"line": number, "errors": {"non_field_errors": [error]}})
+            continue
+        try:
+            validated = serializer.run_validation(data)
+        except ValidationError as exc:
+            errors.append({"line": number, "errors": exc.detail})
+            continue
+
+        slug = validated.get("slug")
+        if slug:
+            if slug in explicit_slugs:
+                errors.append({"line": number, "errors": {"slug": ["Duplicate slug in this import."]}})
+                continue
+            explicit_slugs.add(slug)
+
+        instance = model(**validated)
+        if model is Article:
+            instance.author = author
+        if hasattr(instance, "populate_derived_fields"):
+            instance.populate_derived_fields()
+        instances.append(instance)
+
+    # bulk_create skips save() and the post_save receivers, so the search
+    # index and the response cache are brought up to date here
+    with transaction.atomic():
+        _allocate(model, instances, explicit_slugs)
+        for start in range(0, len(instances), batch_size):
+            _insert(model, instances[start:start + batch_size], explicit_slugs)
+        if search_kind:
+            search.index_many(search_kind, instances)
+    if instances:
+        invalidate(kind)
+
+    return {"created": len(instances), "errors": errors}
@@ -0,0 +1,186 @@
+import logging
+import os
+import random
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+BACKOFF_BASE = 5  # seconds before the first retry, doubled for every further attempt
+BACKOFF_MAX = 60 * 60
+LOCK_TIMEOUT = timedelta(minutes=10)  # a running job older than this is assumed orphaned
+
+
+def task(name):
+    """Register a function as the handler for jobs named `name`. It receives the payload as kwargs."""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, key=None, delay=0, max_attempts=5):
+    """
+    Record a job in the current transaction, so it becomes visible exactly
+    when the change that asked for it commits.
+
+    With a `key`, at most one row exists per key: enqueueing it again swaps in
+    the new payload and re-arms the job. A job that is running at the time
+    stays armed and runs once more with the new payload.
+    """
+    if name not in TASKS:
+        raise ValueError(f"Unknown job task: {name}")
+
+    fields = {
+        "task": name,
+        "payload": payload or {},
+        "status": Job.QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": timezone.now() + timedelta(seconds=delay),
+        "last_error": "",
+    }
+    if key is None:
+        job = Job.objects.create(**fields)
+    else:
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(key=key, **fields)
+        except IntegrityError:
+            Job.objects.filter(key=key).update(**fields, updated_at=timezone.now())
+            job = Job.objects.get(key=key)
+
+    if getattr(settings, "JOB_QUEUE_EAGER", False):
+        transaction.on_commit(lambda: run_job(job.pk))
+    return job
+
+
+def delete_file_later(name):
+    """
+    Queue the release of a reference to a stored file once the current
+    transaction commits. Not keyed: each call drops one reference.
+    """
+    return enqueue("delete_file", {"name": name})
+
+
+def _backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(worker_id):
+    """
+    Atomically take the next due job, or return None. SQLite has no
+    SELECT ... FOR UPDATE SKIP LOCKED, so a candidate is claimed with a
+    conditional UPDATE and the next one tried if another worker won.
+    """
+    now = timezone.now()
+    due = Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_at__lt=now - LOCK_TIMEOUT)
+    for candidate in Job.objects.filter(due).order_by("run_at").values_list("pk", "status", "locked_by")[:10]:
+        pk, job_status, locked_by = candidate
+        claimed = Job.objects.filter(pk=pk, status=job_status, locked_by=locked_by).update(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F("attempts") + 1, updated_at=now
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(pk, worker_id=None):
+    """Claim a specific job (used by eager mode and tests) and run it."""
+    worker_id = worker_id or make_worker_id()
+    now = timezone.now()
+    if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F("attempts") + 1, updated_at=now
+    ):
+        execute(Job.objects.get(pk=pk))
+
+
+def execute(job):
+    """
+    Run a claimed job and record the outcome. Only the claim that is still
+    current may finish the row, so a job re-armed while running stays queued.
+    """
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by)
+    try:
+        handler = TASKS[job.task]
+        handler(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s failed (attempt %s/%s)", job, job.attempts, job.max_attempts)
+        if job.attempts >= job.max_attempts:
+            mine.update(status=Job.FAILED, last_error=error, locked_by="", updated_at=timezone.now())
+        else:
+            mine.update(
+                status=Job.QUEUED, last_error=error, locked_by="",
+                run_at=timezone.now() + _backoff(job.attempts), updated_at=timezone.now(),
+            )
+        return False
+
+    mine.update(status=Job.DONE, locked_by="", updated_at=timezone.now())
+    return True
+
+
+def make_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def run_pending(worker_id=None, limit=None):
+    """Run due jobs until none are left (or `limit` were run). Returns how many ran."""
+    worker_id = worker_id or make_worker_id()
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim(worker_id)
+        if job is None:
+            break
+        execute(job)
+        ran += 1
+    return ran
+
+
+# ----------------------------------------
+# Tasks
+# ----------------------------------------
+
+@task("delete_file")
+def delete_file(name):
+    """Drop a reference to a stored media file; the storage removes it once none are left."""
+    from django.core.files.storage import default_storage
+
+    default_storage.delete(name)
+
+
+@task("build_image_variants")
+def build_image_variants(model, pk, name):
+    from django.apps import apps
+
+    from . import images
+
+    images.build_variants(apps.get_model(model), pk, name)
+
+
+@task("rebuild_search_index")
+def rebuild_search_index():
+    from . import search
+
+    search.rebuild()
+
+
+@task("reconcile_counters")
+def reconcile_counters():
+    from io import StringIO
+
+    from django.core.management import call_command
+
+    call_command("reconcile_counters", stdout=StringIO())
@@ -0,0 +1,88 @@
+import json
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from portfolio import benchmarks
+from portfolio.models import Article, Comment, CustomUser, Project
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every API route through the test client against the current database and record "
+        "p50/p99 latency and query counts per endpoint as JSON, optionally comparing with an earlier run. "
+        "Writes are rolled back. Seed the database with seed_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--output", default="benchmark-results.json", help="Where to write this run's results.")
+        parser.add_argument("--compare", metavar="PATH", help="Results of an earlier run to compare with.")
+        parser.add_argument("--threshold", type=float, default=0.2, help="p50 growth counted as a regression.")
+        parser.add_argument("--fail-on-regression", action="store_true")
+        parser.add_argument(
+            "--cache", action="store_true",
+            help="Keep the response cache on; by default reads measure the views themselves.",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = benchmarks.scenarios()
+        missing = benchmarks.routes() - {scenario.route for scenario in scenarios}
+        if missing:
+            raise CommandError(f"Routes without a benchmark scenario: {', '.join(sorted(missing))}")
+
+        timeout = settings.RESPONSE_CACHE_TIMEOUT if options["cache"] else 0
+        with override_settings(RESPONSE_CACHE_TIMEOUT=timeout, ALLOWED_HOSTS=["testserver"]):
+            endpoints = benchmarks.run(scenarios, options["iterations"], options["warmup"])
+            encoding = benchmarks.encoding()
+
+        run = {
+            "meta": {
+                "finished": datetime.now(timezone.utc).isoformat(),
+                "iterations": options["iterations"],
+                "cache": options["cache"],
+                "rows": {
+                    "users": CustomUser.objects.count(), "articles": Article.objects.count(),
+                    "projects": Project.objects.count(), "comments": Comment.objects.count(),
+                },
+            },
+            "endpoints": endpoints,
+            "encoding": encoding,
+        }
+        with open(options["output"], "w") as output:
+            json.dump(run, output, indent=2)
+
+        self.stdout.write(f"{'endpoint':<52} {'p50 ms':>8} {'p99 ms':>8} {'queries':>8} {'status':>7}")
+        for endpoint, result in endpoints.items():
+            flag = "" if result["status"] == result["expected_status"] else f" (expected {result['expected_status']})"
+            self.stdout.write(
+                f"{endpoint:<52} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['queries']:>8} "
+                f"{result['status']:>7}{flag}"
+            )
+        self.stdout.write("\narticle_list body")
+        for name, result in encoding["renderers"].items():
+            self.stdout.write(f"  encode with {name:<10} {result['p50_ms']:>8.3f} ms {result['bytes']:>9} bytes")
+        for coding, result in encoding["codings"].items():
+            self.stdout.write(f"  send as {coding:<13} {result['p50_ms']:>8.3f} ms {result['bytes']:>9} bytes")
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if options["compare"]:
+            self.report_comparison(options, endpoints)
+
+    def report_comparison(self, options, endpoints):
+        with open(options["compare"]) as baseline:
+            rows = benchmarks.compare(json.load(baseline)["endpoints"], endpoints, options["threshold"])
+
+        self.stdout.write(f"\n{'endpoint':<52} {'p50 before':>10} {'p50 now':>8} {'queries':>9}")
+        regressions = 0
+        for endpoint, p50_before, p50_now, queries_before, queries_now, regressed in rows:
+            regressions += regressed
+            line = (f"{endpoint:<52} {p50_before:>10.2f} {p50_now:>8.2f} "
+                    f"{f'{queries_before}->{queries_now}':>9}")
+            self.stdout.write(self.style.ERROR(line + "  REGRESSED") if regressed else line)
+
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"{regressions} endpoint(s) regressed.")
@@ -0,0 +1,128 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the WSGI app (sync views on a thread pool) with the ASGI app "
+        "(async read views on one event loop) for a read endpoint, with simulated slow clients. "
+        "Runs in process against the configured database, so it needs some content to read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/articles/")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=200, help="Clients in flight at once.")
+        parser.add_argument("--threads", type=int, default=16, help="WSGI worker threads.")
+        parser.add_argument(
+            "--client-delay", type=float, default=0.05,
+            help="Seconds each client takes to read its response (a slow connection).",
+        )
+        parser.add_argument(
+            "--cache", action="store_true",
+            help="Keep the response cache on, so the view's own work is mostly a cache hit.",
+        )
+
+    def handle(self, *args, **options):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT if options["cache"] else 0
+        with override_settings(RESPONSE_CACHE_TIMEOUT=timeout, ALLOWED_HOSTS=["*"]):
+            results = [
+                ("wsgi", self.run_wsgi(options)),
+                ("asgi", asyncio.run(self.run_asgi(options))),
+                ("asgi (sync views)", self.run_asgi_sync_views(options)),
+            ]
+
+        self.stdout.write(f"{options['requests']} x GET {options['path']}, {options['concurrency']} concurrent clients, "
+                          f"{options['client_delay'] * 1000:.0f}ms client read time")
+        self.stdout.write(f"{'server':<18} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'threads':>8}")
+        for name, (elapsed, latencies, errors, threads) in results:
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+            self.stdout.write(
+                f"{name:<18} {len(latencies) / elapsed:>8.0f} {statistics.median(latencies) * 1000:>8.1f} "
+                f"{p99 * 1000:>8.1f} {errors:>7} {threads:>8}"
+            )
+
+    def _environ(self, path):
+        path, _, query = path.partition("?")
+        return {
+            "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query, "SERVER_NAME": "bench",
+            "SERVER_PORT": "80", "HTTP_HOST": "bench", "wsgi.input": BytesIO(), "wsgi.url_scheme": "http",
+            "wsgi.errors": BytesIO(),
+        }
+
+    def run_wsgi(self, options):
+        app = get_wsgi_application()
+        latencies, errors, peak = [], [0], [threading.active_count()]
+        delay = options["client_delay"]
+
+        def one_request(_):
+            started = time.perf_counter()
+            status = []
+            body = b"".join(app(self._environ(options["path"]), lambda s, h: status.append(s)))
+            # The worker thread stays busy until the slow client has read the body
+            time.sleep(delay)
+            latencies.append(time.perf_counter() - started)
+            peak[0] = max(peak[0], threading.active_count())
+            if not status[0].startswith("200") or not body:
+                errors[0] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            list(pool.map(one_request, range(options["requests"])))
+        return time.perf_counter() - started, latencies, errors[0], peak[0]
+
+    async def run_asgi(self, options):
+        app = get_asgi_application()
+        latencies, errors, peak = [], [0], [threading.active_count()]
+        delay = options["client_delay"]
+        limit = asyncio.Semaphore(options["concurrency"])
+        path, _, query = options["path"].partition("?")
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+            "headers": [(b"host", b"bench")], "server": ("bench", 80), "client": ("127.0.0.1", 5000),
+        }
+
+        async def one_request():
+            async with limit:
+                started = time.perf_counter()
+                status = []
+                messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+                async def receive():
+                    if messages:
+                        return messages.pop()
+                    # The client stays connected; Django cancels this wait once it has responded
+                    await asyncio.Future()
+
+                async def send(message):
+                    if message["type"] == "http.response.start":
+                        status.append(message["status"])
+                    elif not message.get("more_body"):
+                        # A slow client holds a coroutine here, not a thread
+                        await asyncio.sleep(delay)
+
+                await app(dict(scope), receive, send)
+                latencies.append(time.perf_counter() - started)
+                peak[0] = max(peak[0], threading.active_count())
+                if status != [200]:
+                    errors[0] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(options["requests"])))
+        return time.perf_counter() - started, latencies, errors[0], peak[0]
+
+    def run_asgi_sync_views(self, options):
+        with override_settings(ASGI_URLCONF=settings.ROOT_URLCONF):
+            return asyncio.run(self.run_asgi(options))
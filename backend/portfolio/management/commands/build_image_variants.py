@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from portfolio import images
+
+
+class Command(BaseCommand):
+    help = "Generate responsive variants for uploaded images that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild variants that already exist.")
+
+    def handle(self, *args, **options):
+        built = 0
+        for model, (field, _) in images.IMAGE_FIELDS.items():
+            rows = model.objects.exclude(**{field: ""}).exclude(**{f"{field}__isnull": True})
+            for pk, name, variants in rows.values_list("pk", field, f"{field}_variants").iterator():
+                if not options["force"] and variants and variants.get("source") == name:
+                    continue
+                try:
+                    images.build_variants(model, pk, name)
+                except Exception as exc:
+                    self.stderr.write(f"{model.__name__} {pk} ({name}): {exc}")
+                    continue
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} images."))
@@ -0,0 +1,40 @@
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.importer import IMPORTABLE, import_content
+
+
+class Command(BaseCommand):
+    help = "Import articles, projects or certificates from a JSON Lines file (one object per line)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORTABLE))
+        parser.add_argument("path", help="JSONL file to read, or - for stdin.")
+        parser.add_argument("--author", help="Username recorded as the author of imported articles.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        author = None
+        if options["author"]:
+            try:
+                author = get_user_model().objects.get(username=options["author"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user named {options['author']!r}.")
+
+        started = time.perf_counter()
+        if options["path"] == "-":
+            result = import_content(options["kind"], sys.stdin, author, options["batch_size"])
+        else:
+            with open(options["path"], encoding="utf-8") as lines:
+                result = import_content(options["kind"], lines, author, options["batch_size"])
+        elapsed = time.perf_counter() - started
+
+        for error in result["errors"]:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} {options['kind']} in {elapsed:.2f}s, {len(result['errors'])} rows rejected."
+        ))
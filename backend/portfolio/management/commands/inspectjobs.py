@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from portfolio.models import Job
+
+
+class Command(BaseCommand):
+    help = "Show the background job queue, and retry or purge jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--failed", action="store_true", help="List failed jobs with their last error.")
+        parser.add_argument("--retry-failed", action="store_true", help="Queue failed jobs again.")
+        parser.add_argument(
+            "--purge-done", type=int, metavar="DAYS", help="Delete finished jobs older than DAYS days."
+        )
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            retried = Job.objects.filter(status=Job.FAILED).update(
+                status=Job.QUEUED, attempts=0, run_at=timezone.now(), updated_at=timezone.now()
+            )
+            self.stdout.write(f"Requeued {retried} failed jobs.")
+
+        if options["purge_done"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["purge_done"])
+            purged, _ = Job.objects.filter(status=Job.DONE, updated_at__lt=cutoff).delete()
+            self.stdout.write(f"Purged {purged} finished jobs.")
+
+        counts = dict(Job.objects.order_by().values_list("status").annotate(total=Count("id")))
+        for job_status, label in Job.STATUS_CHOICES:
+            self.stdout.write(f"{label}: {counts.get(job_status, 0)}")
+
+        due = Job.objects.filter(status=Job.QUEUED, run_at__lte=timezone.now()).count()
+        self.stdout.write(f"Due now: {due}")
+
+        if options["failed"]:
+            for job in Job.objects.filter(status=Job.FAILED).order_by("-updated_at"):
+                error = job.last_error.strip().splitlines()[-1] if job.last_error else ""
+                self.stdout.write(f"#{job.pk} {job.task} {job.payload} after {job.attempts} attempts: {error}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over published articles and projects."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("Full-text search needs the SQLite database backend (FTS5).")
+
+        total = search.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} documents."))
@@ -0,0 +1,42 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from portfolio.models import Article, Comment, Project
+
+
+def count_subquery(queryset, group_by):
+    """Correlated COUNT(*) of `queryset` rows grouped by `group_by`, 0 when empty."""
+    counts = queryset.order_by().values(group_by).annotate(total=Count("id")).values("total")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute comment_count on articles/projects and reply_count on comments, repairing drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report drifted rows without fixing them.")
+
+    def handle(self, *args, **options):
+        targets = [
+            (model, "comment_count", count_subquery(
+                Comment.objects.filter(content_type=ContentType.objects.get_for_model(model), object_id=OuterRef("pk")),
+                "object_id",
+            ))
+            for model in (Article, Project)
+        ]
+        targets.append(
+            (Comment, "reply_count", count_subquery(Comment.objects.filter(parent_comment=OuterRef("pk")), "parent_comment"))
+        )
+
+        with transaction.atomic():
+            for model, field, actual in targets:
+                drifted = model.objects.annotate(actual=actual).exclude(**{field: F("actual")}).values("pk")
+                if options["dry_run"]:
+                    repaired = drifted.count()
+                else:
+                    repaired = model.objects.filter(pk__in=drifted).update(**{field: actual})
+                verb = "drifted" if options["dry_run"] else "repaired"
+                self.stdout.write(f"{model.__name__}.{field}: {repaired} {verb}")
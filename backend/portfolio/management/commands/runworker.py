@@ -0,0 +1,68 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from portfolio import jobs
+
+
+def work(stop, poll_interval):
+    """Worker loop: run due jobs, sleep while the queue is empty, exit once `stop` is set."""
+    # Finish the current job on SIGTERM/SIGINT instead of dying halfway through it
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+    worker_id = jobs.make_worker_id()
+    try:
+        while not stop.is_set():
+            job = jobs.claim(worker_id)
+            if job is None:
+                stop.wait(poll_interval)
+                continue
+            jobs.execute(job)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2, help="Number of worker processes.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Run the jobs that are due in this process, then exit.")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            ran = jobs.run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Ran {ran} jobs."))
+            return
+
+        # Children must not inherit the parent's open SQLite connection
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        stop = context.Event()
+        workers = [
+            context.Process(target=work, args=(stop, options["poll_interval"]), name=f"runworker-{n}")
+            for n in range(options["processes"])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} workers.")
+
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        try:
+            while not stop.is_set():
+                # Replace workers that died so the pool keeps its size
+                for n, worker in enumerate(workers):
+                    if not worker.is_alive():
+                        workers[n] = context.Process(target=work, args=(stop, options["poll_interval"]), name=worker.name)
+                        workers[n].start()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stop.set()
+
+        for worker in workers:
+            worker.join()
+        self.stdout.write("Workers stopped.")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio.models import CustomUser
+from portfolio.seeding import DEFAULT_COUNTS, USERNAME_PREFIX, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate deterministic synthetic users, articles, projects, certificates and threaded comments "
+        "for benchmarks. Run it against an empty database (manage.py flush) for reproducible results."
+    )
+
+    def add_arguments(self, parser):
+        for kind, count in DEFAULT_COUNTS.items():
+            parser.add_argument(f"--{kind}", type=int, default=count)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same data.")
+
+    def handle(self, *args, **options):
+        if CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError("This database already holds seeded data; run manage.py flush first.")
+
+        started = time.perf_counter()
+        created = seed({kind: options[kind] for kind in DEFAULT_COUNTS}, seed=options["seed"])
+        summary = ", ".join(f"{count} {kind}" for kind, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {time.perf_counter() - started:.1f}s."))
@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from portfolio.models import Article, Comment, CustomUser
+from portfolio.querysets import article_list_queryset
+
+PROFILES = {
+    "default": {"OPTIONS": {}, "CONN_MAX_AGE": 0},
+    "production": {"OPTIONS": settings.SQLITE_PRODUCTION_OPTIONS, "CONN_MAX_AGE": 600},
+}
+
+
+def _worker(role, deadline, start, results):
+    """Read article pages or post comments until `deadline`; report counts and latencies."""
+    author = CustomUser.objects.get(username="stress")
+    articles = list(Article.objects.values_list("id", flat=True))
+    done, errors, latencies = 0, 0, []
+    start.wait()
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            if role == "writer":
+                Comment.objects.create(
+                    content_object=Article(pk=articles[done % len(articles)]), author=author, content="Stress"
+                )
+            else:
+                list(article_list_queryset().order_by("-published_date", "-id")[:20])
+        except OperationalError:
+            # "database is locked"
+            errors += 1
+        else:
+            done += 1
+            latencies.append(time.perf_counter() - started)
+        if connection.settings_dict["CONN_MAX_AGE"] == 0:
+            # What the request_finished handler does after each request
+            connection.close()
+    results.put((role, done, errors, latencies))
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent reader and writer processes against a scratch copy of the schema, "
+        "once per SQLite profile, and report throughput and 'database is locked' errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=8, help="Worker processes per run.")
+        parser.add_argument("--writers", type=int, default=2, help="How many of the processes post comments.")
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument("--profile", choices=sorted(PROFILES), action="append", help="Default: both.")
+
+    def handle(self, *args, **options):
+        rows = [(profile, self.run(profile, options)) for profile in options["profile"] or sorted(PROFILES)]
+
+        self.stdout.write(f"{options['processes']} processes ({options['writers']} writing) for {options['seconds']}s")
+        self.stdout.write(
+            f"{'profile':<11} {'reads/s':>8} {'writes/s':>9} {'locked':>7} {'read p99 ms':>12} {'write p99 ms':>13}"
+        )
+        for profile, (reads, writes, errors) in rows:
+            self.stdout.write(
+                f"{profile:<11} {len(reads) / options['seconds']:>8.0f} {len(writes) / options['seconds']:>9.0f} "
+                f"{errors:>7} {self._p99(reads):>12.1f} {self._p99(writes):>13.1f}"
+            )
+
+    def _p99(self, latencies):
+        latencies.sort()
+        return latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0
+
+    def run(self, profile, options):
+        scratch = tempfile.mkdtemp()
+        original = dict(connection.settings_dict)
+        connection.close()
+        connection.settings_dict.update(NAME=os.path.join(scratch, "stress.sqlite3"), **PROFILES[profile])
+        try:
+            call_command("migrate", verbosity=0, interactive=False)
+            author = CustomUser.objects.create(username="stress")
+            for n in range(20):
+                Article.objects.create(title=f"Stress {n}", content="Body " * 200, author=author, is_draft=False)
+            # Children must open their own connections
+            connection.close()
+
+            context = multiprocessing.get_context("fork")
+            start, results = context.Event(), context.Queue()
+            deadline = time.time() + options["seconds"] + 1
+            workers = [
+                context.Process(
+                    target=_worker, args=("writer" if n < options["writers"] else "reader", deadline, start, results)
+                )
+                for n in range(options["processes"])
+            ]
+            for worker in workers:
+                worker.start()
+            # Give the children a moment to connect, then start them together
+            time.sleep(1)
+            start.set()
+
+            reads, writes, errors = [], [], 0
+            for _ in workers:
+                role, done, failed, latencies = results.get()
+                (writes if role == "writer" else reads).extend(latencies)
+                errors += failed
+            for worker in workers:
+                worker.join()
+            return reads, writes, errors
+        finally:
+            connection.close()
+            connection.settings_dict.clear()
+            connection.settings_dict.update(original)
+            shutil.rmtree(scratch)
@@ -0,0 +1,135 @@
+"""
+Serving uploaded media. With MEDIA_SENDFILE set, the response only carries
+an `X-Accel-Redirect` (nginx) or `X-Sendfile` (Apache mod_xsendfile,
+lighttpd) header and the front proxy sends the file, so no worker is tied up
+streaming it. Otherwise Python serves the file itself, answering
+conditional requests and single byte ranges (`Range`, `If-Range`).
+
+Either way, names that contain a content hash (see HASHED_NAME) are cached
+for a year as immutable, and other files for MEDIA_CACHE_MAX_AGE seconds
+before being revalidated, as they can be replaced under the same name.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# A path segment or file name part of at least 32 hex digits: an MD5 or longer digest
+HASHED_NAME = re.compile(r"(?:^|[/._-])[0-9a-f]{32,}(?:[/._-]|$)")
+IMMUTABLE = "public, max-age=31536000, immutable"
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def cache_control(name):
+    if HASHED_NAME.search(name):
+        return IMMUTABLE
+    return f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+
+
+def byte_range(header, size):
+    """
+    `(start, end)` (inclusive) for a `Range` header asking for one range,
+    None to send the whole file (no header, or several ranges), or False if
+    the range can't be satisfied.
+    """
+    match = RANGE.match(header.replace(" ", "")) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # The last N bytes
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length and size else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    return (start, end) if start <= end else False
+
+
+def _read_range(path, start, length):
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _offload(path, name):
+    response = HttpResponse()
+    if settings.MEDIA_SENDFILE == "x-accel-redirect":
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+    else:
+        response["X-Sendfile"] = path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve the file at `path` under MEDIA_ROOT."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404("No such file.")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404("No such file.")
+
+    size = stat_result.st_size
+    mtime = int(stat_result.st_mtime)
+    etag = f'"{stat_result.st_mtime_ns:x}-{size:x}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(path)
+        if settings.MEDIA_SENDFILE:
+            # The proxy answers Range requests itself
+            response = _offload(full_path, path)
+        else:
+            response = _python_response(request, full_path, size, etag, mtime)
+        if response.status_code != 416:
+            response["Content-Type"] = content_type or "application/octet-stream"
+            if encoding:
+                response["Content-Encoding"] = encoding
+
+    response["Cache-Control"] = cache_control(path)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    response["Accept-Ranges"] = "bytes"
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+def _python_response(request, full_path, size, etag, mtime):
+    requested = byte_range(request.headers.get("Range"), size)
+    if_range = request.headers.get("If-Range")
+    if requested is not None and if_range and if_range != etag and parse_http_date_safe(if_range) != mtime:
+        # The client's copy is stale; send the whole current file
+        requested = None
+
+    if requested is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    if requested is None:
+        # Full files go through the server's wsgi.file_wrapper (sendfile) when it has one
+        return FileResponse(open(full_path, "rb"))
+
+    start, end = requested
+    response = StreamingHttpResponse(_read_range(full_path, start, end - start + 1), status=206)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+    return response
@@ -0,0 +1,303 @@
+"""
+Request metrics aggregated across worker processes.
+
+Each process counts into an in-memory store guarded by its own lock, which
+is all the request path touches, and at most every METRICS_FLUSH_INTERVAL
+seconds writes a snapshot to its own file in METRICS_DIR (write to a temp
+file, then rename, so readers never see a partial file). `/metrics` sums the
+files of every process, so no lock is ever shared between workers. A
+scrape folds the files of exited workers into one `retired.json` (under a
+file lock, so concurrent scrapes don't count them twice), which keeps the
+counters monotonic across worker restarts without the directory growing
+with every recycled worker. Clear the directory when deploying.
+"""
+import atexit
+import bisect
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited workers' files are only summed, never folded
+    fcntl = None
+
+from . import cache as response_cache
+from .authentication import user_cache
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RETIRED = "retired.json"
+SNAPSHOT_NAME = re.compile(r"^(\d+)-(\d+)\.json$")
+
+_lock = threading.Lock()
+# Held while snapshotting and writing, so an older snapshot never replaces a newer one
+_write_lock = threading.Lock()
+_store = None
+
+
+class _Store:
+    def __init__(self):
+        self.pid = os.getpid()
+        # Unique per process lifetime, so a reused pid doesn't overwrite a dead worker's file
+        self.filename = f"{self.pid}-{time.time_ns()}.json"
+        self.requests = defaultdict(int)  # (route, status) -> count
+        self.latency = {}  # route -> [count per bucket..., +Inf count, sum of seconds]
+        self.queries = defaultdict(lambda: [0, 0.0])  # route -> [statements, seconds]
+        self.flushed_at = 0.0
+
+    def snapshot(self):
+        return {
+            "requests": [[route, status, count] for (route, status), count in self.requests.items()],
+            "latency": self.latency,
+            "queries": self.queries,
+            "caches": {
+                "response": response_cache.get_stats(),
+                "auth_user": {"hits": user_cache.hits, "misses": user_cache.misses},
+            },
+        }
+
+
+def _current_store():
+    # Called with _lock held. A forked worker starts with its own, empty store.
+    global _store
+    if _store is None or _store.pid != os.getpid():
+        _store = _Store()
+    return _store
+
+
+def observe(route, status, seconds, queries, db_seconds):
+    """Record one finished request."""
+    with _lock:
+        store = _current_store()
+        store.requests[route, status] += 1
+        histogram = store.latency.get(route)
+        if histogram is None:
+            histogram = store.latency[route] = [0] * (len(BUCKETS) + 1) + [0.0]
+        histogram[bisect.bisect_left(BUCKETS, seconds)] += 1
+        histogram[-1] += seconds
+        totals = store.queries[route]
+        totals[0] += queries
+        totals[1] += db_seconds
+
+        due = time.monotonic() - store.flushed_at >= settings.METRICS_FLUSH_INTERVAL
+    # Another thread already writing will include this request
+    if due and _write_lock.acquire(blocking=False):
+        try:
+            _flush()
+        finally:
+            _write_lock.release()
+
+
+def flush():
+    """Write this process's snapshot now."""
+    with _write_lock:
+        _flush()
+
+
+def reset():
+    """Forget this process's counters without writing them (used by the tests)."""
+    global _store
+    with _lock:
+        _store = None
+
+
+def _write(name, payload):
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=settings.METRICS_DIR, prefix=".tmp-")
+    with os.fdopen(fd, "w") as temp:
+        temp.write(payload)
+    os.replace(temp_path, os.path.join(settings.METRICS_DIR, name))
+
+
+def _flush():
+    with _lock:
+        store = _current_store()
+        store.flushed_at = time.monotonic()
+        filename, payload = store.filename, json.dumps(store.snapshot())
+    _write(filename, payload)
+
+
+def _read(name):
+    try:
+        with open(os.path.join(settings.METRICS_DIR, name)) as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _empty():
+    return {
+        "requests": defaultdict(int),
+        "latency": {},
+        "queries": defaultdict(lambda: [0, 0.0]),
+        "caches": defaultdict(lambda: {"hits": 0, "misses": 0}),
+    }
+
+
+def _add(totals, snapshot):
+    for route, status, count in snapshot["requests"]:
+        totals["requests"][route, status] += count
+    for route, histogram in snapshot["latency"].items():
+        merged = totals["latency"].setdefault(route, [0] * len(histogram))
+        totals["latency"][route] = [a + b for a, b in zip(merged, histogram)]
+    for route, (statements, seconds) in snapshot["queries"].items():
+        totals["queries"][route][0] += statements
+        totals["queries"][route][1] += seconds
+    for cache_name, stats in snapshot["caches"].items():
+        totals["caches"][cache_name]["hits"] += stats["hits"]
+        totals["caches"][cache_name]["misses"] += stats["misses"]
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _exited(names):
+    """Snapshot files whose process has exited: its pid is gone, or a newer file has the same pid."""
+    newest = {}
+    for name in names:
+        match = SNAPSHOT_NAME.match(name)
+        if match:
+            pid, started = int(match[1]), int(match[2])
+            newest[pid] = max(newest.get(pid, started), started)
+    exited = []
+    for name in names:
+        match = SNAPSHOT_NAME.match(name)
+        if match:
+            pid, started = int(match[1]), int(match[2])
+            if started < newest[pid] or (pid != os.getpid() and not _alive(pid)):
+                exited.append(name)
+    return exited
+
+
+@contextmanager
+def _directory_lock():
+    # Serializes scrapes, so one never reads files another is folding
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(settings.METRICS_DIR, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _as_snapshot(totals):
+    return {
+        "requests": [[route, status, count] for (route, status), count in totals["requests"].items()],
+        "latency": totals["latency"],
+        "queries": totals["queries"],
+        "caches": totals["caches"],
+    }
+
+
+def _retire(names):
+    """
+    Fold the snapshots of exited processes into RETIRED and remove them.
+    Called with the directory lock held. The folded names are written along
+    with the totals first, so if removing them fails they're skipped, not
+    counted again, and removed next time.
+    """
+    retired = _read(RETIRED) or {"requests": [], "latency": {}, "queries": {}, "caches": {}}
+    folded = set(retired.pop("folded", ()))
+    exited = [name for name in _exited(names) if name not in folded]
+    if not exited and not folded:
+        return
+
+    totals = _empty()
+    _add(totals, retired)
+    for name in exited:
+        snapshot = _read(name)
+        if snapshot is not None:
+            _add(totals, snapshot)
+            folded.add(name)
+    retired = _as_snapshot(totals)
+    _write(RETIRED, json.dumps({**retired, "folded": sorted(folded)}))
+    for name in folded:
+        try:
+            os.remove(os.path.join(settings.METRICS_DIR, name))
+        except FileNotFoundError:
+            pass
+    _write(RETIRED, json.dumps(retired))
+
+
+def collect():
+    """Sum the snapshots of every process, including a fresh one of this process."""
+    flush()
+    totals = _empty()
+    with _directory_lock():
+        if fcntl is not None:
+            _retire(os.listdir(settings.METRICS_DIR))
+        for name in os.listdir(settings.METRICS_DIR):
+            if not name.endswith(".json"):
+                continue
+            snapshot = _read(name)
+            if snapshot is not None:
+                _add(totals, snapshot)
+    return totals
+
+
+def render(metrics):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        "# HELP portfolio_requests_total Requests by route and status code.",
+        "# TYPE portfolio_requests_total counter",
+    ]
+    for (route, status), count in sorted(metrics["requests"].items()):
+        lines.append(f'portfolio_requests_total{{route="{route}",status="{status}"}} {count}')
+
+    lines += [
+        "# HELP portfolio_request_duration_seconds Request latency by route.",
+        "# TYPE portfolio_request_duration_seconds histogram",
+    ]
+    for route, histogram in sorted(metrics["latency"].items()):
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), histogram[:-1]):
+            cumulative += count
+            lines.append(f'portfolio_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+        lines.append(f'portfolio_request_duration_seconds_sum{{route="{route}"}} {histogram[-1]:.6f}')
+        lines.append(f'portfolio_request_duration_seconds_count{{route="{route}"}} {cumulative}')
+
+    lines += [
+        "# HELP portfolio_db_queries_total SQL statements run by requests, by route.",
+        "# TYPE portfolio_db_queries_total counter",
+    ]
+    lines += [f'portfolio_db_queries_total{{route="{route}"}} {statements}'
+              for route, (statements, _) in sorted(metrics["queries"].items())]
+    lines += [
+        "# HELP portfolio_db_query_seconds_total Time spent in SQL by requests, by route.",
+        "# TYPE portfolio_db_query_seconds_total counter",
+    ]
+    lines += [f'portfolio_db_query_seconds_total{{route="{route}"}} {seconds:.6f}'
+              for route, (_, seconds) in sorted(metrics["queries"].items())]
+
+    lines += [
+        "# HELP portfolio_cache_requests_total Cache lookups by cache and result.",
+        "# TYPE portfolio_cache_requests_total counter",
+    ]
+    for cache_name, stats in sorted(metrics["caches"].items()):
+        lines.append(f'portfolio_cache_requests_total{{cache="{cache_name}",result="hit"}} {stats["hits"]}')
+        lines.append(f'portfolio_cache_requests_total{{cache="{cache_name}",result="miss"}} {stats["misses"]}')
+    return "\n".join(lines) + "\n"
+
+
+@atexit.register
+def _flush_at_exit():
+    if _store is not None and _store.pid == os.getpid():
+        try:
+            flush()
+        except OSError:
+            pass
@@ -0,0 +1,124 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics as fleet_metrics, timing
+from .compression import compress_response
+
+slow_request_logger = logging.getLogger("portfolio.slow_requests")
+
+
+@sync_and_async_middleware
+def AsgiRoutingMiddleware(get_response):
+    """
+    Resolve requests served over ASGI against `settings.ASGI_URLCONF`, which
+    puts the async read views (portfolio.async_views) in front of the sync
+    ones. Under WSGI the sync views are kept: running an async view there
+    would start an event loop per request.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            request.urlconf = settings.ASGI_URLCONF
+            return await get_response(request)
+    else:
+        def middleware(request):
+            return get_response(request)
+    return middleware
+
+
+@sync_and_async_middleware
+def CompressionMiddleware(get_response):
+    """
+    Compress JSON and text responses with brotli or gzip, as negotiated
+    through Accept-Encoding (see portfolio.compression). Streaming responses,
+    sync or async, are compressed as they are sent.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            return compress_response(request, await get_response(request))
+    else:
+        def middleware(request):
+            return compress_response(request, get_response(request))
+    return middleware
+
+
+class ServerTimingMiddleware:
+    """
+    Report where a request's time went in a `Server-Timing` header: `db`
+    (SQL time, with the statement count), `serialize` (serializer output),
+    `view` (from view dispatch until the response is back here, so it
+    includes db, serialize and rendering) and `total`. Requests slower than
+    SLOW_REQUEST_THRESHOLD_MS are logged to `portfolio.slow_requests` as JSON
+    with their slowest and repeated statements. Every request is also counted
+    in the cross-process metrics served at /metrics.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # A sync process_view would cost a thread hop per request under ASGI
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings, token = timing.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = timing.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.stop(token)
+        return self.report(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing.current().view_started = time.perf_counter()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        timing.current().view_started = time.perf_counter()
+
+    def report(self, request, response, timings):
+        now = time.perf_counter()
+        total = (now - timings.started) * 1000
+        db = timings.db * 1000
+        metrics = [f'db;dur={db:.1f};desc="{len(timings.queries)} queries"', f"serialize;dur={timings.serialize * 1000:.1f}"]
+        if timings.view_started is not None:
+            metrics.append(f"view;dur={(now - timings.view_started) * 1000:.1f}")
+        metrics.append(f"total;dur={total:.1f}")
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = ", ".join(metrics)
+
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        fleet_metrics.observe(route, response.status_code, total / 1000, len(timings.queries), timings.db)
+
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        if threshold is not None and total >= threshold:
+            slow_request_logger.warning(json.dumps({
+                "method": request.method,
+                "path": request.get_full_path(),
+                "status": response.status_code,
+                "total_ms": round(total, 1),
+                "view_ms": round((now - timings.view_started) * 1000, 1) if timings.view_started else None,
+                "serialize_ms": round(timings.serialize * 1000, 1),
+                "db_ms": round(db, 1),
+                "queries": len(timings.queries),
+                "slowest_queries": timings.slowest_queries(),
+                "duplicate_queries": timings.duplicate_queries(),
+            }))
+        return response
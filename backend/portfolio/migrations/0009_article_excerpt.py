@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+def backfill_excerpts(apps, schema_editor):
+    Article = apps.get_model('portfolio', 'Article')
+    articles = list(Article.objects.only('id', 'content'))
+    for article in articles:
+        words = strip_tags(article.content or '').split()
+        article.excerpt = Truncator(' '.join(words)).chars(280)
+        article.word_count = len(words)
+    Article.objects.bulk_update(articles, ['excerpt', 'word_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0008_comment_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=280),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
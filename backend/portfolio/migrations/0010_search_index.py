@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    Article = apps.get_model('portfolio', 'Article')
+    Project = apps.get_model('portfolio', 'Project')
+
+    rows = [
+        (article.id * 2, article.title, strip_tags(article.content), article.slug)
+        for article in Article.objects.filter(is_draft=False)
+    ] + [
+        (project.id * 2 + 1, project.title,
+         f"{project.description} {' '.join(str(tech) for tech in project.technologies or [])}", project.slug)
+        for project in Project.objects.filter(is_draft=False)
+    ]
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS portfolio_search_index "
+            "USING fts5(title, body, slug UNINDEXED, prefix = '2 3', "
+            "tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+        cursor.executemany(
+            "INSERT INTO portfolio_search_index (rowid, title, body, slug) VALUES (%s, %s, %s, %s)", rows
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS portfolio_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0009_article_excerpt'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
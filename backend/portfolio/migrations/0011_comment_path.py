@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    Comment = apps.get_model('portfolio', 'Comment')
+    comments = list(Comment.objects.order_by('id').only('id', 'parent_comment_id'))
+    by_id = {comment.id: comment for comment in comments}
+
+    def path_of(comment):
+        if not comment.path:
+            parent = by_id.get(comment.parent_comment_id)
+            comment.path = (path_of(parent) if parent else '') + f'{comment.id:012d}/'
+        return comment.path
+
+    for comment in comments:
+        path_of(comment)
+    Comment.objects.bulk_update(comments, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('portfolio', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=1024),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['content_type', 'object_id', 'path'], name='comment_target_path_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:32
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Comment = apps.get_model('portfolio', 'Comment')
+
+    def count_of(queryset, group_by):
+        counts = queryset.order_by().values(group_by).annotate(total=Count('id')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    for model_name in ('article', 'project'):
+        content_type = ContentType.objects.filter(app_label='portfolio', model=model_name).first()
+        if content_type is None:
+            continue
+        apps.get_model('portfolio', model_name).objects.update(comment_count=count_of(
+            Comment.objects.filter(content_type=content_type, object_id=OuterRef('pk')), 'object_id'
+        ))
+    Comment.objects.update(reply_count=count_of(Comment.objects.filter(parent_comment=OuterRef('pk')), 'parent_comment'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('portfolio', '0011_comment_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['comment_count', 'published_date', 'id'], name='article_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['comment_count', 'published_date', 'id'], name='project_activity_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:54
+
+from django.db import migrations, models
+
+
+def backfill_avatar_urls(apps, schema_editor):
+    CustomUser = apps.get_model('portfolio', 'CustomUser')
+    SocialAccount = apps.get_model('socialaccount', 'SocialAccount')
+
+    google_pictures = {}
+    for user_id, extra_data in SocialAccount.objects.filter(provider='google').values_list('user_id', 'extra_data'):
+        google_pictures.setdefault(user_id, (extra_data or {}).get('picture'))
+
+    users = []
+    for user in CustomUser.objects.only('id', 'profile_picture').iterator(chunk_size=1000):
+        user.avatar_url = (user.profile_picture.url if user.profile_picture else google_pictures.get(user.id)) or ''
+        if user.avatar_url:
+            users.append(user)
+    CustomUser.objects.bulk_update(users, ['avatar_url'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0014_job_queue'),
+        ('socialaccount', '0006_alter_socialaccount_extra_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='avatar_url',
+            field=models.CharField(blank=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.RunPython(backfill_avatar_urls, migrations.RunPython.noop),
+    ]
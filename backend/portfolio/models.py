@@ -1,18 +1,104 @@
-from django.db import models
-from django.utils.text import slugify
+from django.db import connection, models
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils.html import strip_tags
+from django.utils.text import Truncator, slugify
 from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from django.contrib.contenttypes.models import ContentType
-from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.utils.translation import gettext_lazy as _
-import uuid
+
+
+EXCERPT_LENGTH = 280
+
+
+def summarize_content(content):
+    """ Return the plain-text excerpt and word count stored alongside an article body. """
+    words = strip_tags(content or "").split()
+    return Truncator(" ".join(words)).chars(EXCERPT_LENGTH), len(words)
+
+
+SLUG_MAX_LENGTH = 255
+
+
+def allocate_slugs(model, titles, reserved=()):
+    """
+    Return a unique slug for each title, numbering repeats ("title", "title-2",
+    ...). Existing slugs are read with one prefix query per few hundred
+    distinct titles, so allocating for a whole import costs a round trip or
+    two rather than a lookup per row. `reserved` slugs are treated as taken.
+    """
+    # Leave room for a numeric suffix within the column
+    bases = [slugify(title)[:SLUG_MAX_LENGTH - 8].strip("-") or model._meta.model_name for title in titles]
+    distinct = sorted(set(bases))
+
+    used = set(reserved)
+    for start in range(0, len(distinct), 300):
+        # Range conditions rather than LIKE, so each one is a seek on the
+        # slug's unique index. "~" sorts after every character a slug can hold.
+        prefix = models.Q()
+        for base in distinct[start:start + 300]:
+            prefix |= models.Q(slug__gte=base, slug__lt=base + "~")
+        used.update(model.objects.filter(prefix).order_by().values_list("slug", flat=True))
+
+    slugs = []
+    next_number = {}
+    for base in bases:
+        slug = base
+        if slug in used:
+            number = next_number.get(base, 2)
+            while f"{base}-{number}" in used:
+                number += 1
+            next_number[base] = number + 1
+            slug = f"{base}-{number}"
+        used.add(slug)
+        slugs.append(slug)
+    return slugs
 
 
 class CustomUser(AbstractUser):
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Denormalized from profile_picture and the Google account picture, so
+    # serializers and token minting never query for it
+    avatar_url = models.CharField(max_length=1024, blank=True, default="", editable=False)
 
     def __str__(self):
         return self.username
+
+    def resolve_avatar_url(self):
+        """The uploaded picture's URL, else the Google account picture, else ""."""
+        if self.profile_picture:
+            return self.profile_picture.url
+        if self.pk is None:
+            return ""
+        account = self.socialaccount_set.filter(provider="google").only("extra_data").first()
+        return (account.extra_data.get("picture") if account else None) or ""
+
+    def refresh_avatar_url(self):
+        """
+        Recompute `avatar_url` and write it with an UPDATE, bypassing save()
+        and its signals. Returns True if it changed.
+        """
+        avatar_url = self.resolve_avatar_url()
+        if avatar_url == self.avatar_url:
+            return False
+        self.avatar_url = avatar_url
+        type(self).objects.filter(pk=self.pk).update(avatar_url=avatar_url)
+        return True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "profile_picture" in update_fields:
+            picture = self.profile_picture
+            if picture and not picture._committed:
+                # Store a new upload now (as pre_save would), so its final URL is known
+                picture.save(picture.name, picture.file, save=False)
+            self.avatar_url = self.resolve_avatar_url()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "avatar_url"}
+        super().save(*args, **kwargs)
     
 class Profile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
@@ -25,6 +111,7 @@ class Certificates(models.Model):
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField()
     certificate_image = models.ImageField(upload_to="certificates/", null=True, blank=True)
+    certificate_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     issued_by = models.CharField(max_length=255)
     issue_date = models.DateField()
     expiration_date = models.DateField(null=True, blank=True)
@@ -38,11 +125,7 @@ class Certificates(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            while Certificates.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{uuid.uuid4().hex[:6]}"
-            self.slug = slug
+            self.slug, = allocate_slugs(type(self), [self.title])
 
         super().save(*args, **kwargs)
 
@@ -65,6 +148,7 @@ class Project(models.Model):
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField()
     project_image = models.ImageField(upload_to="projects/", null=True, blank=True)
+    project_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     technologies = models.JSONField(default=list, blank=True)
     github_link = models.URLField(blank=True, null=True)
     live_demo = models.URLField(blank=True, null=True)
@@ -73,26 +157,36 @@ class Project(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     published_date = models.DateTimeField(null=True, blank=True)
     is_draft = models.BooleanField(default=True)
+    comments = GenericRelation("Comment", related_query_name="project")
+    # All comments including replies, kept in step by the comment views
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["-published_date"]
+        indexes = [
+            models.Index(fields=["published_date", "id"], name="project_published_id_idx"),
+            models.Index(fields=["comment_count", "published_date", "id"], name="project_activity_idx"),
+            # project_list filters (see filters.py). Only staff list drafts, which
+            # sort last in published order, so they get a small index of their own.
+            models.Index(fields=["category", "published_date", "id"], name="project_category_idx"),
+            models.Index(fields=["published_date", "id"], condition=Q(is_draft=True), name="project_drafts_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            while Project.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{uuid.uuid4().hex[:6]}"
-            self.slug = slug
+            self.slug, = allocate_slugs(type(self), [self.title])
+
+        self.populate_derived_fields()
+        super().save(*args, **kwargs)
 
+    def populate_derived_fields(self):
+        """ Fill the fields computed on save; also used for bulk inserts, which bypass save(). """
         if not self.is_draft and not self.published_date:
             self.published_date = timezone.now()
 
-        super().save(*args, **kwargs)
-
     def get_category_display(self):
         """ Get the human-readable category name. """
         return dict(self.PROJECT_CATEGORIES).get(self.category, "Other")
@@ -117,30 +211,51 @@ class Article(models.Model):
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     content = models.TextField()
     article_image = models.ImageField(upload_to="articles/", null=True, blank=True)
-    author = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, related_name="articles", null=True)
+    # Resized copies and blur placeholder, filled in by portfolio.images
+    article_image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    # Looked up through article_author_idx, which leads with this column
+    author = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, related_name="articles", null=True, db_index=False
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_date = models.DateTimeField(null=True, blank=True)
     is_draft = models.BooleanField(default=True)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default="other")
+    comments = GenericRelation("Comment", related_query_name="article")
+    # All comments including replies, kept in step by the comment views
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["-published_date"]
+        indexes = [
+            models.Index(fields=["published_date", "id"], name="article_published_id_idx"),
+            models.Index(fields=["comment_count", "published_date", "id"], name="article_activity_idx"),
+            # article_list filters (see filters.py). Only staff list drafts, which
+            # sort last in published order, so they get a small index of their own.
+            models.Index(fields=["category", "published_date", "id"], name="article_category_idx"),
+            models.Index(fields=["author", "published_date", "id"], name="article_author_idx"),
+            models.Index(fields=["published_date", "id"], condition=Q(is_draft=True), name="article_drafts_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            while Article.objects.filter(slug=slug).exists():  
-                slug = f"{base_slug}-{uuid.uuid4().hex[:6]}"
-            self.slug = slug
+            self.slug, = allocate_slugs(type(self), [self.title])
 
+        self.populate_derived_fields()
+        super().save(*args, **kwargs)
+
+    def populate_derived_fields(self):
+        """ Fill the fields computed on save; also used for bulk inserts, which bypass save(). """
         if self.is_draft:
             self.published_date = None
         elif not self.published_date:
             self.published_date = timezone.now()
 
-        super().save(*args, **kwargs)
+        # Stored so list views never have to load the full body
+        self.excerpt, self.word_count = summarize_content(self.content)
     
     def get_category_display(self):
         """ Get the human-readable category name. """
@@ -157,9 +272,131 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     
-    # Parent comment field to support replies
-    parent_comment = models.ForeignKey('self', null=True, blank=True, related_name='replies', on_delete=models.CASCADE)
+    # Parent comment field to support replies. Looked up through
+    # comment_parent_created_idx, which leads with this column
+    parent_comment = models.ForeignKey(
+        'self', null=True, blank=True, related_name='replies', on_delete=models.CASCADE, db_index=False
+    )
+
+    # Materialized path: the zero-padded ids of every ancestor and of the comment
+    # itself, e.g. "000000000012/000000000045/". Sorting by path yields a thread
+    # in depth-first order and a subtree is a single path range.
+    path = models.CharField(max_length=1024, blank=True, editable=False, db_index=True)
+    # Direct replies only
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+
+    PATH_STEP_WIDTH = 12
+
+    class Meta:
+        indexes = [
+            # comment_thread: a whole thread in path order
+            models.Index(fields=["content_type", "object_id", "path"], name="comment_target_path_idx"),
+            # comment_list_create: filter by target object, newest first
+            models.Index(fields=["content_type", "object_id", "created_at", "id"], name="comment_target_created_idx"),
+            # get_replies: filter by parent, newest first
+            models.Index(fields=["parent_comment", "created_at", "id"], name="comment_parent_created_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        # The path ends with our own id, so it can only be set once we have one
+        if not self.path:
+            parent_path = self.parent_comment.path if self.parent_comment_id else ""
+            self.path = f"{parent_path}{self.pk:0{self.PATH_STEP_WIDTH}d}/"
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+    def adjust_counters(self, delta):
+        """
+        Move the commented object's `comment_count` by `delta` (the number of
+        comments added or removed) and the parent's `reply_count` by one in the
+        same direction. Runs as UPDATE ... SET x = x + n, so concurrent
+        requests can't lose increments.
+        """
+        model_class = ContentType.objects.get_for_id(self.content_type_id).model_class()
+        model_class.objects.filter(pk=self.object_id).update(
+            comment_count=Greatest(F("comment_count") + delta, 0)
+        )
+        if self.parent_comment_id:
+            Comment.objects.filter(pk=self.parent_comment_id).update(
+                reply_count=Greatest(F("reply_count") + (1 if delta > 0 else -1), 0)
+            )
+
+    @property
+    def depth(self):
+        """ Zero for top-level comments, one for direct replies, and so on. """
+        return self.path.count("/") - 1
+
+    def delete_subtree(self):
+        """
+        Delete this comment and every reply beneath it with one DELETE on the
+        path range, instead of the collector's query per level. Signals are
+        not sent for the removed rows. Returns the number of deleted comments.
+
+        A comment without a path (from `bulk_create`, or whose path UPDATE
+        never ran) would turn the range into every comment in the table, so
+        it falls back to the collector, which follows `parent_comment` instead.
+        """
+        if not self.path:
+            _, deleted = self.delete()
+            return deleted.get(Comment._meta.label, 0)
+        # Descendant paths continue with digits, all of which sort below ":"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {Comment._meta.db_table} WHERE path >= %s AND path < %s",
+                [self.path, self.path + ":"],
+            )
+            return cursor.rowcount
 
     def __str__(self):
         content_preview = self.content[:50] + "..." if len(self.content) > 50 else self.content
-        return f"Comment by {self.author} on {self.content_object} - {content_preview}"
\ No newline at end of file
+        return f"Comment by {self.author} on {self.content_object} - {content_preview}"
+
+class Job(models.Model):
+    """ A unit of deferred work, run by `manage.py runworker` (see portfolio.jobs). """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Optional idempotency key: enqueueing an existing key re-arms that job instead of adding one
+    key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "next due job" lookup
+            models.Index(fields=["status", "run_at"], name="job_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class MediaBlob(models.Model):
+    """ A file in content-addressed media storage and how many fields refer to it (see portfolio.storage). """
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
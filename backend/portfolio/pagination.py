@@ -0,0 +1,177 @@
+import base64
+import json
+
+from django.core.paginator import InvalidPage, Page
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset()` for async views: the count and the page are fetched with the async ORM."""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Seed the paginator's cached count so page validation runs no query
+        paginator.__dict__["count"] = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        offset = (number - 1) * page_size
+        rows = [row async for row in queryset[offset:offset + page_size]]
+        self.page = Page(rows, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return rows
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on `(ordering_field, id)`, newest first.
+
+    Each page is fetched with a `WHERE (field, id) < (last_field, last_id)`
+    style predicate instead of `OFFSET`, and no `COUNT(*)` is run, so deep
+    pages cost the same as the first one. The ordering field may be nullable;
+    NULL rows sort after every dated row, matching `-published_date`. They are
+    fetched by a separate query once the dated rows run out, as an `OR ...
+    IS NULL` term would keep the database from seeking to the cursor.
+    """
+
+    page_size = 10
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering_field):
+        self.ordering_field = ordering_field
+
+    def paginate_queryset(self, queryset, request, view=None):
+        rows = []
+        for part in self._page_querysets(queryset, request):
+            # Fetch one extra row to find out whether there is another page.
+            rows += part[:self.page_size + 1 - len(rows)]
+            if len(rows) > self.page_size:
+                break
+        return self._paginate(rows)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset()` for async views."""
+        rows = []
+        for part in self._page_querysets(queryset, request):
+            rows += [row async for row in part[:self.page_size + 1 - len(rows)]]
+            if len(rows) > self.page_size:
+                break
+        return self._paginate(rows)
+
+    def _page_querysets(self, queryset, request):
+        """The querysets that make up the page, in order; each one only fills what the previous left."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(request)
+        self.reverse = reverse
+        self.has_cursor = position is not None
+
+        field = self.ordering_field
+        if reverse:
+            ordering = (F(field).asc(nulls_first=True), "id")
+        else:
+            ordering = (F(field).desc(nulls_last=True), "-id")
+
+        queryset = queryset.order_by(*ordering)
+        if position is None:
+            return [queryset]
+        nullable = queryset.model._meta.get_field(field).null
+        return [queryset.filter(segment) for segment in self._position_filters(*position, reverse, nullable)]
+
+    def _paginate(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.has_cursor
+
+        self.page = results
+        return results
+
+    def _position_filters(self, value, pk, reverse, nullable):
+        """
+        Filters for the rows past the cursor, one per query. The bound on the
+        field itself (`lte`/`gte`) lets the index seek; without it the OR
+        makes the database walk the index from the start.
+        """
+        field = self.ordering_field
+        if not reverse:
+            if value is None:
+                return [Q(**{f"{field}__isnull": True, "id__lt": pk})]
+            dated = Q(**{f"{field}__lte": value}) & (Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk}))
+            return [dated, Q(**{f"{field}__isnull": True})] if nullable else [dated]
+        if value is None:
+            return [Q(**{f"{field}__isnull": True, "id__gt": pk}), Q(**{f"{field}__isnull": False})]
+        return [Q(**{f"{field}__gte": value}) & (Q(**{f"{field}__gt": value}) | Q(**{field: value, "id__gt": pk}))]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            value = data["v"]
+            if value is not None:
+                value = parse_datetime(value)
+                if value is None:
+                    raise ValueError(data["v"])
+            return (value, int(data["id"])), bool(data.get("r"))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        value = getattr(instance, self.ordering_field)
+        data = {"v": value.isoformat() if value is not None else None, "id": instance.pk}
+        if reverse:
+            data["r"] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode("ascii"))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode("ascii"))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+
+def get_paginator(request, ordering_field):
+    """
+    Pick the paginator for a list endpoint. Clients opt into keyset mode by
+    sending a `cursor` query parameter (empty for the first page); otherwise
+    the numbered pagination stays in place.
+    """
+    if KeysetPagination.cursor_query_param in request.query_params:
+        return KeysetPagination(ordering_field)
+    return StandardResultsSetPagination()
@@ -0,0 +1,21 @@
+from .models import Article, Comment, Project
+
+
+def comment_queryset():
+    """Comments with their author and target object."""
+    return Comment.objects.select_related("author").prefetch_related("content_object")
+
+
+def article_queryset():
+    """Articles with everything `ArticleSerializer` reads loaded up front."""
+    return Article.objects.select_related("author")
+
+
+def article_list_queryset():
+    """Articles for `ArticleListSerializer`: no `content` column."""
+    return Article.objects.select_related("author").defer("content")
+
+
+def project_queryset():
+    """Projects for `ProjectSerializer`, which reads no relations."""
+    return Project.objects.all()
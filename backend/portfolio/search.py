@@ -0,0 +1,158 @@
+import re
+
+from django.db import connection, transaction
+from django.utils.html import escape, strip_tags
+
+from .models import Article, Project
+
+SEARCH_TABLE = "portfolio_search_index"
+INSERT_SQL = f"INSERT INTO {SEARCH_TABLE} (rowid, title, body, slug) VALUES (%s, %s, %s, %s)"
+
+# Articles and projects share one FTS5 table. Their rows are keyed by
+# rowid = object id * 2 + kind, so updates and deletes are primary-key lookups.
+KINDS = ("article", "project")
+
+# Highlight markers that cannot occur in indexed text; swapped for <mark>
+# after the snippet has been HTML-escaped.
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_available():
+    return connection.vendor == "sqlite"
+
+
+def _rowid(kind, object_id):
+    return object_id * 2 + KINDS.index(kind)
+
+
+def _article_document(article):
+    return article.title, strip_tags(article.content)
+
+
+def _project_document(project):
+    technologies = " ".join(str(tech) for tech in project.technologies or [])
+    return project.title, f"{project.description} {technologies}"
+
+
+def _write(kind, instance, document):
+    rowid = _rowid(kind, instance.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [rowid])
+        if not instance.is_draft:
+            title, body = document
+            cursor.execute(INSERT_SQL, [rowid, title, body, instance.slug])
+
+
+def index_article(article):
+    """Add, refresh or (for drafts) drop an article's index entry."""
+    if is_available():
+        _write("article", article, _article_document(article))
+
+
+def index_project(project):
+    """Add, refresh or (for drafts) drop a project's index entry."""
+    if is_available():
+        _write("project", project, _project_document(project))
+
+
+def index_many(kind, instances):
+    """Index freshly inserted objects (bulk imports skip the post_save receivers)."""
+    if not is_available():
+        return
+    document = _article_document if kind == "article" else _project_document
+    rows = [[_rowid(kind, instance.pk), *document(instance), instance.slug] for instance in instances if not instance.is_draft]
+    with connection.cursor() as cursor:
+        cursor.executemany(INSERT_SQL, rows)
+
+
+def remove(kind, object_id):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [_rowid(kind, object_id)])
+
+
+def rebuild(batch_size=500):
+    """
+    Repopulate the whole index from published articles and projects. Runs in
+    one transaction, so searches see the old index until it commits, and a
+    failed rebuild leaves it as it was.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        sources = (
+            ("article", Article.objects.filter(is_draft=False).only("id", "slug", "title", "content"), _article_document),
+            ("project", Project.objects.filter(is_draft=False).only("id", "slug", "title", "description", "technologies"), _project_document),
+        )
+        total = 0
+        for kind, queryset, document in sources:
+            rows = []
+            for instance in queryset.iterator(chunk_size=batch_size):
+                rows.append([_rowid(kind, instance.pk), *document(instance), instance.slug])
+                if len(rows) == batch_size:
+                    cursor.executemany(INSERT_SQL, rows)
+                    total += len(rows)
+                    rows = []
+            cursor.executemany(INSERT_SQL, rows)
+            total += len(rows)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, quoted so user
+    input can't inject FTS syntax, with prefix matching on the last word.
+    """
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _highlighted(text):
+    return escape(text).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def search(text, offset=0, limit=10):
+    """
+    Return `(total, results)` for a BM25-ranked search, title matches weighted
+    above body matches. Each result carries highlighted title and snippet HTML.
+    """
+    match = build_match_query(text)
+    if match is None or not is_available():
+        return 0, []
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [match])
+        total = cursor.fetchone()[0]
+        if not total or offset >= total:
+            return total, []
+
+        cursor.execute(
+            f"""
+            SELECT rowid, slug,
+                   highlight({SEARCH_TABLE}, 0, %s, %s),
+                   snippet({SEARCH_TABLE}, 1, %s, %s, '…', 24)
+            FROM {SEARCH_TABLE}
+            WHERE {SEARCH_TABLE} MATCH %s
+            ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0)
+            LIMIT %s OFFSET %s
+            """,
+            [_MARK_START, _MARK_END, _MARK_START, _MARK_END, match, limit, offset],
+        )
+        rows = cursor.fetchall()
+
+    return total, [
+        {
+            "type": KINDS[rowid % 2],
+            "id": rowid // 2,
+            "slug": slug,
+            "title": _highlighted(title),
+            "snippet": _highlighted(snippet),
+        }
+        for rowid, slug, title, snippet in rows
+    ]
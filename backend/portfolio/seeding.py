@@ -0,0 +1,204 @@
+"""
+Deterministic synthetic content for benchmarks and load tests: users,
+published and draft articles and projects, certificates, and threaded
+comments. The same seed and counts always produce the same rows (apart from
+primary keys, which continue from whatever the tables already hold).
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from allauth.socialaccount.models import SocialAccount
+
+from . import search
+from .cache import invalidate
+from .models import Article, Certificates, Comment, CustomUser, Profile, Project, allocate_slugs
+
+USERNAME_PREFIX = "seed"
+EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+WORDS = (
+    "django python cache query index latency throughput server client request response thread process "
+    "async database sqlite migration model view serializer token session worker queue job retry backoff "
+    "image upload variant search ranking snippet comment reply thread path counter pagination cursor keyset "
+    "deploy container cluster metric trace profile benchmark regression release feature refactor test "
+    "design product user interface layout component state render browser network protocol header body "
+    "the a of and to in for with on that is was it as by this from we our you they are be can will"
+).split()
+FIRST_NAMES = ["Ada", "Grace", "Linus", "Guido", "Barbara", "Ken", "Margaret", "Dennis", "Frances", "Alan"]
+LAST_NAMES = ["Lovelace", "Hopper", "Torvalds", "Rossum", "Liskov", "Thompson", "Hamilton", "Ritchie", "Allen", "Kay"]
+TECHNOLOGIES = ["Django", "React", "PostgreSQL", "SQLite", "Redis", "Docker", "Celery", "TypeScript", "Go", "Rust"]
+
+DEFAULT_COUNTS = {"users": 200, "articles": 1000, "projects": 150, "certificates": 40, "comments": 10000}
+
+
+def _sentence(rng, low=6, high=18):
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraphs(rng, count):
+    return "".join(
+        f"<p>{' '.join(_sentence(rng) for _ in range(rng.randint(3, 8)))}</p>" for _ in range(count)
+    )
+
+
+def _title(rng):
+    return " ".join(rng.choices(WORDS[:80], k=rng.randint(3, 7))).title()
+
+
+def _when(rng, after=EPOCH, days=700):
+    return after + timedelta(days=rng.uniform(0, days))
+
+
+def _users(rng, count):
+    users = [
+        CustomUser(
+            username=f"{USERNAME_PREFIX}{n:05d}",
+            email=f"{USERNAME_PREFIX}{n:05d}@example.com",
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            # Unusable, and cheap: no hashing
+            password=make_password(None),
+        )
+        for n in range(count)
+    ]
+    google = set(rng.sample(range(count), count // 4))
+    for n in google:
+        users[n].avatar_url = f"https://lh3.googleusercontent.com/a/{USERNAME_PREFIX}{n:05d}"
+    users = CustomUser.objects.bulk_create(users)
+    # bulk_create skips the post_save receiver that creates profiles
+    Profile.objects.bulk_create(Profile(user=user) for user in users)
+    SocialAccount.objects.bulk_create(
+        SocialAccount(user=users[n], provider="google", uid=users[n].username, extra_data={"picture": users[n].avatar_url})
+        for n in sorted(google)
+    )
+    return users
+
+
+def _articles(rng, count, authors):
+    articles = []
+    for _ in range(count):
+        article = Article(
+            title=_title(rng),
+            content=_paragraphs(rng, rng.randint(3, 15)),
+            author=rng.choice(authors),
+            category=rng.choice(Article.CATEGORY_CHOICES)[0],
+            is_draft=rng.random() < 0.1,
+        )
+        if not article.is_draft:
+            article.published_date = _when(rng)
+        article.populate_derived_fields()
+        articles.append(article)
+    for article, slug in zip(articles, allocate_slugs(Article, [article.title for article in articles])):
+        article.slug = slug
+    articles = Article.objects.bulk_create(articles, batch_size=500)
+    search.index_many("article", articles)
+    return articles
+
+
+def _projects(rng, count):
+    projects = []
+    for _ in range(count):
+        project = Project(
+            title=_title(rng),
+            description=_paragraphs(rng, rng.randint(1, 4)),
+            technologies=rng.sample(TECHNOLOGIES, rng.randint(1, 5)),
+            github_link=f"https://github.com/example/{rng.randrange(10 ** 6)}",
+            category=rng.choice(Project.PROJECT_CATEGORIES)[0],
+            is_draft=rng.random() < 0.1,
+        )
+        if not project.is_draft:
+            project.published_date = _when(rng)
+        projects.append(project)
+    for project, slug in zip(projects, allocate_slugs(Project, [project.title for project in projects])):
+        project.slug = slug
+    projects = Project.objects.bulk_create(projects, batch_size=500)
+    search.index_many("project", projects)
+    return projects
+
+
+def _certificates(rng, count):
+    certificates = [
+        Certificates(
+            title=_title(rng),
+            description=_sentence(rng, 10, 30),
+            issued_by=rng.choice(["Coursera", "edX", "AWS", "Google", "Microsoft"]),
+            issue_date=_when(rng).date(),
+        )
+        for _ in range(count)
+    ]
+    for certificate, slug in zip(certificates, allocate_slugs(Certificates, [c.title for c in certificates])):
+        certificate.slug = slug
+    return Certificates.objects.bulk_create(certificates)
+
+
+def _comments(rng, count, users, articles, projects):
+    """
+    Threaded comments on published content. A few targets get most of the
+    discussion, and roughly a third of comments reply to an earlier comment
+    on the same target. Primary keys are assigned up front so the
+    materialized paths can be written in the same INSERT.
+    """
+    targets = [item for item in articles + projects if not item.is_draft]
+    if not targets or not count:
+        return []
+    rng.shuffle(targets)
+    weights = [1 / (rank + 1) for rank in range(len(targets))]
+
+    next_pk = (Comment.objects.order_by("-pk").values_list("pk", flat=True).first() or 0) + 1
+    by_target = {}
+    comments = []
+    for target in rng.choices(targets, weights=weights, k=count):
+        thread = by_target.setdefault((type(target), target.pk), [])
+        parent = rng.choice(thread) if thread and rng.random() < 0.35 else None
+        if parent is not None and parent.depth >= 6:
+            parent = None
+        comment = Comment(
+            pk=next_pk,
+            content_object=target,
+            author=rng.choice(users),
+            content=" ".join(_sentence(rng) for _ in range(rng.randint(1, 4))),
+            parent_comment=parent,
+        )
+        comment.path = f"{parent.path if parent else ''}{next_pk:0{Comment.PATH_STEP_WIDTH}d}/"
+        comment.created_at = _when(rng, after=parent.created_at if parent else target.published_date, days=30)
+        next_pk += 1
+        thread.append(comment)
+        comments.append(comment)
+
+    Comment.objects.bulk_create(comments, batch_size=500)
+    # auto_now_add overwrote created_at on insert
+    Comment.objects.bulk_update(comments, ["created_at"], batch_size=500)
+    return comments
+
+
+def seed(counts=None, seed=0):
+    """
+    Insert synthetic content in one transaction and return how many of each
+    kind were created. `counts` overrides entries of DEFAULT_COUNTS.
+    """
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    rng = random.Random(seed)
+    with transaction.atomic():
+        users = _users(rng, counts["users"])
+        articles = _articles(rng, counts["articles"], users)
+        projects = _projects(rng, counts["projects"])
+        certificates = _certificates(rng, counts["certificates"])
+        comments = _comments(rng, counts["comments"], users, articles, projects)
+        # Bulk inserts bypass the counter updates in the comment views
+        for comment in comments:
+            target = comment.content_object
+            target.comment_count += 1
+            if comment.parent_comment is not None:
+                comment.parent_comment.reply_count += 1
+        Article.objects.bulk_update(articles, ["comment_count"], batch_size=500)
+        Project.objects.bulk_update(projects, ["comment_count"], batch_size=500)
+        Comment.objects.bulk_update(comments, ["reply_count"], batch_size=500)
+    invalidate("articles", "projects", "certificates")
+    return {
+        "users": len(users), "articles": len(articles), "projects": len(projects),
+        "certificates": len(certificates), "comments": len(comments),
+    }
@@ -1,19 +1,73 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import *
+from .jobs import delete_file_later
+
+
+def avatar_url(user, request=None):
+    """
+    The user's precomputed `avatar_url` (uploaded picture first, then the
+    Google picture), made absolute when there is a request. No queries.
+    """
+    if not user.avatar_url:
+        return None
+    return request.build_absolute_uri(user.avatar_url) if request else user.avatar_url
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Renders a `<field>_variants` description as `srcset` strings per MIME
+    type, plus the intrinsic size and inline blur placeholder. Empty until the
+    variants have been generated.
+    """
+
+    def to_representation(self, value):
+        if not value:
+            return None
+
+        request = self.context.get("request")
+        srcset = {}
+        for mime, names in value["variants"].items():
+            candidates = []
+            for width, name in sorted(names.items(), key=lambda item: int(item[0])):
+                url = default_storage.url(name)
+                candidates.append(f"{request.build_absolute_uri(url) if request else url} {width}w")
+            srcset[mime] = ", ".join(candidates)
+
+        return {
+            "srcset": srcset,
+            "width": value["width"],
+            "height": value["height"],
+            "placeholder": value["placeholder"],
+        }
+
+
+class SparseFieldsMixin:
+    """
+    Accepts `fields`, the set of field names to output (see
+    `fieldsets.sparse_fields`); None outputs them all.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
 
 
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     profile_image = serializers.SerializerMethodField()
+    profile_picture_variants = ImageVariantsField()
 
     class Meta:
         model = get_user_model()
         fields = (
             'id', 'username', 'email', 'first_name', 'last_name',
-            'full_name', 'password', 'profile_picture', 'profile_image'
+            'full_name', 'password', 'profile_picture', 'profile_image', 'profile_picture_variants'
         )
         extra_kwargs = {
             'password': {'write_only': True},
@@ -28,57 +82,33 @@ class UserSerializer(serializers.ModelSerializer):
         return f"{obj.first_name} {obj.last_name}".strip()
 
     def get_profile_image(self, obj):
-        request = self.context.get("request")
-
-        # Prefer Google profile picture if available
-        if hasattr(obj, 'socialaccount_set') and obj.socialaccount_set.exists():
-            google_account = obj.socialaccount_set.filter(provider='google').first()
-            if google_account and 'picture' in google_account.extra_data:
-                return google_account.extra_data['picture']
-
-        # Fallback to uploaded profile picture
-        if obj.profile_picture:
-            return request.build_absolute_uri(obj.profile_picture.url) if request else obj.profile_picture.url
-
-        return None
+        return avatar_url(obj, self.context.get("request"))
 
     def create(self, validated_data):
         """Create a new user instance with a securely hashed password."""
         password = validated_data.pop('password')
-        profile_picture = validated_data.pop('uploaded_profile_picture', None)
 
+        # The uploaded profile picture (if any) is part of validated_data,
+        # so the user is written in a single save
         user = get_user_model()(**validated_data)
         user.set_password(password)
-
-        # Save user instance first
         user.save()
 
-        # If a profile picture was uploaded, save it
-        if profile_picture:
-            user.profile_picture = profile_picture
-            user.save()
-
         return user
 
     def update(self, instance, validated_data):
         """Update user profile including username and profile image."""
-        profile_picture = validated_data.pop('uploaded_profile_picture', None)
+        old_picture = instance.profile_picture.name
 
-        # Update user fields (except profile_image)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        # If a new profile image was uploaded, save it
-        if profile_picture:
-            # Check if the current profile image is different and delete the old one
-            if instance.profile_picture and instance.profile_picture != profile_picture:
-                instance.profile_picture.delete(save=False)  # Delete the old image without saving it again
-
-            # Assign the new profile picture
-            instance.profile_picture = profile_picture
-
         # Save the updated instance
         instance.save()
+
+        # A replaced profile picture is released by a worker after the save
+        if old_picture and "profile_picture" in validated_data:
+            delete_file_later(old_picture)
         return instance
 
 
@@ -88,7 +118,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token = super().get_token(user)
         token['is_superuser'] = user.is_superuser
         token['full_name'] = user.get_full_name()
-        token['profile_image'] = UserSerializer(user).get_profile_image(user)
+        token['profile_image'] = avatar_url(user)
 
         return token
 
@@ -98,10 +128,11 @@ class SimpleAuthorSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = get_user_model()
-        fields = ('id', 'username', 'full_name', 'profile_picture')
+        fields = ('id', 'username', 'full_name', 'profile_picture', 'profile_picture_variants')
 
     full_name = serializers.SerializerMethodField()
     profile_picture = serializers.SerializerMethodField()
+    profile_picture_variants = ImageVariantsField()
 
     def get_full_name(self, obj):
         """Return the full name of the user."""
@@ -112,28 +143,15 @@ class SimpleAuthorSerializer(serializers.ModelSerializer):
         Returns the profile picture from the User model if available,
         otherwise falls back to Google profile picture if the user authenticated with Google.
         """
-        request = self.context.get("request")
-
-        # Check if the user has a profile picture
-        if obj.profile_picture:
-            return request.build_absolute_uri(obj.profile_picture.url) if request else obj.profile_picture.url
-
-        # If no profile picture, check for Google account picture
-        if hasattr(obj, 'socialaccount_set') and obj.socialaccount_set.exists():
-            google_account = obj.socialaccount_set.filter(provider='google').first()
-            if google_account and 'picture' in google_account.extra_data:
-                return google_account.extra_data['picture']
-
-        # No image found
-        return None
+        return avatar_url(obj, self.context.get("request"))
     
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = SimpleAuthorSerializer(read_only=True)
     content_object = serializers.SerializerMethodField()  
     class Meta:
         model = Comment
         fields = "__all__"
-        read_only_fields = ["id", "author", "created_at"]
+        read_only_fields = ["id", "author", "created_at", "content_type", "object_id"]
 
     def get_content_object(self, obj):
         """Returns a more human-readable reference to the related object."""
@@ -143,26 +161,41 @@ class CommentSerializer(serializers.ModelSerializer):
             return {"type": "project", "title": obj.content_object.title, "id": obj.object_id}
         return None
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = SimpleAuthorSerializer(read_only=True)
+    project_image_variants = ImageVariantsField()
     category_display = serializers.CharField(source="get_category_display", read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
 
     class Meta:
         model = Project
         fields = "__all__"
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = SimpleAuthorSerializer(read_only=True)
+    article_image_variants = ImageVariantsField()
     category_display = serializers.CharField(source="get_category_display", read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
 
     class Meta:
         model = Article
         fields = "__all__"
         extra_kwargs = {"author": {"read_only": True}}
 
-class CertificatesSerializer(serializers.ModelSerializer):
+class ArticleListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Card representation for article listings: stored excerpt instead of the body."""
+    author = SimpleAuthorSerializer(read_only=True)
+    article_image_variants = ImageVariantsField()
+    category_display = serializers.CharField(source="get_category_display", read_only=True)
+
+    class Meta:
+        model = Article
+        fields = (
+            "id", "title", "slug", "category", "category_display", "author",
+            "article_image", "article_image_variants", "excerpt", "word_count", "comment_count", "published_date", "is_draft",
+        )
+
+class CertificatesSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    certificate_image_variants = ImageVariantsField()
+
     class Meta:
         model = Certificates
         fields = '__all__'  
\ No newline at end of file
@@ -1,14 +1,106 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.contrib.contenttypes.models import ContentType
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import CustomUser, Profile
+from allauth.socialaccount.models import SocialAccount
+from . import images, search, timing
+from .authentication import user_cache
+from .cache import invalidate
+from .models import Article, Certificates, Comment, CustomUser, Profile, Project
 
 @receiver(post_save, sender=CustomUser)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
-@receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save() 
\ No newline at end of file
+@receiver([post_save, post_delete], sender=CustomUser)
+def evict_cached_user(sender, instance, **kwargs):
+    # Authentication serves users from a per-process cache
+    user_cache.discard(instance.pk)
+
+# ----------------------------------------
+# Response cache invalidation
+# ----------------------------------------
+
+@receiver([post_save, post_delete], sender=Article)
+def invalidate_articles(sender, **kwargs):
+    invalidate("articles")
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_projects(sender, **kwargs):
+    invalidate("projects")
+
+@receiver([post_save, post_delete], sender=Certificates)
+def invalidate_certificates(sender, **kwargs):
+    invalidate("certificates")
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_commented_object(sender, instance, **kwargs):
+    # Comments are nested in the article/project they belong to
+    model = ContentType.objects.get_for_id(instance.content_type_id).model
+    invalidate(f"{model}s")
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_authored_content(sender, **kwargs):
+    # Author and commenter details are nested in articles and projects
+    invalidate("articles", "projects")
+
+# ----------------------------------------
+# Denormalized avatar URL
+# ----------------------------------------
+
+@receiver([post_save, post_delete], sender=SocialAccount)
+def refresh_avatar_url(sender, instance, **kwargs):
+    # Social login saves the account with the picture Google returned
+    if instance.provider != "google" or kwargs.get("raw"):
+        return
+    user = CustomUser.objects.filter(pk=instance.user_id).first()
+    if user is not None and user.refresh_avatar_url():
+        user_cache.discard(user.pk)
+        invalidate("articles", "projects")
+
+# ----------------------------------------
+# Full-text search index
+# ----------------------------------------
+
+@receiver(post_save, sender=Article)
+def index_article(sender, instance, **kwargs):
+    search.index_article(instance)
+
+@receiver(post_delete, sender=Article)
+def unindex_article(sender, instance, **kwargs):
+    search.remove("article", instance.pk)
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, **kwargs):
+    search.index_project(instance)
+
+@receiver(post_delete, sender=Project)
+def unindex_project(sender, instance, **kwargs):
+    search.remove("project", instance.pk)
+
+# ----------------------------------------
+# Responsive image variants and stored image references
+# ----------------------------------------
+
+@receiver(post_save)
+def build_image_variants(sender, instance, **kwargs):
+    if sender in images.IMAGE_FIELDS and not kwargs.get("raw"):
+        images.schedule_variants(instance)
+
+# Registered per model, so other models keep their fast (signal-free) bulk deletes
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Certificates)
+def release_image_files(sender, instance, **kwargs):
+    images.release_files(instance)
+
+# ----------------------------------------
+# Request instrumentation
+# ----------------------------------------
+
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    timing.instrument(connection)
@@ -0,0 +1,90 @@
+"""
+Content-addressed media storage, the default storage backend. An upload is
+hashed (SHA-256) while it's streamed to a temporary file, then stored once
+as `blobs/<xx>/<digest><ext>`, whatever name or `upload_to` it was saved
+under. Identical uploads share one file, and as a name never changes content
+its URL can be cached forever (see media.cache_control).
+
+Every save() is a reference to the blob, counted on its `MediaBlob` row, and
+every delete() drops one: the file is only removed once nothing refers to it
+anymore and that has been committed. Files stored before this backend have
+no row and are deleted outright.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+from functools import partial
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import MediaBlob
+
+BLOB_DIRECTORY = "blobs"
+
+
+def blob_name(digest, name):
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(BLOB_DIRECTORY, digest[:2], digest + extension)
+
+
+def _reference(name, size):
+    if MediaBlob.objects.filter(name=name).update(references=F("references") + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, size=size, references=1)
+    except IntegrityError:
+        MediaBlob.objects.filter(name=name).update(references=F("references") + 1)
+
+
+class BlobStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content, so existing files are shared, not avoided
+        return name
+
+    def _save(self, name, content):
+        incoming = self.path(posixpath.join(BLOB_DIRECTORY, "incoming"))
+        os.makedirs(incoming, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=incoming)
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, "wb") as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+                    size += len(chunk)
+
+            name = blob_name(digest.hexdigest(), name)
+            path = self.path(name)
+            with transaction.atomic():
+                # Counted before the file is checked: a delete() collecting this
+                # blob has either committed (and removed it) or now waits for us
+                _reference(name, size)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(temporary, self.file_permissions_mode)
+                    os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return name
+
+    def delete(self, name):
+        """Drop one reference to `name`, removing the file after commit if it was the last."""
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        released = MediaBlob.objects.filter(name=name, references__gt=0).update(references=F("references") - 1)
+        if released or MediaBlob.objects.filter(name=name).exists():
+            transaction.on_commit(partial(self._collect, name))
+        else:
+            super().delete(name)
+
+    def _collect(self, name):
+        with transaction.atomic():
+            if MediaBlob.objects.filter(name=name, references=0).delete()[0]:
+                super().delete(name)
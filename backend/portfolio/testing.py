@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from . import metrics
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Django's runner, pointed at a scratch directory for the file cache and
+    the metrics snapshots, so a test run neither reads nor clears the cache
+    of a server on this host, nor leaves metrics files behind. The slow
+    request log is off (password hashing and image processing would trip
+    it); tests of the log turn it back on.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.scratch_dir = tempfile.mkdtemp(prefix="portfolio-tests-")
+        self.scratch_settings = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": os.path.join(self.scratch_dir, "cache"),
+                }
+            },
+            METRICS_DIR=os.path.join(self.scratch_dir, "metrics"),
+            SLOW_REQUEST_THRESHOLD_MS=None,
+        )
+        self.scratch_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        # Otherwise the exit hook would write this process's counters to the real METRICS_DIR
+        metrics.reset()
+        self.scratch_settings.disable()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,1716 @@
-from django.test import TestCase
+import gzip
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import redirect_stdout
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.contrib.contenttypes.models import ContentType
+from django.conf import settings
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.db.models import F
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
+
+from . import cache as response_cache
+from . import benchmarks, compression, google, images, jobs, media, metrics, search, seeding
+from .authentication import CachedJWTAuthentication, UserCache, user_cache
+from .fastjson import ORJSONParser, ORJSONRenderer
+from .filters import filter_listing
+from .models import Article, Certificates, Comment, CustomUser, Job, MediaBlob, Project, allocate_slugs
+from .pagination import KeysetPagination
+from .querysets import article_list_queryset, project_queryset
+from .serializers import CustomTokenObtainPairSerializer
+from .storage import BlobStorage
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class QueryCountTests(TestCase):
+    """List and detail endpoints must cost the same number of queries at any page size."""
+
+    def setUp(self):
+        self.client = APIClient()
+        ContentType.objects.clear_cache()
+
+    def make_user(self, username):
+        user = CustomUser.objects.create(username=username)
+        SocialAccount.objects.create(
+            user=user, provider="google", uid=username, extra_data={"picture": f"https://img/{username}"}
+        )
+        return user
+
+    def make_articles(self, count):
+        for i in range(count):
+            author = self.make_user(f"author{Article.objects.count()}")
+            article = Article.objects.create(title=f"Article {i}", content="Body", author=author, is_draft=False)
+            for _ in range(2):
+                Comment.objects.create(content_object=article, author=self.make_user(f"c{Comment.objects.count()}"), content="Hi")
+
+    def make_projects(self, count):
+        for i in range(count):
+            project = Project.objects.create(title=f"Project {i}", description="Desc", is_draft=False)
+            Comment.objects.create(content_object=project, author=self.make_user(f"p{Comment.objects.count()}"), content="Hi")
+
+    def count_queries(self, url):
+        # Warm the ContentType cache so it doesn't skew the first measurement.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_article_list_query_count_is_constant(self):
+        self.make_articles(1)
+        small = self.count_queries(reverse("article_list"))
+        self.make_articles(9)
+        large = self.count_queries(reverse("article_list"))
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 2)
+
+    def test_project_list_query_count_is_constant(self):
+        self.make_projects(1)
+        small = self.count_queries(reverse("project_list"))
+        self.make_projects(9)
+        large = self.count_queries(reverse("project_list"))
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 5)
+
+    def test_article_detail_query_count(self):
+        self.make_articles(1)
+        article = Article.objects.get()
+        for _ in range(5):
+            Comment.objects.create(content_object=article, author=self.make_user(f"x{Comment.objects.count()}"), content="Hi")
+        # One of these is the conditional GET validator lookup
+        self.assertLessEqual(self.count_queries(reverse("article-detail", args=[article.slug])), 6)
+
+    def test_comment_list_query_count_is_constant(self):
+        self.make_articles(1)
+        article = Article.objects.get()
+        url = reverse("comment-list-create", args=["article", article.id])
+        small = self.count_queries(url)
+        for _ in range(8):
+            Comment.objects.create(content_object=article, author=self.make_user(f"y{Comment.objects.count()}"), content="Hi")
+        self.assertEqual(small, self.count_queries(url))
+
+    def test_serialized_author_uses_google_picture(self):
+        self.make_articles(1)
+        result = self.client.get(reverse("article_list")).json()["results"][0]
+        self.assertEqual(result["author"]["profile_picture"], "https://img/author0")
+        detail = self.client.get(reverse("article-detail", args=[result["slug"]])).json()
+        # Comments are served by the paginated comment endpoints, not embedded
+        self.assertNotIn("comments", detail)
+
+    def count_write_queries(self, method, url, data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertIn(response.status_code, (200, 201))
+        return len(ctx.captured_queries)
+
+    def test_article_writes_query_count_is_constant(self):
+        self.make_articles(1)
+        article = Article.objects.get()
+        self.client.force_authenticate(article.author)
+        url = reverse("update_article", args=[article.id])
+        small = self.count_write_queries("put", url, {"title": "Edited"})
+        for _ in range(8):
+            Comment.objects.create(content_object=article, author=self.make_user(f"w{Comment.objects.count()}"), content="Hi")
+        self.assertEqual(small, self.count_write_queries("put", url, {"title": "Edited again"}))
+        self.assertLessEqual(small, 8)
+        created = self.count_write_queries("post", reverse("create_article"), {"title": "New", "content": "Body"})
+        self.assertLessEqual(created, 8)
+
+    def test_project_writes_query_count_is_constant(self):
+        self.make_projects(1)
+        project = Project.objects.get()
+        self.client.force_authenticate(CustomUser.objects.create(username="staff", is_staff=True))
+        url = reverse("update_project", args=[project.id])
+        small = self.count_write_queries("put", url, {"title": "Edited"})
+        for _ in range(8):
+            Comment.objects.create(content_object=project, author=self.make_user(f"w{Comment.objects.count()}"), content="Hi")
+        self.assertEqual(small, self.count_write_queries("put", url, {"title": "Edited again"}))
+        self.assertLessEqual(small, 8)
+        created = self.count_write_queries("post", reverse("create_project"), {"title": "New", "description": "Desc"})
+        self.assertLessEqual(created, 8)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = CustomUser.objects.create(username="author", is_staff=True)
+        # Drafts are only listed for staff
+        self.client.force_authenticate(self.author)
+        # Mix published rows, ties on published_date and drafts (NULL dates).
+        published = timezone.now()
+        for i in range(25):
+            article = Article.objects.create(title=f"A{i}", content="Body", author=self.author, is_draft=i % 5 == 0)
+            if not article.is_draft:
+                Article.objects.filter(pk=article.pk).update(published_date=published - timedelta(hours=i // 2))
+
+    def walk(self, url):
+        ids = []
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            self.assertNotIn("count", data)
+            pages.append(data)
+            ids.extend(item["id"] for item in data["results"])
+            url = data["next"]
+        return ids, pages
+
+    def test_forward_walk_matches_offset_ordering(self):
+        ids, pages = self.walk(reverse("article_list") + "?cursor=")
+        expected = list(
+            Article.objects.order_by(F("published_date").desc(nulls_last=True), "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertIsNone(pages[0]["previous"])
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get(reverse("article_list") + "?cursor=").json()
+        second = self.client.get(first["next"]).json()
+        back = self.client.get(second["previous"]).json()
+        self.assertEqual([a["id"] for a in back["results"]], [a["id"] for a in first["results"]])
+
+    def test_backward_walk_from_last_page(self):
+        forward, pages = self.walk(reverse("article_list") + "?cursor=")
+        backward = []
+        data = pages[-1]
+        while True:
+            backward = [a["id"] for a in data["results"]] + backward
+            if not data["previous"]:
+                break
+            data = self.client.get(data["previous"]).json()
+        self.assertEqual(backward, forward)
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("article_list") + "?cursor=")
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("article_list") + "?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+    def test_numbered_pagination_is_default(self):
+        self.assertEqual(self.client.get(reverse("article_list")).json()["count"], 25)
+
+    def test_pages_after_a_cursor_seek_the_index(self):
+        paginator = KeysetPagination("published_date")
+        cursors = [(timezone.now(), 5, False), (timezone.now(), 5, True), (None, 5, False), (None, 5, True)]
+        for value, pk, reverse in cursors:
+            if reverse:
+                ordering = (F("published_date").asc(nulls_first=True), "id")
+            else:
+                ordering = (F("published_date").desc(nulls_last=True), "-id")
+            for segment in paginator._position_filters(value, pk, reverse, nullable=True):
+                queryset = Article.objects.filter(segment, is_draft=False).order_by(*ordering)[:11]
+                sql, params = queryset.query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                    plan = " ".join(row[-1] for row in cursor.fetchall())
+                with self.subTest(value=value, reverse=reverse, segment=segment):
+                    self.assertIn("SEARCH portfolio_article USING INDEX article_published_id_idx", plan)
+                    self.assertNotIn("SCAN", plan)
+
+
+class CommentIndexTests(TestCase):
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return " ".join(row[-1] for row in cursor.fetchall())
+
+    def test_comment_list_uses_composite_index(self):
+        model_type = ContentType.objects.get_for_model(Article)
+        plan = self.query_plan(Comment.objects.filter(content_type=model_type, object_id=1).order_by("-created_at", "-id"))
+        self.assertIn("comment_target_created_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_replies_use_composite_index(self):
+        plan = self.query_plan(Comment.objects.filter(parent_comment_id=1).order_by("-created_at", "-id"))
+        self.assertIn("comment_parent_created_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_parent_has_no_single_column_index(self):
+        # The composite index leads with parent_comment_id, so it serves the FK lookups too
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Comment._meta.db_table)
+        parent_indexes = [c for c in constraints.values() if c["index"] and c["columns"][0] == "parent_comment_id"]
+        self.assertEqual([c["columns"] for c in parent_indexes], [["parent_comment_id", "created_at", "id"]])
+        plan = self.query_plan(Comment.objects.filter(parent_comment_id=1))
+        self.assertIn("comment_parent_created_idx", plan)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        response_cache.reset_stats()
+        self.client = APIClient()
+        self.author = CustomUser.objects.create(username="author")
+        self.article = Article.objects.create(title="Cached", content="Body", author=self.author, is_draft=False)
+
+    def get(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_second_request_is_served_from_cache(self):
+        url = reverse("article_list")
+        self.assertEqual(self.get(url)["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.json()["results"][0]["title"], "Cached")
+        self.assertEqual(response_cache.get_stats(), {"hits": 1, "misses": 1})
+
+    def test_query_string_and_auth_state_are_part_of_the_key(self):
+        url = reverse("article_list")
+        self.get(url)
+        self.assertEqual(self.get(url + "?page=1")["X-Cache"], "MISS")
+        token = RefreshToken.for_user(self.author).access_token
+        self.assertEqual(self.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")["X-Cache"], "MISS")
+
+    def test_model_changes_invalidate(self):
+        url = reverse("article-detail", args=[self.article.slug])
+        self.get(url)
+        self.article.title = "Edited"
+        self.article.save()
+        response = self.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["title"], "Edited")
+
+        Comment.objects.create(content_object=self.article, author=self.author, content="New")
+        self.assertEqual(self.get(url)["X-Cache"], "MISS")
+
+        self.author.first_name = "Renamed"
+        self.author.save()
+        self.assertEqual(self.get(url).json()["author"]["full_name"], "Renamed")
+
+    def test_unrelated_changes_keep_cache(self):
+        url = reverse("certificate-list")
+        self.get(url)
+        Project.objects.create(title="Other", description="Desc")
+        self.assertEqual(self.get(url)["X-Cache"], "HIT")
+        Certificates.objects.create(title="Cert", description="D", issued_by="X", issue_date="2024-01-01")
+        response = self.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.json()), 1)
+
+    def test_invalidation_reaches_other_processes(self):
+        url = reverse("article_list")
+        etag = self.get(url)["ETag"]
+        self.assertEqual(self.get(url)["X-Cache"], "HIT")
+        # As when a different worker, runworker or the importer saves an article
+        child = multiprocessing.get_context("fork").Process(target=response_cache.invalidate, args=("articles",))
+        child.start()
+        child.join()
+        self.assertEqual(child.exitcode, 0)
+        response = self.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_versions_only_move_forward(self):
+        ahead = time.time_ns() + 10 ** 12  # another host's clock, 1000s ahead
+        cache.set(response_cache.VERSION_KEY.format("articles"), ahead, timeout=None)
+        response_cache.invalidate("articles")
+        self.assertGreater(response_cache.get_versions("articles")[0], ahead)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.author = CustomUser.objects.create(username="author")
+        self.article = Article.objects.create(title="Conditional", content="Body", author=self.author, is_draft=False)
+
+    def test_detail_not_modified_until_article_or_comments_change(self):
+        url = reverse("article-detail", args=[self.article.slug])
+        etag = self.client.get(url)["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        Comment.objects.create(content_object=self.article, author=self.author, content="Hi")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_if_modified_since(self):
+        url = reverse("article_detail_by_id", args=[self.article.id])
+        last_modified = self.client.get(url)["Last-Modified"]
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_detail_follows_authors_and_deleted_comments(self):
+        url = reverse("article-detail", args=[self.article.slug])
+        comment = Comment.objects.create(content_object=self.article, author=self.author, content="Hi")
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Article.objects.filter(pk=self.article.pk).update(updated_at=an_hour_ago)
+        Comment.objects.filter(pk=comment.pk).update(created_at=an_hour_ago)
+        cache.set(response_cache.VERSION_KEY.format("articles"), int(an_hour_ago.timestamp() * 1e9), timeout=None)
+        response = self.client.get(url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.author.first_name = "Renamed"
+        self.author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["author"]["full_name"], "Renamed")
+
+        cache.set(response_cache.VERSION_KEY.format("articles"), int(an_hour_ago.timestamp() * 1e9), timeout=None)
+        comment.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_list_etag_follows_watermark(self):
+        url = reverse("article_list")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get(url + "?page=1")["ETag"], etag)
+
+        self.article.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_validators_follow_credentials(self):
+        url = reverse("article_list")
+        Article.objects.create(title="Draft", content="Body", author=self.author, is_draft=True)
+        staff = CustomUser.objects.create(username="staff", is_staff=True)
+        bearer = f"Bearer {RefreshToken.for_user(staff).access_token}"
+
+        anonymous = self.client.get(url)
+        self.assertNotIn("private", anonymous.get("Cache-Control", ""))
+        self.assertIn("Authorization", anonymous["Vary"])
+        authenticated = self.client.get(url, HTTP_AUTHORIZATION=bearer)
+        self.assertNotEqual(authenticated.content, anonymous.content)
+        self.assertNotEqual(authenticated["ETag"], anonymous["ETag"])
+        self.assertIn("private", authenticated["Cache-Control"])
+        self.assertIn("Authorization", authenticated["Vary"])
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=authenticated["ETag"]).status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous["ETag"], HTTP_AUTHORIZATION=bearer)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=authenticated["ETag"], HTTP_AUTHORIZATION=bearer)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn("private", response["Cache-Control"])
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=60)
+    def test_cached_response_answers_conditional_requests(self):
+        url = reverse("project_list")
+        Project.objects.create(title="P", description="D", is_draft=False)
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class ArticleListRepresentationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.body = "<p>" + " ".join(f"word{i}" for i in range(2000)) + "</p>"
+        self.article = Article.objects.create(title="Long", content=self.body, is_draft=False)
+
+    def test_excerpt_and_word_count_stored_on_save(self):
+        self.assertEqual(self.article.word_count, 2000)
+        self.assertTrue(self.article.excerpt.startswith("word0 word1"))
+        self.assertLessEqual(len(self.article.excerpt), 280)
+        self.assertNotIn("<p>", self.article.excerpt)
+
+        self.article.content = "Short one"
+        self.article.save()
+        self.assertEqual((self.article.excerpt, self.article.word_count), ("Short one", 2))
+
+    def test_list_omits_and_never_selects_content(self):
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.client.get(reverse("article_list")).json()["results"][0]
+        self.assertNotIn("content", result)
+        self.assertNotIn("comments", result)
+        self.assertEqual(result["word_count"], 2000)
+        article_selects = [q["sql"] for q in ctx.captured_queries if 'FROM "portfolio_article"' in q["sql"]]
+        self.assertTrue(article_selects)
+        self.assertFalse(any('"portfolio_article"."content"' in sql for sql in article_selects))
+
+    def test_detail_keeps_full_body(self):
+        detail = self.client.get(reverse("article-detail", args=[self.article.slug])).json()
+        self.assertEqual(detail["content"], self.body)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.article = Article.objects.create(
+            title="Tuning SQLite", content="<p>Write-ahead logging keeps <b>readers</b> fast.</p>", is_draft=False
+        )
+        self.project = Project.objects.create(
+            title="Portfolio site", description="Personal site with a blog.", technologies=["Django", "SQLite"],
+            is_draft=False,
+        )
+        Article.objects.create(title="Draft about SQLite", content="Unpublished", is_draft=True)
+
+    def search(self, query, **params):
+        response = self.client.get(reverse("search"), {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranks_title_matches_first_and_skips_drafts(self):
+        data = self.search("sqlite")
+        self.assertEqual(data["count"], 2)
+        self.assertEqual([(r["type"], r["id"]) for r in data["results"]], [("article", self.article.id), ("project", self.project.id)])
+        self.assertEqual(data["results"][0]["title"], "Tuning <mark>SQLite</mark>")
+
+    def test_snippets_are_highlighted_and_escaped(self):
+        Article.objects.create(title="Escaping", content="Use &lt;script&gt; carefully, escaping matters", is_draft=False)
+        result = self.search("escaping")["results"][0]
+        self.assertIn("<mark>", result["snippet"])
+        self.assertNotIn("<script>", result["snippet"])
+
+    def test_prefix_and_stemming(self):
+        self.assertEqual(self.search("read")["results"][0]["slug"], self.article.slug)
+        self.assertEqual(self.search("logged")["count"], 1)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.article.title = "Renamed"
+        self.article.content = "Nothing to see"
+        self.article.save()
+        self.assertEqual(self.search("logging")["count"], 0)
+        self.assertEqual(self.search("renamed")["count"], 1)
+
+        self.project.is_draft = True
+        self.project.save()
+        self.assertEqual(self.search("django")["count"], 0)
+
+        self.article.delete()
+        self.assertEqual(self.search("renamed")["count"], 0)
+
+    def test_syntax_in_query_is_literal(self):
+        self.assertEqual(self.search('sqlite" OR "*')["count"], 0)
+        self.assertEqual(self.client.get(reverse("search")).status_code, 400)
+
+    def test_pagination(self):
+        for i in range(12):
+            Project.objects.create(title=f"Widget {i}", description="widget", is_draft=False)
+        first = self.search("widget")
+        self.assertEqual((first["count"], len(first["results"])), (12, 10))
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(len(second["results"]), 2)
+        self.assertIsNone(second["next"])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM portfolio_search_index")
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search("sqlite")["count"], 2)
+
+    def test_failed_rebuild_keeps_the_index(self):
+        def broken(project):
+            raise RuntimeError("boom")
+
+        project_document = search._project_document
+        search._project_document = broken
+        self.addCleanup(setattr, search, "_project_document", project_document)
+        with self.assertRaises(RuntimeError):
+            search.rebuild()
+        self.assertEqual(self.search("sqlite")["count"], 2)
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create(username="user")
+        self.article = Article.objects.create(title="Threads", content="Body", is_draft=False)
+        self.root = self.comment("root")
+        self.child = self.comment("child", parent=self.root)
+        self.grandchild = self.comment("grandchild", parent=self.child)
+        self.other_root = self.comment("other root")
+
+    def comment(self, content, parent=None):
+        return Comment.objects.create(
+            content_object=self.article, author=self.user, content=content, parent_comment=parent
+        )
+
+    def test_paths_nest(self):
+        self.assertEqual(self.root.path, f"{self.root.id:012d}/")
+        self.assertEqual(self.grandchild.path, f"{self.root.path}{self.child.id:012d}/{self.grandchild.id:012d}/")
+        self.assertEqual(self.grandchild.depth, 2)
+        self.assertEqual(Comment.objects.get(pk=self.child.pk).path, self.child.path)
+
+    def test_thread_is_nested_in_one_comment_query(self):
+        url = reverse("comment-thread", args=["article", self.article.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            threads = self.client.get(url).json()
+        comment_selects = [q for q in ctx.captured_queries if 'FROM "portfolio_comment"' in q["sql"]]
+        self.assertEqual(len(comment_selects), 1)
+
+        self.assertEqual([t["content"] for t in threads], ["root", "other root"])
+        self.assertEqual(threads[0]["replies"][0]["content"], "child")
+        self.assertEqual(threads[0]["replies"][0]["replies"][0]["content"], "grandchild")
+
+    def test_delete_removes_subtree_in_one_statement(self):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.delete(reverse("comment-delete", args=[self.root.id]))
+        self.assertEqual(response.status_code, 204)
+        deletes = [q for q in ctx.captured_queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(list(Comment.objects.values_list("content", flat=True)), ["other root"])
+
+    def test_delete_reply_keeps_siblings_of_parent(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.delete(reverse("delete-reply", args=[self.root.id, self.child.id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(set(Comment.objects.values_list("content", flat=True)), {"root", "other root"})
+
+    def test_delete_without_path_only_removes_its_own_subtree(self):
+        Comment.objects.filter(pk=self.child.pk).update(path="")
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.delete_subtree(), 2)
+        self.assertEqual(set(Comment.objects.values_list("content", flat=True)), {"root", "other root"})
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class ActivityCounterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create(username="user")
+        self.client.force_authenticate(self.user)
+        self.article = Article.objects.create(title="Busy", content="Body", is_draft=False)
+
+    def post_comment(self):
+        response = self.client.post(reverse("comment-list-create", args=["article", self.article.id]), {"content": "Hi"})
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def post_reply(self, comment_id):
+        response = self.client.post(reverse("add_reply", args=["article", self.article.id, comment_id]), {"content": "Re"})
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def counts(self, comment_id):
+        self.article.refresh_from_db()
+        return self.article.comment_count, Comment.objects.get(pk=comment_id).reply_count
+
+    def test_views_keep_counters_in_step(self):
+        root = self.post_comment()
+        reply = self.post_reply(root)
+        self.post_reply(reply)
+        self.post_reply(root)
+        self.assertEqual(self.counts(root), (4, 2))
+
+        self.client.delete(reverse("delete-reply", args=[root, reply]))
+        self.assertEqual(self.counts(root), (2, 1))
+
+        self.client.delete(reverse("comment-delete", args=[root]))
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.comment_count, 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        root = self.post_comment()
+        self.post_reply(root)
+        Article.objects.filter(pk=self.article.pk).update(comment_count=40)
+        Comment.objects.filter(pk=root).update(reply_count=0)
+
+        out = StringIO()
+        call_command("reconcile_counters", "--dry-run", stdout=out)
+        self.assertIn("Article.comment_count: 1 drifted", out.getvalue())
+        self.assertEqual(self.counts(root), (40, 0))
+
+        call_command("reconcile_counters", stdout=StringIO())
+        self.assertEqual(self.counts(root), (2, 1))
+
+    def test_list_sorts_by_activity(self):
+        quiet = Article.objects.create(title="Quiet", content="Body", is_draft=False)
+        self.post_comment()
+        results = self.client.get(reverse("article_list"), {"ordering": "activity"}).json()["results"]
+        self.assertEqual([a["id"] for a in results], [self.article.id, quiet.id])
+        self.assertEqual(results[0]["comment_count"], 1)
+
+
+def make_image(width=800, height=600, name="photo.jpg"):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@override_settings(JOB_QUEUE_EAGER=True, RESPONSE_CACHE_TIMEOUT=0)
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+
+    def create_article(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            article = Article.objects.create(title="Pictured", content="Body", is_draft=False, **kwargs)
+        article.refresh_from_db()
+        return article
+
+    def test_variants_generated_and_exposed(self):
+        article = self.create_article(article_image=make_image())
+        variants = article.article_image_variants
+        self.assertEqual(variants["source"], article.article_image.name)
+        self.assertEqual(sorted(variants["variants"]["image/webp"]), ["320", "640"])
+        self.assertTrue(variants["placeholder"].startswith("data:image/jpeg;base64,"))
+        for name in variants["variants"]["image/jpeg"].values():
+            with Image.open(os.path.join(self.media_root, name)) as image:
+                self.assertIn(image.width, (320, 640))
+
+        card = self.client.get(reverse("article_list")).json()["results"][0]["article_image_variants"]
+        self.assertRegex(card["srcset"]["image/webp"], r"^/media/blobs/[0-9a-f]{2}/[0-9a-f]{64}\.webp 320w, \S+ 640w$")
+        self.assertEqual((card["width"], card["height"]), (800, 600))
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=60)
+    def test_recorded_variants_invalidate_cached_responses(self):
+        cache.clear()
+        author = CustomUser.objects.create(username="pictured", profile_picture=make_image(300, 300, name="me.jpg"))
+        Article.objects.create(title="Pictured", content="Body", is_draft=False, author=author, article_image=make_image())
+        url = reverse("article_list")
+        card = self.client.get(url).json()["results"][0]
+        self.assertIsNone(card["article_image_variants"])
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+        # The variant jobs record them with update(), which sends no signal
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.run_pending()
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        card = response.json()["results"][0]
+        self.assertIsNotNone(card["article_image_variants"])
+        self.assertIsNotNone(card["author"]["profile_picture_variants"])
+
+    def test_small_images_keep_their_width(self):
+        article = self.create_article(article_image=make_image(200, 100))
+        self.assertEqual(list(article.article_image_variants["variants"]["image/jpeg"]), ["200"])
+
+    def test_replacing_and_clearing_cleans_up(self):
+        article = self.create_article(article_image=make_image())
+        old_files = list(article.article_image_variants["variants"]["image/webp"].values())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            article.article_image = make_image(900, 600, name="other.jpg")
+            article.save()
+        article.refresh_from_db()
+        self.assertEqual(article.article_image_variants["source"], article.article_image.name)
+        self.assertFalse(any(os.path.exists(os.path.join(self.media_root, name)) for name in old_files))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            article.article_image = None
+            article.save()
+        article.refresh_from_db()
+        self.assertEqual(article.article_image_variants, {})
+
+    def test_build_command_backfills(self):
+        article = self.create_article(article_image=make_image())
+        Article.objects.filter(pk=article.pk).update(article_image_variants={})
+        call_command("build_image_variants", stdout=StringIO())
+        article.refresh_from_db()
+        self.assertEqual(article.article_image_variants["source"], article.article_image.name)
+
+    def test_rebuilding_keeps_one_reference_per_variant(self):
+        article = self.create_article(article_image=make_image())
+        files = list(article.article_image_variants["variants"]["image/webp"].values())
+        references = dict(MediaBlob.objects.values_list("name", "references"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("build_image_variants", "--force", stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            images.build_variants(Article, article.pk, article.article_image.name)
+        self.assertEqual(dict(MediaBlob.objects.values_list("name", "references")), references)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            article.delete()
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(any(os.path.exists(os.path.join(self.media_root, name)) for name in files))
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        jobs.TASKS["test_task"] = self.record
+        self.addCleanup(jobs.TASKS.pop, "test_task")
+
+    def record(self, value, fail=False):
+        self.calls.append(value)
+        if fail:
+            raise RuntimeError("boom")
+
+    def test_worker_runs_due_jobs(self):
+        jobs.enqueue("test_task", {"value": 1})
+        jobs.enqueue("test_task", {"value": 2}, delay=3600)
+        out = StringIO()
+        call_command("runworker", "--once", stdout=out)
+        self.assertIn("Ran 1 jobs.", out.getvalue())
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 1)
+
+    def test_failures_back_off_then_fail(self):
+        job = jobs.enqueue("test_task", {"value": 1, "fail": True}, max_attempts=2)
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+
+        # Not due yet, so nothing runs until the backoff has passed
+        self.assertEqual(jobs.run_pending(), 0)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+        out = StringIO()
+        call_command("inspectjobs", "--failed", "--retry-failed", stdout=out)
+        self.assertIn("Requeued 1 failed jobs.", out.getvalue())
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.QUEUED)
+
+    def test_keyed_jobs_are_deduplicated(self):
+        jobs.enqueue("test_task", {"value": 1}, key="same")
+        jobs.enqueue("test_task", {"value": 2}, key="same")
+        self.assertEqual(Job.objects.count(), 1)
+        jobs.run_pending()
+        self.assertEqual(self.calls, [2])
+
+    def test_stale_claims_are_recovered(self):
+        job = jobs.enqueue("test_task", {"value": 1})
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, locked_by="dead-worker", locked_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.DONE)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_replaced_image_is_deleted_by_a_job(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            staff = CustomUser.objects.create(username="staff", email="staff@example.com", is_staff=True)
+            project = Project.objects.create(title="Pictured", description="d", project_image=make_image())
+            old_path = project.project_image.path
+            client = APIClient()
+            client.force_authenticate(staff)
+            response = client.put(
+                reverse("update_project", args=[project.pk]), {"project_image": make_image(640, 480, name="new.jpg")}
+            )
+            self.assertEqual(response.status_code, 200)
+            # The request only queued the cleanup
+            self.assertTrue(os.path.exists(old_path))
+            self.assertTrue(Job.objects.filter(task="delete_file", payload={"name": project.project_image.name}).exists())
+            # The file goes once the job's release has committed
+            with self.captureOnCommitCallbacks(execute=True):
+                jobs.run_pending()
+            self.assertFalse(os.path.exists(old_path))
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create(username="admin", email="admin@example.com", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def post_jsonl(self, kind, rows):
+        body = "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+        return self.client.generic(
+            "POST", reverse("bulk-import", args=[kind]), body, content_type="application/x-ndjson"
+        )
+
+    def test_allocate_slugs_in_one_query(self):
+        Article.objects.create(title="Hello World", content="x")
+        Article.objects.create(title="Hello World", content="x")
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(Article, ["Hello World", "Hello World", "Other", "!!!"], reserved={"other"})
+        self.assertEqual(slugs, ["hello-world-3", "hello-world-4", "other-2", "article"])
+
+    def test_import_reports_rows_and_inserts_valid_ones(self):
+        Article.objects.create(title="Imported", content="x")
+        response = self.post_jsonl("articles", [
+            {"title": "Imported", "content": "<p>One two three</p>", "is_draft": False, "category": "tech"},
+            {"title": "Imported", "content": "Draft body"},
+            "not json",
+            {"title": "Bad", "content": "x", "category": "nope"},
+            {"title": "Pinned", "slug": "pinned-slug", "content": "x"},
+            {"title": "Again", "slug": "pinned-slug", "content": "x"},
+        ])
+        self.assertEqual(response.status_code, 201)
+        result = response.json()
+        self.assertEqual(result["created"], 3)
+        self.assertEqual([error["line"] for error in result["errors"]], [3, 4, 6])
+        self.assertIn("category", result["errors"][1]["errors"])
+
+        published = Article.objects.get(slug="imported-2")
+        self.assertEqual((published.author, published.excerpt, published.word_count), (self.admin, "One two three", 3))
+        self.assertIsNotNone(published.published_date)
+        self.assertTrue(Article.objects.filter(slug="imported-3", is_draft=True).exists())
+        self.assertTrue(Article.objects.filter(slug="pinned-slug").exists())
+        self.assertEqual(search.search("three")[0], 1)
+
+    def test_import_is_admin_only(self):
+        self.client.force_authenticate(CustomUser.objects.create(username="reader", email="r@example.com"))
+        self.assertEqual(self.post_jsonl("projects", [{"title": "P", "description": "d"}]).status_code, 403)
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as source:
+            for n in range(3):
+                source.write(json.dumps({"title": "Cert", "description": "d", "issued_by": "Org", "issue_date": "2024-01-0%d" % (n + 1)}) + "\n")
+        self.addCleanup(os.remove, source.name)
+        out = StringIO()
+        call_command("import_content", "certificates", source.name, stdout=out)
+        self.assertIn("Imported 3 certificates", out.getvalue())
+        self.assertEqual(
+            sorted(Certificates.objects.values_list("slug", flat=True)), ["cert", "cert-2", "cert-3"]
+        )
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class AsyncReadViewTests(TestCase):
+    """Over ASGI the public reads are served by portfolio.async_views with the same JSON as the sync views."""
+
+    def setUp(self):
+        author = CustomUser.objects.create(username="writer")
+        SocialAccount.objects.create(user=author, provider="google", uid="writer", extra_data={"picture": "https://img/w"})
+        self.article = Article.objects.create(title="Async", content="Body", author=author, is_draft=False)
+        self.project = Project.objects.create(title="Async project", description="Desc", is_draft=False)
+        for n in range(3):
+            Comment.objects.create(content_object=self.article, author=author, content=f"Comment {n}")
+        Certificates.objects.create(title="Cert", description="d", issued_by="Org", issue_date="2024-01-01")
+
+    async def assert_same_as_sync(self, url, status=200):
+        response = await self.async_client.get(url)
+        self.assertEqual(response.resolver_match.func.__module__, "portfolio.async_views")
+        sync_response = await sync_to_async(self.client.get)(url)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(sync_response.status_code, status)
+        self.assertEqual(response.json(), sync_response.json())
+        return response
+
+    async def test_responses_match_sync_views(self):
+        urls = [
+            reverse("article_list"),
+            reverse("article_list") + "?cursor=",
+            reverse("article_list") + "?ordering=activity",
+            reverse("article-detail", args=[self.article.slug]),
+            reverse("article_detail_by_id", args=[self.article.pk]),
+            reverse("project_list"),
+            reverse("project_detail", args=[self.project.slug]),
+            reverse("project_detail_by_id", args=[self.project.pk]),
+            reverse("certificate-list"),
+            reverse("comment-list-create", args=["article", self.article.pk]),
+            reverse("comment-list-create", args=["article", self.article.pk]) + "?cursor=",
+            reverse("article_list") + "?fields=id,title,author",
+            reverse("article_list") + "?category=other&published_after=2020-01-01",
+            reverse("project_list") + "?cursor=&category=other",
+            reverse("project_detail", args=[self.project.slug]) + "?exclude=technologies,description",
+            reverse("certificate-list") + "?fields=title",
+            reverse("comment-list-create", args=["article", self.article.pk]) + "?fields=content,content_object",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                await self.assert_same_as_sync(url)
+
+    async def test_errors_match_sync_views(self):
+        await self.assert_same_as_sync(reverse("article-detail", args=["missing"]), status=404)
+        await self.assert_same_as_sync(reverse("article_list") + "?page=9", status=404)
+        await self.assert_same_as_sync(reverse("article_list") + "?cursor=bogus", status=404)
+        await self.assert_same_as_sync(reverse("comment-list-create", args=["article", 999]), status=404)
+        await self.assert_same_as_sync(reverse("article_list") + "?fields=title,bogus", status=400)
+        await self.assert_same_as_sync(reverse("project_list") + "?is_draft=true", status=403)
+
+    async def test_conditional_and_cached_responses(self):
+        url = reverse("article-detail", args=[self.article.slug])
+        etag = (await self.async_client.get(url))["ETag"]
+        self.assertEqual((await self.async_client.get(url, headers={"if-none-match": etag})).status_code, 304)
+
+        with override_settings(RESPONSE_CACHE_TIMEOUT=60):
+            await sync_to_async(cache.clear)()
+            self.assertEqual((await self.async_client.get(url))["X-Cache"], "MISS")
+            self.assertEqual((await self.async_client.get(url))["X-Cache"], "HIT")
+
+    async def test_comment_posts_reach_the_sync_view(self):
+        url = reverse("comment-list-create", args=["article", self.article.pk])
+        self.assertEqual((await self.async_client.post(url, {"content": "Hi"})).status_code, 401)
+
+
+class StubGoogleHandler(BaseHTTPRequestHandler):
+    """Local stand-in for Google's userinfo endpoint; behaviour is set on the server."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.client_address, self.headers.get("Authorization")))
+        if server.delay:
+            time.sleep(server.delay)
+        status_code, payload = server.reply
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GoogleUserinfoTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGoogleHandler)
+        self.server.requests, self.server.delay = [], 0
+        self.server.reply = (200, {"picture": "https://img/new"})
+        # Timed-out clients hang up before the slow reply is written
+        self.server.handle_error = lambda request, address: None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        override = override_settings(
+            GOOGLE_USERINFO_URL=f"http://127.0.0.1:{self.server.server_port}/userinfo",
+            GOOGLE_USERINFO_TIMEOUT=(0.5, 0.2),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        google.breaker = google.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        self.user = CustomUser.objects.create(username="googler", email="g@example.com")
+        self.user.set_unusable_password()
+        self.user.save()
+        self.account = SocialAccount.objects.create(
+            user=self.user, provider="google", uid="g", extra_data={"picture": "https://img/old"}
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def profile_image(self, **headers):
+        response = self.client.get(reverse("user-profile"), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["profile_image_url"]
+
+    def test_lookup_is_cached_per_account(self):
+        self.assertEqual(self.profile_image(x_google_access_token="token-1"), "https://img/new")
+        self.assertEqual(self.profile_image(x_google_access_token="token-1"), "https://img/new")
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[0][1], "Bearer token-1")
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.extra_data["picture"], "https://img/new")
+
+    def test_stored_token_and_pooled_connection(self):
+        app = SocialApp.objects.create(provider="google", name="Google", client_id="id", secret="s")
+        SocialToken.objects.create(app=app, account=self.account, token="stored-token")
+        self.profile_image()
+        cache.clear()
+        self.profile_image()
+        self.assertEqual([auth for _, auth in self.server.requests], ["Bearer stored-token"] * 2)
+        # Both lookups went over the same keep-alive connection
+        self.assertEqual(len({address for address, _ in self.server.requests}), 1)
+
+    def test_slow_google_serves_last_known_picture_and_opens_breaker(self):
+        self.server.delay = 0.5
+        for _ in range(3):
+            self.assertEqual(self.profile_image(x_google_access_token="token-1"), "https://img/old")
+        # The third call was answered without contacting Google
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertTrue(google.breaker.is_open)
+
+    def test_rejected_token_falls_back(self):
+        self.server.reply = (401, {"error": "invalid_token"})
+        self.assertEqual(self.profile_image(x_google_access_token="expired"), "https://img/old")
+        self.assertFalse(google.breaker.is_open)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class AvatarUrlTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = CustomUser.objects.create(username="face", email="face@example.com")
+        self.user.set_password("secret-pass-123")
+        self.user.save()
+
+    def test_follows_google_account_and_uploads(self):
+        account = SocialAccount.objects.create(
+            user=self.user, provider="google", uid="face", extra_data={"picture": "https://img/a"}
+        )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_url, "https://img/a")
+
+        # A social login re-saves the account with the current picture
+        account.extra_data = {"picture": "https://img/b"}
+        account.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_url, "https://img/b")
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.put(reverse("update_profile"), {"profile_picture": make_image()})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_url, self.user.profile_picture.url)
+
+        self.user.profile_picture = None
+        self.user.save()
+        self.assertEqual(self.user.avatar_url, "https://img/b")
+
+    def test_token_claim_needs_no_queries(self):
+        SocialAccount.objects.create(user=self.user, provider="google", uid="face", extra_data={"picture": "https://img/a"})
+        self.user.refresh_from_db()
+        with self.assertNumQueries(0):
+            token = CustomTokenObtainPairSerializer.get_token(self.user)
+        self.assertEqual(token["profile_image"], "https://img/a")
+
+    def test_backfill(self):
+        backfill = import_module("portfolio.migrations.0015_avatar_url").backfill_avatar_urls
+        SocialAccount.objects.create(user=self.user, provider="google", uid="face", extra_data={"picture": "https://img/a"})
+        CustomUser.objects.update(avatar_url="")
+        backfill(django_apps, None)
+        self.assertEqual(CustomUser.objects.get().avatar_url, "https://img/a")
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = CustomUser.objects.create(username="reader", email="reader@example.com")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+        self.request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def authenticate(self):
+        return CachedJWTAuthentication().authenticate(self.request)[0]
+
+    def test_steady_state_needs_no_queries(self):
+        self.assertEqual(self.authenticate(), self.user)
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.username, "reader")
+        # Each request gets its own instance
+        user.username = "changed"
+        self.assertEqual(self.authenticate().username, "reader")
+
+    def test_saves_and_deletes_evict(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        self.user.delete()
+        self.assertEqual(self.client.get(reverse("user-profile")).status_code, 401)
+
+    def test_cache_is_bounded(self):
+        cache = UserCache(maxsize=2, timeout=60)
+        for key in "abc":
+            cache.set(key, self.user)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("a"))
+        expired = UserCache(maxsize=2, timeout=-1)
+        expired.set("a", self.user)
+        self.assertIsNone(expired.get("a"))
+
+
+class SqliteProductionProfileTests(SimpleTestCase):
+    # The test opens its own connections to a scratch file, under the "default" alias
+    databases = {"default"}
+
+    def test_readers_are_not_blocked_by_a_writer(self):
+        scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch)
+        database = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(scratch, "db.sqlite3"),
+            "OPTIONS": settings.SQLITE_PRODUCTION_OPTIONS,
+        }
+        handler = ConnectionHandler({"default": dict(database), "reader": dict(database)})
+        self.addCleanup(handler.close_all)
+        writer, reader = handler["default"], handler["reader"]
+
+        with writer.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("CREATE TABLE t (n INTEGER)")
+            cursor.execute("INSERT INTO t VALUES (1)")
+
+        with writer.cursor() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("INSERT INTO t VALUES (2)")
+            # The open write transaction doesn't block the reader, which sees the last commit
+            with reader.cursor() as read_cursor:
+                read_cursor.execute("SELECT COUNT(*) FROM t")
+                self.assertEqual(read_cursor.fetchone()[0], 1)
+            cursor.execute("COMMIT")
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class SeedAndBenchmarkTests(TestCase):
+    counts = {"users": 8, "articles": 12, "projects": 4, "certificates": 2, "comments": 80}
+
+    def snapshot(self):
+        return (
+            list(Article.objects.order_by("pk").values_list("title", "content", "comment_count")),
+            [comment.depth for comment in Comment.objects.order_by("pk")],
+        )
+
+    def test_seed_is_deterministic_and_consistent(self):
+        seeding.seed(self.counts, seed=7)
+        first = self.snapshot()
+        self.assertGreater(max(first[1]), 0)  # threaded
+        output = StringIO()
+        call_command("reconcile_counters", "--dry-run", stdout=output)
+        self.assertEqual(output.getvalue().count(": 0 drifted"), 3)
+
+        Article.objects.all().delete()
+        Project.objects.all().delete()
+        Certificates.objects.all().delete()
+        CustomUser.objects.all().delete()
+        seeding.seed(self.counts, seed=7)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_every_route_is_benchmarked(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        seeding.seed(self.counts)
+        scenarios = benchmarks.scenarios()
+        self.assertEqual(benchmarks.routes() - {scenario.route for scenario in scenarios}, set())
+        with redirect_stdout(StringIO()):
+            results = benchmarks.run(scenarios, iterations=1, warmup=0)
+        for endpoint, result in results.items():
+            self.assertEqual(result["status"], result["expected_status"], endpoint)
+        # Everything was rolled back
+        self.assertEqual(Article.objects.count(), self.counts["articles"])
+
+        encoding = benchmarks.encoding(iterations=1)
+        self.assertEqual(encoding["renderers"]["json"]["bytes"], encoding["renderers"]["orjson"]["bytes"])
+        self.assertLess(encoding["codings"]["gzip"]["bytes"], encoding["codings"]["identity"]["bytes"])
+
+        slower = {name: {**result, "p50_ms": result["p50_ms"] * 2 + 2} for name, result in results.items()}
+        self.assertTrue(all(row[-1] for row in benchmarks.compare(results, slower)))
+        self.assertFalse(any(row[-1] for row in benchmarks.compare(results, results)))
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create(username="timed")
+        self.article = Article.objects.create(title="Timed", content="Body", author=self.author, is_draft=False)
+        for n in range(3):
+            commenter = CustomUser.objects.create(username=f"commenter{n}")
+            Comment.objects.create(content_object=self.article, author=commenter, content="Hi")
+
+    def metrics(self, response):
+        entries = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            entries[name] = dict(param.split("=", 1) for param in params)
+        return entries
+
+    def test_header_reports_queries_and_phases(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("article_list"))
+        metrics = self.metrics(response)
+        self.assertEqual(metrics["db"]["desc"], f'"{len(queries.captured_queries)} queries"')
+        self.assertGreater(float(metrics["serialize"]["dur"]), 0)
+        self.assertLessEqual(float(metrics["view"]["dur"]), float(metrics["total"]["dur"]))
+
+    async def test_async_views_count_queries_run_in_threads(self):
+        response = await self.async_client.get(reverse("article_list"))
+        self.assertNotEqual(self.metrics(response)["db"]["desc"], '"0 queries"')
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0, ROOT_URLCONF=__name__)
+    def test_slow_requests_are_logged_with_repeated_queries(self):
+        with self.assertLogs("portfolio.slow_requests", "WARNING") as logs:
+            self.client.put("/repeated-lookups/")
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry["method"], entry["status"]), ("PUT", 200))
+        self.assertTrue(entry["slowest_queries"])
+        duplicate, = entry["duplicate_queries"]
+        self.assertEqual((duplicate["count"], duplicate["identical"]), (4, 1))
+        self.assertIn('FROM "portfolio_customuser"', duplicate["sql"])
+
+
+def _repeated_lookups(request):
+    # Three lookups with different parameters (the N+1 shape) and one exact repeat
+    for username in ("timed", "commenter0", "commenter1", "timed"):
+        CustomUser.objects.filter(username=username).exists()
+    return HttpResponse()
+
+
+# Routes for tests that run with ROOT_URLCONF pointed at this module
+urlpatterns = [path("repeated-lookups/", _repeated_lookups)]
+
+
+def _record_in_child():
+    metrics.observe("article_list", 200, 0.3, 5, 0.01)
+    metrics.flush()
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0, METRICS_TOKEN="scrape-secret")
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        override = override_settings(METRICS_DIR=self.metrics_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def scrape(self, **headers):
+        headers.setdefault("authorization", "Bearer scrape-secret")
+        response = self.client.get(reverse("metrics"), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_requests_are_aggregated_across_processes(self):
+        for _ in range(3):
+            self.client.get(reverse("article_list"))
+        self.client.get("/no-such-page/")
+        child = multiprocessing.get_context("fork").Process(target=_record_in_child)
+        child.start()
+        child.join()
+
+        samples = self.scrape()
+        self.assertEqual(samples['portfolio_requests_total{route="article_list",status="200"}'], 4)
+        self.assertEqual(samples['portfolio_requests_total{route="unmatched",status="404"}'], 1)
+        self.assertEqual(samples['portfolio_request_duration_seconds_count{route="article_list"}'], 4)
+        # The child's request fell in the 0.5s bucket
+        self.assertEqual(
+            samples['portfolio_request_duration_seconds_bucket{route="article_list",le="0.5"}']
+            - samples['portfolio_request_duration_seconds_bucket{route="article_list",le="0.25"}'], 1
+        )
+        self.assertGreaterEqual(samples['portfolio_db_queries_total{route="article_list"}'], 5)
+        self.assertIn('portfolio_cache_requests_total{cache="response",result="hit"}', samples)
+
+        # The exited child's file was folded into one file for exited processes
+        snapshots = sorted(name for name in os.listdir(self.metrics_dir) if name.endswith(".json"))
+        self.assertEqual(snapshots, sorted([metrics.RETIRED, metrics._store.filename]))
+        again = self.scrape()
+        self.assertEqual(again['portfolio_requests_total{route="article_list",status="200"}'], 4)
+
+    def test_token_or_staff_is_required(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], "Bearer")
+        self.assertEqual(self.client.get(reverse("metrics"), headers={"authorization": "Bearer wrong"}).status_code, 401)
+
+        self.client.force_login(CustomUser.objects.create(username="ops", is_staff=True))
+        self.scrape(authorization="")
+        with override_settings(METRICS_TOKEN=None):
+            self.scrape(authorization="Bearer scrape-secret")
+            self.client.logout()
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = CustomUser.objects.create(username="writer", first_name="Ada")
+        self.article = Article.objects.create(title="Sparse", content="<p>Body</p>", author=self.author, is_draft=False)
+        self.project = Project.objects.create(
+            title="Sparse project", description="Desc", technologies=["Django"], is_draft=False
+        )
+        for target in (self.article, self.project):
+            Comment.objects.create(content_object=target, author=self.author, content="Hi")
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query["sql"] for query in ctx.captured_queries]
+
+    def test_fields_trim_output_and_columns(self):
+        data, queries = self.get(reverse("article-detail", args=[self.article.slug]) + "?fields=title,category_display")
+        self.assertEqual(data, {"title": "Sparse", "category_display": self.article.get_category_display()})
+        # The first query is the conditional GET validator lookup
+        _, *view_queries = queries
+        self.assertEqual(len(view_queries), 1)
+        self.assertNotIn('"portfolio_article"."content"', view_queries[0])
+        self.assertIn('"portfolio_article"."category"', view_queries[0])
+        # Neither the author join nor the comment prefetch
+        self.assertNotIn('"portfolio_customuser"', view_queries[0])
+
+    def test_exclude_defers_columns_and_skips_prefetch(self):
+        data, queries = self.get(reverse("project_list") + "?exclude=description,technologies")
+        result = data["results"][0]
+        self.assertNotIn("description", result)
+        self.assertNotIn("comments", result)
+        self.assertEqual(result["title"], "Sparse project")
+        self.assertFalse(any('"portfolio_project"."description"' in sql for sql in queries))
+        self.assertFalse(any('"portfolio_project"."technologies"' in sql for sql in queries))
+        self.assertFalse(any('"portfolio_comment"' in sql for sql in queries))
+
+    def test_requested_relations_are_still_loaded(self):
+        data, queries = self.get(reverse("article_list") + "?fields=title,author")
+        self.assertEqual(data["results"][0], {"title": "Sparse", "author": {
+            "id": self.author.pk, "username": "writer", "full_name": "Ada",
+            "profile_picture": None, "profile_picture_variants": None,
+        }})
+        self.assertLessEqual(len(queries), 2)
+
+        comments = self.get(reverse("comment-list-create", args=["project", self.project.pk]) + "?fields=content_object")[0]
+        self.assertEqual(comments["results"][0]["content_object"]["title"], "Sparse project")
+
+    def test_keyset_pages_do_not_load_deferred_columns(self):
+        for n in range(10):
+            Article.objects.create(title=f"More {n}", content="Body", is_draft=False)
+        data, queries = self.get(reverse("article_list") + "?cursor=&fields=title")
+        self.assertEqual(len(data["results"]), 10)
+        self.assertIsNotNone(data["next"])
+        self.assertLessEqual(len(queries), 1)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse("certificate-list") + "?fields=title,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"fields": ["Unknown field(s): secret."]})
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class ListingFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = CustomUser.objects.create(username="editor", is_staff=True)
+        self.writer = CustomUser.objects.create(username="writer")
+        self.tech = Article.objects.create(title="Tech", content="x", category="tech", author=self.writer, is_draft=False)
+        self.news = Article.objects.create(title="News", content="x", category="news", is_draft=False)
+        self.draft = Article.objects.create(title="Draft", content="x", category="tech", author=self.writer)
+        Article.objects.filter(pk=self.news.pk).update(published_date=timezone.now() - timedelta(days=30))
+
+    def titles(self, query, user=None):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse("article_list") + query)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [article["title"] for article in response.json()["results"]]
+
+    def test_filters(self):
+        self.assertEqual(self.titles(""), ["Tech", "News"])
+        self.assertEqual(self.titles("?category=tech"), ["Tech"])
+        self.assertEqual(self.titles(f"?author={self.writer.pk}"), ["Tech"])
+        week_ago = (timezone.now() - timedelta(days=7)).date().isoformat()
+        self.assertEqual(self.titles(f"?published_after={week_ago}"), ["Tech"])
+        self.assertEqual(self.titles(f"?published_before={week_ago}&cursor="), ["News"])
+
+    def test_drafts_are_staff_only(self):
+        self.assertEqual(self.titles("", self.staff), ["Tech", "News", "Draft"])
+        self.assertEqual(self.titles("?is_draft=true&category=tech", self.staff), ["Draft"])
+        self.assertEqual(self.titles("?is_draft=false", self.writer), ["Tech", "News"])
+        self.client.force_authenticate(self.writer)
+        self.assertEqual(self.client.get(reverse("article_list") + "?is_draft=true").status_code, 403)
+
+    def test_bad_values_are_rejected(self):
+        for query in ("?category=bogus", "?published_after=yesterday", "?author=me", "?is_draft=maybe"):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(reverse("article_list") + query).status_code, 400)
+        self.assertEqual(self.client.get(reverse("project_list") + "?author=1").status_code, 400)
+
+    def test_every_filter_combination_uses_an_index(self):
+        factory = APIRequestFactory()
+        filters = ["category=web_dev", "published_after=2024-01-01", "published_before=2025-01-01", f"author={self.writer.pk}"]
+        for queryset in (article_list_queryset, project_queryset):
+            table = queryset().model._meta.db_table
+            # Projects have no author
+            available = filters if queryset is article_list_queryset else filters[:3]
+            for size in range(len(available) + 1):
+                for combination in itertools.combinations(available, size):
+                    for staff, drafts in ((False, ""), (True, ""), (True, "is_draft=true")):
+                        query = "&".join([*combination, drafts])
+                        request = factory.get("/?" + query)
+                        page = filter_listing(request, queryset(), staff).order_by(
+                            F("published_date").desc(nulls_last=True), "-id"
+                        )[:11]
+                        with self.subTest(table=table, query=query, staff=staff):
+                            plan = self.explain(page)
+                            steps = [step for step in plan if table in step]
+                            self.assertTrue(steps and all("USING" in step and "INDEX" in step for step in steps), plan)
+                            self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+
+class FastJSONTests(SimpleTestCase):
+    def test_renderer_output_matches_drf(self):
+        data = {
+            "title": "Caf\u00e9 \u2028 line", "when": timezone.now(), "day": timezone.now().date(),
+            "price": Decimal("1.50"), "label": gettext_lazy("Other"), 1: [None, True, 2.5],
+            "error": ErrorDetail("Bad", code="invalid"), "big": 2 ** 70,
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(data, "application/json; indent=2"), JSONRenderer().render(data, "application/json; indent=2")
+        )
+
+    def test_parser(self):
+        parsed = ORJSONParser().parse(BytesIO('{"title": "Caf\u00e9", "n": [1, 2]}'.encode()), parser_context={})
+        self.assertEqual(parsed, {"title": "Caf\u00e9", "n": [1, 2]})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b"{nope"), parser_context={})
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def compress(self, response, accept_encoding="gzip"):
+        return compression.compress_response(self.factory.get("/", HTTP_ACCEPT_ENCODING=accept_encoding), response)
+
+    def test_negotiation(self):
+        best = "br" if compression.brotli else "gzip"
+        self.assertEqual(compression.negotiate("gzip, deflate, br"), best)
+        self.assertEqual(compression.negotiate("br;q=0.5, gzip"), "gzip")
+        self.assertEqual(compression.negotiate("gzip;q=0, br;q=0"), None)
+        self.assertEqual(compression.negotiate("*"), best)
+        self.assertEqual(compression.negotiate("identity"), None)
+        self.assertEqual(compression.negotiate(""), None)
+
+    def test_large_json_is_compressed(self):
+        body = json.dumps([{"title": f"Article {n}"} for n in range(50)]).encode()
+        response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = '"abc"'
+        response = self.compress(response)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), body)
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["ETag"], 'W/"abc"')
+
+    def test_small_html_and_ranges_are_left_alone(self):
+        small = self.compress(HttpResponse(b"{}", content_type="application/json"))
+        html = self.compress(HttpResponse(b"<p>" * 100, content_type="text/html"))
+        ranged = HttpResponse(b"x" * 200, content_type="text/plain", status=206)
+        ranged["Content-Range"] = "bytes 0-199/1000"
+        for response in (small, html, self.compress(ranged)):
+            self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertFalse(self.compress(HttpResponse(b"x" * 200, content_type="text/plain"), "identity").has_header(
+            "Content-Encoding"
+        ))
+
+    def test_streaming_is_compressed_chunk_by_chunk(self):
+        lines = [json.dumps({"n": n}).encode() + b"\n" for n in range(20)]
+        response = self.compress(StreamingHttpResponse(iter(lines), content_type="application/x-ndjson"))
+        decompressor = zlib.decompressobj(31)
+        # Each chunk can be decoded as soon as it arrives
+        chunks = list(response.streaming_content)
+        self.assertEqual(decompressor.decompress(chunks[0]), lines[0])
+        self.assertEqual(lines[0] + b"".join(decompressor.decompress(chunk) for chunk in chunks[1:]), b"".join(lines))
+        self.assertFalse(response.has_header("Content-Length"))
+
+    async def test_async_streaming(self):
+        async def lines():
+            for n in range(5):
+                yield json.dumps({"n": n}).encode() + b"\n"
+
+        response = self.compress(StreamingHttpResponse(lines(), content_type="application/x-ndjson"))
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gzip.decompress(body), b"".join([json.dumps({"n": n}).encode() + b"\n" for n in range(5)]))
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_api_responses_are_compressed(self):
+        for n in range(10):
+            Article.objects.create(title=f"Compressed {n}", content="Body", is_draft=False)
+        plain = self.client.get(reverse("article_list"))
+        compressed = self.client.get(reverse("article_list"), headers={"accept-encoding": "gzip"})
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+
+
+class MediaServingTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_SENDFILE=None)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.body = bytes(range(256)) * 40
+        os.makedirs(os.path.join(self.media_root, "articles"))
+        for name in ("articles/photo.png", f"cas/{'ab' * 32}.png"):
+            os.makedirs(os.path.dirname(os.path.join(self.media_root, name)), exist_ok=True)
+            with open(os.path.join(self.media_root, name), "wb") as file:
+                file.write(self.body)
+
+    def get(self, name, **headers):
+        response = self.client.get(settings.MEDIA_URL + name, headers=headers)
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, content
+
+    def test_full_file_and_cache_headers(self):
+        response, content = self.get("articles/photo.png")
+        self.assertEqual((response.status_code, content), (200, self.body))
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response["Cache-Control"], f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(self.get(f"cas/{'ab' * 32}.png")[0]["Cache-Control"], "public, max-age=31536000, immutable")
+
+        self.assertEqual(self.get("articles/photo.png", if_none_match=response["ETag"])[0].status_code, 304)
+        not_modified = self.get("articles/photo.png", if_modified_since=response["Last-Modified"])[0]
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["Cache-Control"], response["Cache-Control"])
+
+    def test_ranges(self):
+        response, content = self.get("articles/photo.png", range="bytes=10-19")
+        self.assertEqual((response.status_code, content), (206, self.body[10:20]))
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.body)}")
+        self.assertEqual(self.get("articles/photo.png", range="bytes=-5")[1], self.body[-5:])
+        self.assertEqual(self.get("articles/photo.png", range="bytes=10000-")[1], self.body[10000:])
+
+        unsatisfiable = self.get("articles/photo.png", range=f"bytes={len(self.body)}-")[0]
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable["Content-Range"], f"bytes */{len(self.body)}")
+        # A stale If-Range and several ranges both get the whole file
+        for headers in ({"range": "bytes=0-9", "if_range": '"stale"'}, {"range": "bytes=0-9,20-29"}):
+            self.assertEqual(self.get("articles/photo.png", **headers)[0].status_code, 200)
+        etag = self.get("articles/photo.png")[0]["ETag"]
+        self.assertEqual(self.get("articles/photo.png", range="bytes=0-9", if_range=etag)[0].status_code, 206)
+
+    def test_missing_and_outside_files(self):
+        for name in ("articles/missing.png", "articles", "../" * 5 + "etc/passwd", "articles/../../secret"):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name)[0].status_code, 404)
+        self.assertEqual(self.client.post(settings.MEDIA_URL + "articles/photo.png").status_code, 405)
+
+    def test_sendfile_offload(self):
+        with override_settings(MEDIA_SENDFILE="x-accel-redirect"):
+            response, content = self.get("articles/photo.png", range="bytes=0-9")
+        self.assertEqual((response.status_code, content), (200, b""))
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/articles/photo.png")
+        self.assertEqual(response["Content-Type"], "image/png")
+
+        with override_settings(MEDIA_SENDFILE="x-sendfile"):
+            response = self.get("articles/photo.png")[0]
+        self.assertEqual(response["X-Sendfile"], os.path.join(self.media_root, "articles", "photo.png"))
+
+
+@override_settings(JOB_QUEUE_EAGER=True, RESPONSE_CACHE_TIMEOUT=0)
+class BlobStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.storage = BlobStorage()
+
+    def references(self, name):
+        return MediaBlob.objects.filter(name=name).values_list("references", flat=True).first()
+
+    def test_identical_content_is_stored_once(self):
+        first = self.storage.save("articles/photo.JPG", ContentFile(b"same bytes"))
+        second = self.storage.save("projects/other.jpg", ContentFile(b"same bytes"))
+        different = self.storage.save("articles/photo.jpg", ContentFile(b"other bytes"))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, different)
+        self.assertRegex(first, r"^blobs/([0-9a-f]{2})/\1[0-9a-f]{62}\.jpg$")
+        self.assertEqual(self.references(first), 2)
+        self.assertEqual(media.cache_control(first), media.IMMUTABLE)
+        with self.storage.open(first) as file:
+            self.assertEqual(file.read(), b"same bytes")
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "blobs", "incoming")), [])
+
+    def test_file_is_removed_with_its_last_reference(self):
+        name = self.storage.save("photo.jpg", ContentFile(b"shared"))
+        self.storage.save("photo.jpg", ContentFile(b"shared"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+        self.assertEqual(self.references(name), 1)
+        self.assertTrue(self.storage.exists(name))
+
+        # Not removed while the release could still be rolled back
+        with self.captureOnCommitCallbacks(execute=False):
+            self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+        # Files stored before blobs existed are deleted outright
+        legacy = os.path.join(self.media_root, "articles", "legacy.jpg")
+        os.makedirs(os.path.dirname(legacy))
+        with open(legacy, "wb") as file:
+            file.write(b"old")
+        self.storage.delete("articles/legacy.jpg")
+        self.assertFalse(os.path.exists(legacy))
+
+    def test_models_share_and_release_images(self):
+        staff = CustomUser.objects.create(username="staff", email="staff@example.com", is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Project.objects.create(title="First", description="d", project_image=make_image())
+            second = Project.objects.create(title="Second", description="d", project_image=make_image(name="copy.jpg"))
+        first.refresh_from_db()
+        second.refresh_from_db()
+        name = first.project_image.name
+        self.assertEqual(second.project_image.name, name)
+        self.assertEqual(first.project_image_variants["variants"], second.project_image_variants["variants"])
+        self.assertEqual(self.references(name), 2)
+
+        # Re-uploading the same image keeps one reference for the row
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put(reverse("update_project", args=[first.pk]), {"project_image": make_image()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.references(name), 2)
+
+        variants = list(first.project_image_variants["variants"]["image/webp"].values())
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(self.storage.exists(name))
+        self.assertTrue(all(self.storage.exists(variant) for variant in variants))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(any(self.storage.exists(variant) for variant in variants))
+        self.assertFalse(MediaBlob.objects.exists())
@@ -0,0 +1,117 @@
+"""
+Per-request timing collected by `ServerTimingMiddleware`: every SQL
+statement with its duration, and the time spent producing serializer output.
+The state lives in a context variable, so it follows a request into the
+threads `sync_to_async` runs its ORM calls in; outside a request the hooks
+only cost a context variable lookup.
+"""
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from rest_framework.serializers import BaseSerializer
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    __slots__ = ("started", "view_started", "queries", "serialize", "_serializing")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        # (sql, params, many, seconds) per statement
+        self.queries = []
+        self.serialize = 0.0
+        self._serializing = 0
+
+    @property
+    def db(self):
+        return sum(query[3] for query in self.queries)
+
+    def slowest_queries(self, limit=5):
+        slowest = sorted(self.queries, key=lambda query: query[3], reverse=True)[:limit]
+        return [{"sql": sql[:500], "ms": round(seconds * 1000, 2)} for sql, _, _, seconds in slowest]
+
+    def duplicate_queries(self, limit=5):
+        """
+        Statements run more than once, most repeated first. `identical` counts
+        repeats with the same parameters too (pure waste); a high `count`
+        with different parameters is the N+1 pattern.
+        """
+        groups = defaultdict(list)
+        for sql, params, many, seconds in self.queries:
+            if not many:
+                groups[sql].append((params, seconds))
+        duplicates = []
+        for sql, runs in groups.items():
+            if len(runs) < 2:
+                continue
+            distinct = len({repr(params) for params, _ in runs})
+            duplicates.append({
+                "sql": sql[:500],
+                "count": len(runs),
+                "identical": len(runs) - distinct,
+                "ms": round(sum(seconds for _, seconds in runs) * 1000, 2),
+            })
+        duplicates.sort(key=lambda duplicate: duplicate["count"], reverse=True)
+        return duplicates[:limit]
+
+
+def start():
+    """Begin timing a request; returns the timings and a token for `stop()`."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """A database execute wrapper (see `instrument`) that times statements run during a request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries.append((sql, params, many, time.perf_counter() - started))
+
+
+def instrument(connection):
+    """Install `record_query` on a connection; safe to call on every reconnect."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def instrument_serializers():
+    """
+    Time `serializer.data`, where DRF turns instances into primitives. Nested
+    serializers are called through `to_representation`, and a serializer
+    reading another's `.data` is only counted once.
+    """
+    data = BaseSerializer.data
+    if getattr(data.fget, "timed", False):
+        return
+
+    def timed_data(self):
+        timings = _current.get()
+        if timings is None:
+            return data.fget(self)
+        timings._serializing += 1
+        started = time.perf_counter()
+        try:
+            return data.fget(self)
+        finally:
+            timings._serializing -= 1
+            if not timings._serializing:
+                timings.serialize += time.perf_counter() - started
+
+    timed_data.timed = True
+    BaseSerializer.data = property(timed_data)
@@ -18,6 +18,7 @@ urlpatterns = [
 
     path("api/comments/<str:content_type>/<int:object_id>/", views.comment_list_create, name="comment-list-create"),
     path('api/comments/<str:content_type>/<int:object_id>/<int:comment_id>/replies/', views.add_reply, name='add_reply'),
+    path('api/comments/<str:content_type>/<int:object_id>/thread/', views.comment_thread, name='comment-thread'),
     path('api/comments/<int:comment_id>/replies/', views.get_replies, name='get-replies'),
     path("api/comments/<int:comment_id>/delete/", views.comment_delete, name="comment-delete"),
     path('api/comments/<int:comment_id>/replies/<int:reply_id>/delete/', views.delete_reply, name='delete-reply'),
@@ -26,4 +27,10 @@ urlpatterns = [
     path('api/certificates/create/', views.certificate_create, name='certificate-create'),
     path('api/certificates/<int:pk>/update/', views.certificate_update, name='certificate-update'),
     path('api/certificates/<int:pk>/delete/', views.certificate_delete, name='certificate-delete'),
+
+    path('api/import/<str:kind>/', views.bulk_import, name='bulk-import'),
+
+    path('api/search/', views.search_content, name='search'),
+
+    path('metrics', views.prometheus_metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,34 +1,43 @@
+import hmac
 import json
-import os
 
-import requests
 from .serializers import *
-from django.http import JsonResponse
-
+from . import google, metrics, search
+from .cache import cache_response, invalidate
+from .conditional import (
+    article_detail_by_id_validators, article_detail_validators, article_list_validators, conditional,
+    project_detail_by_id_validators, project_detail_validators, project_list_validators,
+)
+from .fieldsets import sparse_fields, sparse_queryset
+from .filters import filter_listing
+from .importer import IMPORTABLE, import_content
+from .pagination import StandardResultsSetPagination, get_paginator
+from .querysets import article_list_queryset, article_queryset, comment_queryset, project_queryset
+from django.http import HttpResponse, JsonResponse
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.hashers import check_password, make_password
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect
 
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_safe
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.pagination import PageNumberPagination
 
 from allauth.socialaccount.models import SocialToken, SocialAccount
 
 
 User = get_user_model()
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-
-
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
@@ -49,11 +58,6 @@ def user_create(request):
     if serializer.is_valid():
         user = serializer.save()
 
-        # Handle profile picture upload if provided
-        if "profile_picture" in request.FILES:
-            user.profile_picture = request.FILES["profile_picture"]
-            user.save()
-
         # Re-serialize to return updated data including profile_picture URL
         response_serializer = UserSerializer(user, context={"request": request})
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -82,13 +86,7 @@ def user_detail(request):
         serializer = UserSerializer(user, data=request.data, partial=True)
         
         if serializer.is_valid():
-            updated_user = serializer.save()
-
-            # Handle profile image update if provided
-            if "profile_picture" in request.FILES:
-                updated_user.profile_picture = request.FILES["profile_picture"]
-                updated_user.save()
-            
+            serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -106,20 +104,13 @@ def get_user_profile(request):
     serializer = UserSerializer(user)
 
     # Always use uploaded image if it exists
-    profile_image_url = request.build_absolute_uri(profile.profile_image.url) if profile.profile_image else None
-
-    # Only fetch Google image if no uploaded image exists
-    if not profile_image_url and not user.has_usable_password():  
-        google_token = request.headers.get("Authorization", "").replace("Bearer ", "")
-        if google_token:
-            try:
-                google_user_info = requests.get(
-                    "https://www.googleapis.com/oauth2/v3/userinfo",
-                    headers={"Authorization": f"Bearer {google_token}"},
-                ).json()
-                profile_image_url = google_user_info.get("picture")
-            except requests.exceptions.RequestException:
-                profile_image_url = None
+    profile_image_url = request.build_absolute_uri(user.profile_picture.url) if user.profile_picture else None
+
+    # Only look up the Google image if no uploaded image exists. The
+    # Authorization header carries our JWT, so the Google access token comes
+    # from X-Google-Access-Token or the token stored at login.
+    if not profile_image_url and not user.has_usable_password():
+        profile_image_url = google.get_picture(user, token=request.headers.get("X-Google-Access-Token"))
 
     return Response({
         "user": serializer.data,
@@ -139,11 +130,10 @@ def update_user(request):
         updated_fields.append("username")
 
     # Handle profile image update
+    old_picture = None
     if "profile_picture" in request.FILES:
-        # Delete old picture if it exists
-        if user.profile_picture:
-            # Use Django's delete method to remove the file safely
-            user.profile_picture.delete(save=False)
+        # The old file is released by a worker once the new one is saved
+        old_picture = user.profile_picture.name or None
 
         # Save new image
         user.profile_picture = request.FILES["profile_picture"]
@@ -160,6 +150,9 @@ def update_user(request):
 
     # Save the updated user instance
     user.save()
+    if old_picture:
+        # Even when the new upload has the same content (and name), it holds its own reference
+        delete_file_later(old_picture)
 
     # Return response indicating successful update
     return Response(
@@ -188,15 +181,7 @@ def google_login_callback(request):
         refresh["is_superuser"] = user.is_superuser
         refresh["full_name"] = user.get_full_name()
 
-        google_profile_picture = social_account.extra_data.get('picture')
-        custom_profile_picture = user.profile_picture.url if user.profile_picture else None
-
-        if custom_profile_picture:
-            refresh["profile_picture"] = custom_profile_picture
-        elif google_profile_picture:
-            refresh["profile_picture"] = google_profile_picture
-        else:
-            refresh["profile_picture"] = None 
+        refresh["profile_picture"] = user.avatar_url or None
 
         access_token = str(refresh.access_token)
 
@@ -261,28 +246,43 @@ def create_project(request):
 # List all Projects
 # ----------------------------------------
 
+@cache_response("projects")
+@conditional(project_list_validators)
 @api_view(['GET'])
 def project_list(request):
-    projects = Project.objects.all()
-    paginator = StandardResultsSetPagination()
+    fields = sparse_fields(request, ProjectSerializer)
+    projects = sparse_queryset(project_queryset(), ProjectSerializer, fields)
+    projects = filter_listing(request, projects, staff=request.user.is_staff)
+    if request.query_params.get("ordering") == "activity":
+        # Most discussed first; activity order is only paged by number
+        projects = projects.order_by("-comment_count", "-published_date", "-id")
+        paginator = StandardResultsSetPagination()
+    else:
+        paginator = get_paginator(request, "published_date")
     result_page = paginator.paginate_queryset(projects, request)
-    serializer = ProjectSerializer(result_page, many=True)
+    serializer = ProjectSerializer(result_page, many=True, fields=fields)
     return paginator.get_paginated_response(serializer.data)
 
 # ----------------------------------------
 # Get Project Detail
 # ----------------------------------------
 
+@cache_response("projects")
+@conditional(project_detail_validators)
 @api_view(["GET"])
 def project_detail(request, slug):
-    project = get_object_or_404(Project, slug=slug)
-    serializer = ProjectSerializer(project)
+    fields = sparse_fields(request, ProjectSerializer)
+    project = get_object_or_404(sparse_queryset(project_queryset(), ProjectSerializer, fields), slug=slug)
+    serializer = ProjectSerializer(project, fields=fields)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
+@cache_response("projects")
+@conditional(project_detail_by_id_validators)
 @api_view(["GET"])
 def project_detail_by_id(request, pk):
-    project = get_object_or_404(Project, id=pk)
-    serializer = ProjectSerializer(project)
+    fields = sparse_fields(request, ProjectSerializer)
+    project = get_object_or_404(sparse_queryset(project_queryset(), ProjectSerializer, fields), id=pk)
+    serializer = ProjectSerializer(project, fields=fields)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -294,26 +294,22 @@ def project_detail_by_id(request, pk):
 @permission_classes([IsAuthenticated])
 def update_project(request, pk):
     user = request.user
-    project = get_object_or_404(Project, id=pk)
+    project = get_object_or_404(project_queryset(), id=pk)
 
     # Check if the user has permission to update the project
     if not user.is_staff and not user.is_superuser:
         return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
 
-    # Handle project image deletion if a new image is uploaded
-    new_image = request.FILES.get("project_image")
-    if new_image:
-        if project.project_image and os.path.isfile(project.project_image.path):
-            try:
-                os.remove(project.project_image.path)
-            except Exception as e:
-                return Response({"error": f"Failed to delete old image: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    old_image = project.project_image.name
 
     # Serialize the data with partial=True so that not all fields are required
     serializer = ProjectSerializer(project, data=request.data, partial=True)
 
     if serializer.is_valid():
         serializer.save()
+        # A replaced image is released by a worker once the new one is saved
+        if old_image and "project_image" in serializer.validated_data:
+            delete_file_later(old_image)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -331,11 +327,7 @@ def delete_project(request, pk):
     if not user.is_staff and not user.is_superuser:
         return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
     
-     # Delete the old image if it exists
-    if project.project_image and os.path.isfile(project.project_image.path):
-        os.remove(project.project_image.path)
-
-    project.delete()
+    project.delete()  # Its image is released by a post_delete signal
     return Response({"message": "Project deleted."}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -363,28 +355,43 @@ def create_article(request):
 # List all Articles
 # ----------------------------------------
 
+@cache_response("articles")
+@conditional(article_list_validators)
 @api_view(['GET'])
 def article_list(request):
-    articles = Article.objects.all()
-    paginator = StandardResultsSetPagination()
+    fields = sparse_fields(request, ArticleListSerializer)
+    articles = sparse_queryset(article_list_queryset(), ArticleListSerializer, fields)
+    articles = filter_listing(request, articles, staff=request.user.is_staff)
+    if request.query_params.get("ordering") == "activity":
+        # Most discussed first; activity order is only paged by number
+        articles = articles.order_by("-comment_count", "-published_date", "-id")
+        paginator = StandardResultsSetPagination()
+    else:
+        paginator = get_paginator(request, "published_date")
     result_page = paginator.paginate_queryset(articles, request)
-    serializer = ArticleSerializer(result_page, many=True)
+    serializer = ArticleListSerializer(result_page, many=True, fields=fields)
     return paginator.get_paginated_response(serializer.data)
 
 # ----------------------------------------
 # Get Article Detail
 # ----------------------------------------
 
+@cache_response("articles")
+@conditional(article_detail_validators)
 @api_view(['GET'])
 def article_detail(request, slug):
-    article = get_object_or_404(Article, slug=slug)
-    serializer = ArticleSerializer(article)
+    fields = sparse_fields(request, ArticleSerializer)
+    article = get_object_or_404(sparse_queryset(article_queryset(), ArticleSerializer, fields), slug=slug)
+    serializer = ArticleSerializer(article, fields=fields)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
+@cache_response("articles")
+@conditional(article_detail_by_id_validators)
 @api_view(["GET"])
 def article_detail_by_id(request, pk):
-    article = get_object_or_404(Article, id=pk)
-    serializer = ArticleSerializer(article)
+    fields = sparse_fields(request, ArticleSerializer)
+    article = get_object_or_404(sparse_queryset(article_queryset(), ArticleSerializer, fields), id=pk)
+    serializer = ArticleSerializer(article, fields=fields)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 # ----------------------------------------
@@ -398,27 +405,22 @@ def update_article(request, pk):
     """
     Update an article if the user is the author.
     """
-    article = get_object_or_404(Article, id=pk)
+    article = get_object_or_404(article_queryset(), id=pk)
 
     # Check if the logged-in user is the author of the article
     if not article.author or article.author != request.user:
         return Response({"error": "You are not authorized to edit this article."}, status=status.HTTP_403_FORBIDDEN)
 
-    # Check if a new image is being uploaded
-    new_image = request.FILES.get("article_image")
-    if new_image:
-        # Delete the old image if it exists
-        if article.article_image and os.path.isfile(article.article_image.path):
-            try:
-                os.remove(article.article_image.path)
-            except Exception as e:
-                return Response({"error": f"Failed to delete old image: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    old_image = article.article_image.name
 
     # Serialize the data and validate
     serializer = ArticleSerializer(article, data=request.data, partial=True)
 
     if serializer.is_valid():
         serializer.save()  # Save the article (author remains the same)
+        # A replaced image is released by a worker once the new one is saved
+        if old_image and "article_image" in serializer.validated_data:
+            delete_file_later(old_image)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -437,7 +439,7 @@ def delete_article(request, pk):
     if article.author != request.user and not request.user.is_staff:
         return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
 
-    article.delete()  # Perform delete operation
+    article.delete()  # Its image is released by a post_delete signal
     return Response({"message": "Article deleted."}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -463,12 +465,14 @@ def comment_list_create(request, content_type, object_id):
 
     if request.method == "GET":
         # Fetch all comments related to the object, with pagination
-        comments = Comment.objects.filter(content_type=model_type, object_id=object_id).order_by("-created_at")
+        fields = sparse_fields(request, CommentSerializer)
+        comments = sparse_queryset(comment_queryset(), CommentSerializer, fields)
+        comments = comments.filter(content_type=model_type, object_id=object_id).order_by("-created_at")
         
-        # Apply pagination
-        paginator = StandardResultsSetPagination()
+        # Apply pagination (keyset mode when the client sends a cursor)
+        paginator = get_paginator(request, "created_at")
         result_page = paginator.paginate_queryset(comments, request)
-        serializer = CommentSerializer(result_page, many=True)
+        serializer = CommentSerializer(result_page, many=True, fields=fields)
         
         return paginator.get_paginated_response(serializer.data)
 
@@ -476,7 +480,9 @@ def comment_list_create(request, content_type, object_id):
         # Create a new comment
         serializer = CommentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(author=request.user, content_type=model_type, object_id=object_id)
+            with transaction.atomic():
+                comment = serializer.save(author=request.user, content_type=model_type, object_id=object_id)
+                comment.adjust_counters(1)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -505,13 +511,15 @@ def add_reply(request, content_type, object_id, comment_id):
     if not reply_content:
         return JsonResponse({'error': 'Content is required'}, status=400)
 
-    reply = Comment.objects.create(
-        content=reply_content,
-        author=request.user,
-        content_type=model_type,
-        object_id=object_id,
-        parent_comment=parent_comment
-    )
+    with transaction.atomic():
+        reply = Comment.objects.create(
+            content=reply_content,
+            author=request.user,
+            content_type=model_type,
+            object_id=object_id,
+            parent_comment=parent_comment
+        )
+        reply.adjust_counters(1)
 
     # Return the created reply data
     return JsonResponse({
@@ -532,15 +540,54 @@ def add_reply(request, content_type, object_id, comment_id):
 def get_replies(request, comment_id):
     """Get all replies for a specific comment"""
     
-    replies = Comment.objects.filter(parent_comment_id=comment_id).select_related('author').order_by("-created_at")
-
-    if not replies.exists():
+    fields = sparse_fields(request, CommentSerializer)
+    replies = sparse_queryset(comment_queryset(), CommentSerializer, fields)
+    replies = replies.filter(parent_comment_id=comment_id).order_by("-created_at")
+
+    # Replies are returned whole unless the client opts into cursor pagination
+    if "cursor" in request.query_params:
+        paginator = get_paginator(request, "created_at")
+        result_page = paginator.paginate_queryset(replies, request)
+        reply_serializer = CommentSerializer(result_page, many=True, fields=fields)
+        return paginator.get_paginated_response(reply_serializer.data)
+
+    if not replies:
         return Response({"detail": "No replies found."}, status=status.HTTP_404_NOT_FOUND)
     
-    reply_serializer = CommentSerializer(replies, many=True)
+    reply_serializer = CommentSerializer(replies, many=True, fields=fields)
     return Response(reply_serializer.data, status=status.HTTP_200_OK)
 
 
+# ----------------------------------------
+# Get a Whole Comment Thread
+# ----------------------------------------
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def comment_thread(request, content_type, object_id):
+    """Return all comments on an article or project as nested threads, oldest first"""
+
+    content_type = content_type.lower()
+    if content_type not in ["project", "article"]:
+        return Response({"error": "Invalid content type"}, status=status.HTTP_400_BAD_REQUEST)
+
+    model_class = Project if content_type == "project" else Article
+    get_object_or_404(model_class, id=object_id)
+    model_type = ContentType.objects.get_for_model(model_class)
+
+    # Path order is depth-first, so every parent is seen before its replies
+    comments = comment_queryset().filter(content_type=model_type, object_id=object_id).order_by("path")
+    nodes = {}
+    threads = []
+    for comment in CommentSerializer(comments, many=True).data:
+        comment["replies"] = []
+        nodes[comment["id"]] = comment
+        parent = nodes.get(comment["parent_comment"])
+        (parent["replies"] if parent else threads).append(comment)
+
+    return Response(threads, status=status.HTTP_200_OK)
+
+
 # ----------------------------------------
 # Delete a Comment
 # ----------------------------------------
@@ -554,7 +601,11 @@ def comment_delete(request, comment_id):
     if comment.author != request.user:
         return Response({"error": "You are not authorized to delete this comment"}, status=status.HTTP_403_FORBIDDEN)
 
-    comment.delete()
+    # Removes the comment and its whole reply tree in one statement
+    with transaction.atomic():
+        deleted = comment.delete_subtree()
+        comment.adjust_counters(-deleted)
+    invalidate(f"{ContentType.objects.get_for_id(comment.content_type_id).model}s")
     return Response({"message": "Comment deleted"}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -574,20 +625,25 @@ def delete_reply(request, comment_id, reply_id):
     if reply.author != request.user:
         return Response({"detail": "You are not authorized to delete this reply."}, status=status.HTTP_403_FORBIDDEN)
 
-    reply.delete()
+    with transaction.atomic():
+        deleted = reply.delete_subtree()
+        reply.adjust_counters(-deleted)
+    invalidate(f"{ContentType.objects.get_for_id(reply.content_type_id).model}s")
     return Response({"detail": "Reply deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
 # ----------------------------------------
 # List Certificates API
 # ----------------------------------------
 
+@cache_response("certificates")
 @api_view(['GET'])
 def certificate_list(request):
     """
     List all certificates.
     """
-    certificates = Certificates.objects.all()
-    serializer = CertificatesSerializer(certificates, many=True)
+    fields = sparse_fields(request, CertificatesSerializer)
+    certificates = sparse_queryset(Certificates.objects.all(), CertificatesSerializer, fields)
+    serializer = CertificatesSerializer(certificates, many=True, fields=fields)
     return Response(serializer.data)
 
 # ----------------------------------------
@@ -643,4 +699,90 @@ def certificate_delete(request, pk):
         return Response({'error': 'Certificate not found.'}, status=status.HTTP_404_NOT_FOUND)
 
     certificate.delete()
-    return Response({'message': 'Certificate deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    return Response({'message': 'Certificate deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
+
+# ----------------------------------------
+# Bulk Import API
+# ----------------------------------------
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_import(request, kind):
+    """
+    Import articles, projects or certificates from a JSON Lines request body,
+    one object per line in the shape the create endpoints accept. Valid rows
+    are inserted; invalid ones are reported by line number.
+    """
+    if kind not in IMPORTABLE:
+        return Response({"error": f"Cannot import '{kind}'."}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        lines = request.body.decode("utf-8").splitlines()
+    except UnicodeDecodeError:
+        return Response({"error": "The request body must be UTF-8 encoded JSON Lines."}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = import_content(kind, lines, author=request.user)
+    return Response(result, status=status.HTTP_201_CREATED if result["created"] else status.HTTP_400_BAD_REQUEST)
+
+# ----------------------------------------
+# Search Articles and Projects
+# ----------------------------------------
+
+@api_view(['GET'])
+def search_content(request):
+    """
+    Full-text search over published articles and projects, ranked by BM25,
+    with highlighted titles and snippets. Paginated with `?page=`.
+    """
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return Response({"error": "The 'q' query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page = int(request.query_params.get("page", 1))
+        if page < 1:
+            raise ValueError
+    except ValueError:
+        return Response({"error": "Invalid page."}, status=status.HTTP_400_BAD_REQUEST)
+
+    page_size = StandardResultsSetPagination.page_size
+    total, results = search.search(query, offset=(page - 1) * page_size, limit=page_size)
+
+    url = request.build_absolute_uri()
+    next_link = replace_query_param(url, "page", page + 1) if page * page_size < total else None
+    if page == 1:
+        previous_link = None
+    elif page == 2:
+        previous_link = remove_query_param(url, "page")
+    else:
+        previous_link = replace_query_param(url, "page", page - 1)
+
+    return Response({
+        "count": total,
+        "next": next_link,
+        "previous": previous_link,
+        "results": results,
+    })
+
+
+# ----------------------------------------
+# Metrics
+# ----------------------------------------
+
+@require_safe
+def prometheus_metrics(request):
+    """
+    Request, query and cache metrics summed over every worker process, in the
+    Prometheus text format. Scrapers send METRICS_TOKEN as a bearer token;
+    without one configured, only staff signed in to the admin can read them.
+    """
+    token_valid = bool(settings.METRICS_TOKEN) and hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    )
+    if not token_valid and not request.user.is_staff:
+        if settings.METRICS_TOKEN:
+            response = HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+            response["WWW-Authenticate"] = "Bearer"
+            return response
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(metrics.render(metrics.collect()), content_type="text/plain; version=0.0.4; charset=utf-8")